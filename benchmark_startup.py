@@ -0,0 +1,92 @@
+"""Time GUI startup in three phases: importing main, building the UI, and
+loading the data file until its tasks are rendered
+
+    python benchmark_startup.py                     # 5 runs on a generated 20000 task file
+    python benchmark_startup.py --data tasks.json --runs 10
+
+Every run starts a fresh interpreter so imports are not already cached.
+Needs a display, like the app itself.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PHASES = ("import", "ui", "load")
+
+
+def run_once(data_file):
+    """Start the app once and print the duration of each phase as JSON"""
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+    
+    main.ModernTodoApp.DATA_FILE = data_file
+    root = main.ttk.Window()
+    app = main.ModernTodoApp(root)
+    root.update()
+    built = time.perf_counter()
+    
+    while app.loading:
+        root.update()
+        time.sleep(0.001)
+    loaded = time.perf_counter()
+    root.destroy()
+    print(json.dumps({"import": imported - started, "ui": built - imported, "load": loaded - built}))
+
+
+def generate(path, count):
+    """Write a data file with count tasks, a quarter of them completed"""
+    from task_engine import TaskEngine
+    engine = TaskEngine(path)
+    now = datetime.now()
+    for i in range(count):
+        deadline = now + timedelta(hours=i % 500 - 100) if i % 3 else None
+        task = engine.add_task(f"Task {i} for the startup benchmark", priority=i % 3, deadline=deadline, tags=["bench"])
+        if i % 4 == 0:
+            engine.complete_task(task)
+    engine.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GUI startup time by phase")
+    parser.add_argument("--data", help="data file to load (default: a generated one)")
+    parser.add_argument("--tasks", type=int, default=20000, help="size of the generated data file")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--once", metavar="FILE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.once:
+        run_once(args.once)
+        return
+        
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = args.data
+        if not data_file:
+            data_file = os.path.join(directory, "tasks.json")
+            generate(data_file, args.tasks)
+            
+        samples = []
+        for _ in range(args.runs):
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--once", os.path.abspath(data_file)],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+            
+    print(f"{args.runs} runs, {os.path.basename(args.data) if args.data else f'{args.tasks} generated tasks'}")
+    for phase in PHASES:
+        values = [sample[phase] * 1000 for sample in samples]
+        print(f"{phase:<8} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,235 +4,14 @@ import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.scrolled import ScrolledFrame
 import threading
-import json
+import queue
+import argparse
+import time
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-from PIL import Image, ImageTk
-import os
-import heapq
-from collections import deque
+import calendar
 
-class Task:
-    """Node class for task linked list implementation"""
-    def __init__(self, content, priority=0, deadline=None, tags=None, subtasks=None):
-        self.content = content
-        self.priority = priority  
-        self.deadline = deadline
-        self.completion_time = None
-        self.tags = tags or []
-        self.subtasks = subtasks or []
-        self.next = None
-        self.prev = None
-        self.creation_time = datetime.now()
-        self.reminder_time = None
-
-    def __lt__(self, other):
-        
-        if self.priority != other.priority:
-            return self.priority < other.priority
-        if self.deadline and other.deadline:
-            return self.deadline < other.deadline
-        if self.deadline:
-            return True
-        return False
-        
-    def to_dict(self):
-        """Convert task to dictionary for JSON serialization"""
-        return {
-            "content": self.content,
-            "priority": self.priority,
-            "deadline": self.deadline.isoformat() if self.deadline else None,
-            "completion_time": self.completion_time.isoformat() if self.completion_time else None,
-            "tags": self.tags,
-            "subtasks": self.subtasks,
-            "creation_time": self.creation_time.isoformat(),
-            "reminder_time": self.reminder_time.isoformat() if self.reminder_time else None
-        }
-    
-    @classmethod
-    def from_dict(cls, data):
-        """Create a Task from dictionary data"""
-        task = cls(
-            content=data["content"],
-            priority=data["priority"],
-            deadline=datetime.fromisoformat(data["deadline"]) if data["deadline"] else None,
-            tags=data["tags"],
-            subtasks=data["subtasks"]
-        )
-        task.creation_time = datetime.fromisoformat(data["creation_time"])
-        if data["completion_time"]:
-            task.completion_time = datetime.fromisoformat(data["completion_time"])
-        if data["reminder_time"]:
-            task.reminder_time = datetime.fromisoformat(data["reminder_time"])
-        return task
-
-
-class TaskLinkedList:
-    """Doubly linked list implementation for tasks"""
-    def __init__(self):
-        self.head = None
-        self.tail = None
-        self.size = 0
-        
-    def append(self, task):
-        """Add a task to the end of the list"""
-        if not self.head:
-            self.head = task
-            self.tail = task
-        else:
-            task.prev = self.tail
-            self.tail.next = task
-            self.tail = task
-        self.size += 1
-        
-    def pop(self, task):
-        """Remove a specific task from the list"""
-        if not task:
-            return None
-            
-        if task == self.head and task == self.tail:
-            self.head = None
-            self.tail = None
-        elif task == self.head:
-            self.head = task.next
-            if self.head:
-                self.head.prev = None
-        elif task == self.tail:
-            self.tail = task.prev
-            if self.tail:
-                self.tail.next = None
-        else:
-            task.prev.next = task.next
-            task.next.prev = task.prev
-            
-        self.size -= 1
-        return task
-        
-    def get_all_tasks(self):
-        """Return all tasks as a list"""
-        tasks = []
-        current = self.head
-        while current:
-            tasks.append(current)
-            current = current.next
-        return tasks
-        
-    def binary_search(self, target_content):
-        """Search for a task by content using binary search (after sorting)"""
-        tasks = sorted(self.get_all_tasks(), key=lambda x: x.content)
-        
-        left, right = 0, len(tasks) - 1
-        while left <= right:
-            mid = (left + right) // 2
-            if tasks[mid].content == target_content:
-                return tasks[mid]
-            elif tasks[mid].content < target_content:
-                left = mid + 1
-            else:
-                right = mid - 1
-                
-        return None
-        
-    def merge_sort(self, key_func=None):
-        """Sort tasks using merge sort and return sorted list"""
-        tasks = self.get_all_tasks()
-        if not key_func:
-            key_func = lambda x: x.content
-            
-        if len(tasks) <= 1:
-            return tasks
-            
-        def merge_sort_internal(arr):
-            if len(arr) <= 1:
-                return arr
-                
-            mid = len(arr) // 2
-            left = merge_sort_internal(arr[:mid])
-            right = merge_sort_internal(arr[mid:])
-            
-            return merge(left, right)
-            
-        def merge(left, right):
-            result = []
-            i = j = 0
-            
-            while i < len(left) and j < len(right):
-                if key_func(left[i]) <= key_func(right[j]):
-                    result.append(left[i])
-                    i += 1
-                else:
-                    result.append(right[j])
-                    j += 1
-                    
-            result.extend(left[i:])
-            result.extend(right[j:])
-            return result
-            
-        return merge_sort_internal(tasks)
-
-
-class TaskTree:
-    """Implementation of a tree structure for categorized tasks"""
-    class TreeNode:
-        def __init__(self, name):
-            self.name = name
-            self.tasks = []
-            self.children = []
-            
-        def add_child(self, child):
-            self.children.append(child)
-            return child
-            
-        def add_task(self, task):
-            self.tasks.append(task)
-            
-    def __init__(self):
-        self.root = self.TreeNode("Root")
-        
-    def add_category(self, path, create_missing=True):
-        """Add a category at the specified path (e.g., 'Work/Project A')"""
-        if not path:
-            return self.root
-            
-        parts = path.split('/')
-        current = self.root
-        
-        for part in parts:
-            found = False
-            for child in current.children:
-                if child.name == part:
-                    current = child
-                    found = True
-                    break
-                    
-            if not found:
-                if create_missing:
-                    new_node = self.TreeNode(part)
-                    current.add_child(new_node)
-                    current = new_node
-                else:
-                    return None
-                    
-        return current
-        
-    def add_task_to_category(self, path, task):
-        """Add a task to a specific category"""
-        node = self.add_category(path)
-        if node:
-            node.add_task(task)
-            
-    def dfs_traverse(self):
-        """Depth-first traversal of the tree"""
-        result = []
-        
-        def dfs(node, path=""):
-            current_path = f"{path}/{node.name}" if path else node.name
-            for task in node.tasks:
-                result.append((current_path, task))
-            for child in node.children:
-                dfs(child, current_path)
-                
-        dfs(self.root)
-        return result
+from task_engine import TaskEngine, TaskQuery, KanbanBoard, ArchiveSegment
 
 
 class ModernTodoApp:
@@ -253,13 +32,17 @@ class ModernTodoApp:
         self.style = ttk.Style(theme="superhero")
         
         
-        self.task_list = TaskLinkedList()          
-        self.completed_tasks = TaskLinkedList()    
-        self.task_tree = TaskTree()                
-        self.priority_queue = []                   
-        self.history_stack = []                    
-        self.future_stack = []                     
-        self.task_queue = deque()                  
+        self.engine = TaskEngine(self.DATA_FILE)
+        self.server = None
+        self.recorder = None
+        self.ui_calls = queue.Queue()
+        self.render_pending = None
+        self.rendered_versions = None
+        self.loading = False
+        self.analytics = None
+        self.completed_container = None
+        self.completed_page = 0
+        self.chart_canvas = None
         
         
         self.heading_text = tk.StringVar(value="Team J")
@@ -269,8 +52,24 @@ class ModernTodoApp:
         self.search_var.trace_add("write", self.on_search_change)
         self.task_var = tk.StringVar()
         self.filter_mode = tk.StringVar(value="All")
+        self.tag_filter = tk.StringVar()
+        self.active_query = None
         self.view_mode = tk.StringVar(value="List")
         self.dark_mode = tk.BooleanVar(value=False)
+        self.calendar_span = tk.StringVar(value="Month")
+        self.calendar_date = datetime.now().date()
+        self.kanban_offsets = {}
+        self.kanban_views = {}
+        self.kanban_slots = {}
+        self.task_menu = None
+        self.menu_target = None
+        self.expanded_tasks = set()
+        self.task_cards = {}
+        self.card_tasks = {}
+        self.metric_labels = {}
+        self.analytics_chart = tk.StringVar(value="Throughput")
+        self.analytics_period = tk.StringVar(value="Day")
+        self.deadline_tick = None
         
         
         self.selected_task = None
@@ -280,9 +79,31 @@ class ModernTodoApp:
         
         self.setup_ui()
         self.load_data()
-        
+        self.schedule_deadline_tick()
+        self.root.after(self.POLL_INTERVAL, self.poll_data_file)
+        self.root.after(self.DISPATCH_INTERVAL, self.drain_ui_calls)
+        
+    KANBAN_SLOTS = 15
+    DATA_FILE = "tasks.json"
+    POLL_INTERVAL = 2000
+    DISPATCH_INTERVAL = 10
+    DISPATCH_BUDGET = 0.008
+    RENDER_DELAY = 250
+    CARD_TAG = "TaskCard"
+    CARD_MENU_TAG = "TaskCardMenu"
+    KANBAN_TAG = "KanbanSlot"
+    ANALYTICS_CHARTS = ["Throughput", "Completion time", "Overdue aging", "Priority mix"]
+    PRIORITY_COLORS = ["#5cb85c", "#f0ad4e", "#d9534f"]
+    
     def setup_ui(self):
         
+        self.root.bind_class(self.CARD_TAG, "<Button-1>", self.on_card_click)
+        self.root.bind_class(self.CARD_TAG, "<Button-3>", self.on_card_menu)
+        self.root.bind_class(self.CARD_MENU_TAG, "<Button-1>", self.on_card_menu)
+        self.root.bind_class(self.KANBAN_TAG, "<Button-1>", self.on_kanban_click)
+        self.root.bind_class(self.KANBAN_TAG, "<Button-3>", lambda e: self.on_kanban_click(e, popup=True))
+        self.root.bind_class(self.KANBAN_TAG, "<MouseWheel>", self.on_kanban_wheel)
+        
         self.main_container = ttk.Frame(self.root)
         self.main_container.pack(fill=tk.BOTH, expand=True)
         
@@ -370,6 +191,16 @@ class ModernTodoApp:
         filter_menu.add_radiobutton(label="Due Today", variable=self.filter_mode, value="Today", command=self.update_view)
         filter_menu.add_radiobutton(label="High Priority", variable=self.filter_mode, value="Priority", command=self.update_view)
         filter_menu.add_radiobutton(label="Completed", variable=self.filter_mode, value="Completed", command=self.update_view)
+        filter_menu.add_radiobutton(label="Ready to Start", variable=self.filter_mode, value="Ready", command=self.update_view)
+        filter_menu.add_radiobutton(label="Next Up", variable=self.filter_mode, value="Next Up", command=self.update_view)
+        filter_menu.add_separator()
+        filter_menu.add_command(label="Query...", command=self.run_query)
+        filter_menu.add_command(label="Save Current Query...", command=self.save_query)
+        filter_menu.add_separator()
+        filter_menu.add_command(label="By Tags...", command=self.set_tag_filter)
+        filter_menu.add_command(label="Clear Tag Filter", command=lambda: self.set_tag_filter(""))
+        filter_menu.add_separator()
+        filter_menu.add_command(label="Find Duplicates...", command=self.show_duplicates)
         filter_btn["menu"] = filter_menu
         
         sort_btn = ttk.Menubutton(
@@ -384,6 +215,8 @@ class ModernTodoApp:
         sort_menu.add_command(label="By Due Date", command=lambda: self.sort_tasks("deadline"))
         sort_menu.add_command(label="By Creation Time", command=lambda: self.sort_tasks("creation_time"))
         sort_menu.add_command(label="Alphabetically", command=lambda: self.sort_tasks("content"))
+        sort_menu.add_command(label="By Dependencies", command=lambda: self.sort_tasks("dependencies"))
+        sort_menu.add_command(label="By Effective Priority", command=lambda: self.sort_tasks("effective"))
         sort_btn["menu"] = sort_menu
         
         
@@ -434,9 +267,10 @@ class ModernTodoApp:
         
         category_frame = ScrolledFrame(self.sidebar, autohide=True)
         category_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.category_frame = category_frame
         
         
-        self.category_buttons = []
+        self.category_buttons = {}
         
         
         all_btn = ttk.Button(
@@ -446,12 +280,12 @@ class ModernTodoApp:
             command=lambda: self.change_category("All Tasks")
         )
         all_btn.pack(fill=tk.X, padx=5, pady=2)
-        self.category_buttons.append(all_btn)
+        self.category_buttons["All Tasks"] = all_btn
         
         
         categories = ["Work", "Personal", "Shopping", "Health", "Education"]
         for category in categories:
-            self.task_tree.add_category(category)
+            self.engine.task_tree.add_category(category)
             btn = ttk.Button(
                 category_frame,
                 text=category,
@@ -459,7 +293,12 @@ class ModernTodoApp:
                 command=lambda c=category: self.change_category(c)
             )
             btn.pack(fill=tk.X, padx=5, pady=2)
-            self.category_buttons.append(btn)
+            self.category_buttons[category] = btn
+            
+        
+        self.query_frame = ttk.Frame(self.sidebar)
+        self.query_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.query_buttons = {}
     
     def setup_content(self):
         
@@ -506,13 +345,61 @@ class ModernTodoApp:
         self.notebook.add(self.completed_frame, text="Completed")
         
         
-        self.completed_container = ScrolledFrame(self.completed_frame, autohide=True)
-        self.completed_container.pack(fill=tk.BOTH, expand=True)
-        
-        
         self.analytics_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.analytics_frame, text="Analytics")
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        
+    def on_tab_changed(self, event=None):
+        """Build the Completed and Analytics tabs the first time they are shown, then refresh them"""
+        tab = self.notebook.select()
+        if tab == str(self.completed_frame):
+            if self.completed_container is None:
+                self.setup_completed()
+            with self.engine.lock:
+                self.render_completed()
+        elif tab == str(self.analytics_frame):
+            if self.chart_canvas is None:
+                self.setup_analytics()
+            self.render_analytics()
+            
+    def setup_completed(self):
+        """Build the Completed tab: one page of cards and buttons to move between pages"""
+        pager = ttk.Frame(self.completed_frame, padding=5)
+        pager.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        self.newer_button = ttk.Button(
+            pager,
+            text="◀ Newer",
+            command=lambda: self.turn_completed_page(-1),
+            bootstyle=(SECONDARY, OUTLINE)
+        )
+        self.newer_button.pack(side=tk.LEFT)
+        self.older_button = ttk.Button(
+            pager,
+            text="Older ▶",
+            command=lambda: self.turn_completed_page(1),
+            bootstyle=(SECONDARY, OUTLINE)
+        )
+        self.older_button.pack(side=tk.RIGHT)
+        self.page_label = ttk.Label(pager, bootstyle=SECONDARY)
+        self.page_label.pack(side=tk.LEFT, expand=True)
         
+        self.completed_container = ScrolledFrame(self.completed_frame, autohide=True)
+        self.completed_container.pack(fill=tk.BOTH, expand=True)
+        
+    def turn_completed_page(self, step):
+        self.completed_page = max(0, self.completed_page + step)
+        with self.engine.lock:
+            self.render_completed()
+            
+    def setup_analytics(self):
+        """Build the Analytics tab; numpy is only imported here"""
+        from task_analytics import TaskColumns
+        try:
+            self.analytics = TaskColumns(self.engine)
+        except ImportError:
+            self.analytics = None
+            
         ttk.Label(
             self.analytics_frame,
             text="Task Analytics Dashboard",
@@ -543,16 +430,31 @@ class ModernTodoApp:
             anchor=tk.CENTER
         ).pack(pady=10)
         
-        
-        chart_placeholder = ttk.Frame(canvas_frame, height=250)
-        chart_placeholder.pack(fill=tk.X, padx=20, pady=10)
-        
-        ttk.Label(
-            chart_placeholder,
-            text="[Productivity trends visualization would appear here]",
-            font=("Roboto", 12),
-            anchor=tk.CENTER
-        ).pack(expand=True)
+        chart_controls = ttk.Frame(canvas_frame)
+        chart_controls.pack(fill=tk.X, padx=20)
+        
+        for chart in self.ANALYTICS_CHARTS:
+            ttk.Radiobutton(
+                chart_controls,
+                text=chart,
+                variable=self.analytics_chart,
+                value=chart,
+                bootstyle="toolbutton",
+                command=self.render_analytics
+            ).pack(side=tk.LEFT, padx=2)
+        for period in ["Week", "Day"]:
+            ttk.Radiobutton(
+                chart_controls,
+                text=period,
+                variable=self.analytics_period,
+                value=period,
+                bootstyle="toolbutton",
+                command=self.render_analytics
+            ).pack(side=tk.RIGHT, padx=2)
+        
+        self.chart_canvas = tk.Canvas(canvas_frame, height=250, highlightthickness=0)
+        self.chart_canvas.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        self.chart_canvas.bind("<Configure>", lambda e: self.render_analytics())
         
     def setup_footer(self):
         footer = ttk.Frame(self.content_frame, bootstyle=SECONDARY)
@@ -584,48 +486,51 @@ class ModernTodoApp:
             bootstyle=SECONDARY
         ).pack(pady=(10, 5))
         
-        ttk.Label(
+        value_label = ttk.Label(
             card,
             text=value,
             font=("Roboto", 18, "bold")
-        ).pack(pady=(0, 10))
+        )
+        value_label.pack(pady=(0, 10))
+        self.metric_labels[title] = value_label
         
         parent.columnconfigure(column, weight=1)
         
     def render_tasks(self):
+        """Redraw the current view while holding the model lock"""
+        if self.render_pending is not None:
+            self.root.after_cancel(self.render_pending)
+            self.render_pending = None
+        with self.engine.lock:
+            self.rendered_versions = tuple(self.engine.versions.values())
+            self.render_view()
+            
+    def render_view(self):
         
         for widget in self.task_container.winfo_children():
             widget.destroy()
+        self.task_cards.clear()
+        self.card_tasks.clear()
             
         
-        tasks = self.get_filtered_tasks()
-        
+        self.render_analytics()
+        self.refresh_category_counts()
         
-        total_tasks = self.task_list.size + self.completed_tasks.size
-        completed_count = self.completed_tasks.size
-        completion_rate = f"{(completed_count / total_tasks * 100) if total_tasks else 0:.1f}%"
-        overdue_count = sum(1 for task in self.task_list.get_all_tasks() 
-                           if task.deadline and task.deadline < datetime.now())
-                           
-        
-        for widget in self.analytics_frame.winfo_children():
-            if isinstance(widget, ttk.Frame):
-                metrics_frame = widget.winfo_children()[0]
-                for i, (title, value) in enumerate([
-                    ("Total Tasks", str(total_tasks)),
-                    ("Completed", str(completed_count)),
-                    ("Completion Rate", completion_rate),
-                    ("Overdue", str(overdue_count))
-                ]):
-                    card = metrics_frame.grid_slaves(row=0, column=i)[0]
-                    value_label = card.winfo_children()[1]
-                    value_label.configure(text=value)
         
+        self.render_completed()
         
+        if self.view_mode.get() == "Calendar":
+            self.render_calendar()
+            return
+        if self.view_mode.get() == "Kanban":
+            self.render_kanban()
+            return
+            
+        tasks = self.get_filtered_tasks()
         if not tasks:
             empty_label = ttk.Label(
                 self.task_container,
-                text="No tasks found. Create a new task to get started!",
+                text="Loading tasks..." if self.loading else "No tasks found. Create a new task to get started!",
                 font=("Roboto", 12),
                 bootstyle=SECONDARY
             )
@@ -636,12 +541,27 @@ class ModernTodoApp:
         for task in tasks:
             self.create_task_card(self.task_container, task)
             
+    def render_completed(self):
+        """Redraw the current page of the Completed tab if it is showing
         
-        
+        Pages hold a fixed number of tasks, newest first; older pages come
+        from the archive file, which is only read when they are shown.
+        """
+        if self.completed_container is None or self.notebook.select() != str(self.completed_frame):
+            return
+            
         for widget in self.completed_container.winfo_children():
             widget.destroy()
             
-        completed_tasks = self.completed_tasks.get_all_tasks()
+        completed_tasks, total = self.engine.completed_page(self.completed_page)
+        pages = max(1, -(-total // ArchiveSegment.PAGE))
+        if self.completed_page >= pages:
+            self.completed_page = pages - 1
+            completed_tasks, total = self.engine.completed_page(self.completed_page)
+        self.page_label.configure(text=f"Page {self.completed_page + 1} of {pages} ({total} completed)")
+        self.newer_button.configure(state=tk.NORMAL if self.completed_page > 0 else tk.DISABLED)
+        self.older_button.configure(state=tk.NORMAL if self.completed_page < pages - 1 else tk.DISABLED)
+        
         if not completed_tasks:
             empty_label = ttk.Label(
                 self.completed_container,
@@ -654,94 +574,535 @@ class ModernTodoApp:
             for task in completed_tasks:
                 self.create_completed_card(self.completed_container, task)
                 
-    def create_task_card(self, parent, task):
+    def render_analytics(self):
+        """Update the metrics and draw the selected chart while the Analytics tab is showing"""
+        if self.chart_canvas is None or self.notebook.select() != str(self.analytics_frame):
+            return
+        with self.engine.lock:
+            total_tasks = self.engine.task_list.size + self.engine.completed_tasks.size
+            completed_count = self.engine.completed_tasks.size
+            overdue_count = len(self.engine.deadline_timer.overdue)
+        completion_rate = f"{(completed_count / total_tasks * 100) if total_tasks else 0:.1f}%"
         
-        card = ttk.Frame(parent, bootstyle=LIGHT)
+        for title, value in [
+            ("Total Tasks", str(total_tasks)),
+            ("Completed", str(completed_count)),
+            ("Completion Rate", completion_rate),
+            ("Overdue", str(overdue_count))
+        ]:
+            self.metric_labels[title].configure(text=value)
+            
+        canvas = self.chart_canvas
+        canvas.delete("all")
+        if self.analytics is None:
+            canvas.create_text(
+                canvas.winfo_width() // 2, 100,
+                text="Install numpy to see analytics charts",
+                font=("Roboto", 12)
+            )
+            return
+            
+        self.analytics.refresh()
+        chart = self.analytics_chart.get()
+        period = self.analytics_period.get().lower()
+        periods = 30 if period == "day" else 26
+        stacked = False
+        if chart == "Throughput":
+            starts, created, completed = self.analytics.throughput(period, periods)
+            labels = [f"{day:%b %d}" for day in starts.astype(object)]
+            series = [("Created", created, "#5bc0de"), ("Completed", completed, "#5cb85c")]
+            caption = f"{created.sum()} created, {completed.sum()} completed in the last {periods} {period}s"
+        elif chart == "Completion time":
+            labels, counts, median, p90 = self.analytics.completion_times()
+            series = [("Completed", counts, "#5cb85c")]
+            caption = f"Median {median:.1f}h, 90th percentile {p90:.1f}h" if counts.sum() else "No completed tasks yet"
+        elif chart == "Overdue aging":
+            labels, counts = self.analytics.overdue_aging()
+            series = [("Overdue", counts, "#d9534f")]
+            caption = f"{counts.sum()} open tasks past their deadline, by days overdue"
+        else:
+            starts, mix = self.analytics.priority_mix(period, periods)
+            labels = [f"{day:%b %d}" for day in starts.astype(object)]
+            series = [(f"Priority {p}", mix[:, p], color) for p, color in enumerate(self.PRIORITY_COLORS)]
+            caption = f"Tasks created per {period} by priority"
+            stacked = True
+        self.draw_bar_chart(labels, series, caption, stacked)
+        
+    def draw_bar_chart(self, labels, series, caption, stacked=False):
+        """Draw (name, counts, color) series as grouped or stacked bars"""
+        canvas = self.chart_canvas
+        width = max(canvas.winfo_width(), 200)
+        height = max(canvas.winfo_height(), 150)
+        left, top, bottom = 40, 30, height - 25
+        
+        heights = sum(values for _, values, _ in series) if stacked else [values.max() for _, values, _ in series]
+        peak = max(int(max(heights)), 1)
+        slot = (width - left - 10) / len(labels)
+        bar = slot * 0.8 / (1 if stacked else len(series))
+        label_every = len(labels) // 10 + 1
+        
+        canvas.create_text(left, 10, text=caption, anchor=tk.W, font=("Roboto", 10))
+        canvas.create_text(left - 5, top, text=str(peak), anchor=tk.E, font=("Roboto", 8))
+        canvas.create_line(left, bottom, width - 10, bottom)
+        for index, label in enumerate(labels):
+            x = left + index * slot + slot * 0.1
+            base = bottom
+            for number, (_, values, color) in enumerate(series):
+                bar_height = (bottom - top) * values[index] / peak
+                if stacked:
+                    canvas.create_rectangle(x, base - bar_height, x + bar, base, fill=color, outline="")
+                    base -= bar_height
+                else:
+                    x0 = x + number * bar
+                    canvas.create_rectangle(x0, bottom - bar_height, x0 + bar, bottom, fill=color, outline="")
+            if index % label_every == 0:
+                canvas.create_text(x, bottom + 4, text=label, anchor=tk.NW, font=("Roboto", 8))
+                
+        legend_x = width - 10
+        for name, _, color in reversed(series):
+            legend_x -= 8 * len(name) + 20
+            canvas.create_rectangle(legend_x, 5, legend_x + 10, 15, fill=color, outline="")
+            canvas.create_text(legend_x + 14, 10, text=name, anchor=tk.W, font=("Roboto", 8))
+                
+    def calendar_range(self):
+        """Return the [start, end) datetimes covered by the calendar view"""
+        anchor = self.calendar_date
+        span = self.calendar_span.get()
+        if span == "Day":
+            first = anchor
+            last = anchor + timedelta(days=1)
+        elif span == "Week":
+            first = anchor - timedelta(days=anchor.weekday())
+            last = first + timedelta(days=7)
+        elif span == "Year":
+            first = anchor.replace(month=1, day=1)
+            last = first.replace(year=first.year + 1)
+        else:
+            first = anchor.replace(day=1)
+            last = (first + timedelta(days=32)).replace(day=1)
+        midnight = datetime.min.time()
+        return datetime.combine(first, midnight), datetime.combine(last, midnight)
+        
+    def shift_calendar(self, step):
+        """Move the calendar view backwards or forwards by one span"""
+        anchor = self.calendar_date
+        span = self.calendar_span.get()
+        if span == "Day":
+            self.calendar_date = anchor + timedelta(days=step)
+        elif span == "Week":
+            self.calendar_date = anchor + timedelta(days=7 * step)
+        elif span == "Year":
+            self.calendar_date = anchor.replace(year=anchor.year + step, day=1)
+        else:
+            month_index = anchor.year * 12 + anchor.month - 1 + step
+            self.calendar_date = anchor.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+        self.render_tasks()
+        
+    def open_calendar_day(self, day):
+        """Drill down from a month or year cell into a single day"""
+        self.calendar_date = day
+        self.calendar_span.set("Day")
+        self.render_tasks()
+        
+    def render_calendar(self):
+        """Render the calendar view using range queries on the deadline index"""
+        container = self.task_container
+        span = self.calendar_span.get()
+        start, end = self.calendar_range()
+        
+        
+        nav_frame = ttk.Frame(container)
+        nav_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        ttk.Button(
+            nav_frame,
+            text="◀",
+            bootstyle=SECONDARY,
+            width=3,
+            command=lambda: self.shift_calendar(-1)
+        ).pack(side=tk.LEFT)
+        
+        titles = {
+            "Day": start.strftime("%A, %b %d, %Y"),
+            "Week": start.strftime("Week of %b %d, %Y"),
+            "Month": start.strftime("%B %Y"),
+            "Year": start.strftime("%Y")
+        }
+        ttk.Label(
+            nav_frame,
+            text=f"{titles[span]}  ({self.engine.deadline_index.count(start, end)} due)",
+            font=("Roboto", 14, "bold")
+        ).pack(side=tk.LEFT, padx=10)
+        
+        ttk.Button(
+            nav_frame,
+            text="▶",
+            bootstyle=SECONDARY,
+            width=3,
+            command=lambda: self.shift_calendar(1)
+        ).pack(side=tk.LEFT)
+        
+        for span_name in ["Year", "Month", "Week", "Day"]:
+            ttk.Radiobutton(
+                nav_frame,
+                text=span_name,
+                variable=self.calendar_span,
+                value=span_name,
+                bootstyle="toolbutton",
+                command=self.render_tasks
+            ).pack(side=tk.RIGHT, padx=2)
+        
+        
+        if span == "Year":
+            self.render_year_heatmap(container, start, end)
+        elif span == "Month":
+            self.render_month_grid(container, start, end)
+        else:
+            tasks = self.engine.deadline_index.range(start, end)
+            upcoming = sorted(self.engine.recurring_days(start, end), key=lambda item: item[0])
+            if not tasks and not upcoming:
+                ttk.Label(
+                    container,
+                    text="Nothing due in this period.",
+                    font=("Roboto", 12),
+                    bootstyle=SECONDARY
+                ).pack(pady=50)
+            for task in tasks:
+                self.create_task_card(container, task)
+            for occurrence, count, task in upcoming:
+                repeats = f"  ×{count}" if count > 1 else ""
+                ttk.Label(
+                    container,
+                    text=f"↻ {task.content}  ·  {occurrence:%a %b %d, %H:%M}{repeats}",
+                    font=("Roboto", 11),
+                    bootstyle=SECONDARY
+                ).pack(fill=tk.X, padx=20, pady=2)
+                
+    def render_month_grid(self, parent, start, end):
+        """Render a month grid with the number of tasks due per day"""
+        grid = ttk.Frame(parent)
+        grid.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        for column, day_name in enumerate(calendar.day_abbr):
+            ttk.Label(
+                grid,
+                text=day_name,
+                font=("Roboto", 10, "bold"),
+                anchor=tk.CENTER
+            ).grid(row=0, column=column, sticky="ew")
+            grid.columnconfigure(column, weight=1)
+            
+        weeks = calendar.Calendar().monthdatescalendar(start.year, start.month)
+        counts = self.engine.deadline_index.count_by_day(weeks[0][0], weeks[-1][-1] + timedelta(days=1))
+        self._add_recurring_counts(
+            counts,
+            datetime.combine(weeks[0][0], datetime.min.time()),
+            datetime.combine(weeks[-1][-1] + timedelta(days=1), datetime.min.time())
+        )
+        today = datetime.now().date()
+        
+        for row, week in enumerate(weeks, start=1):
+            for column, day in enumerate(week):
+                count = counts.get(day, 0)
+                if day == today:
+                    style = PRIMARY
+                elif count:
+                    style = WARNING
+                else:
+                    style = SECONDARY
+                ttk.Button(
+                    grid,
+                    text=f"{day.day}\n{count if count else ''}",
+                    bootstyle=style if day.month == start.month else f"{style}-outline",
+                    command=lambda d=day: self.open_calendar_day(d)
+                ).grid(row=row, column=column, sticky="nsew", padx=1, pady=1)
+                
+    def _add_recurring_counts(self, counts, start, end):
+        for occurrence, count, _ in self.engine.recurring_days(start, end):
+            day = occurrence.date()
+            counts[day] = counts.get(day, 0) + count
+            
+    def render_year_heatmap(self, parent, start, end):
+        """Render per-day deadline counts for a whole year on a single canvas"""
+        cell = 13
+        counts = self.engine.deadline_index.count_by_day(start.date(), end.date())
+        self._add_recurring_counts(counts, start, end)
+        peak = max(counts.values(), default=0)
+        palette = ["#2b3e50", "#4e6e5d", "#5cb85c", "#f0ad4e", "#d9534f"]
+        
+        canvas = tk.Canvas(parent, height=cell * 7 + 30, highlightthickness=0)
+        canvas.pack(fill=tk.X, padx=10, pady=10)
+        
+        first = start.date()
+        offset = first.weekday()
+        day = first
+        while day < end.date():
+            index = (day - first).days + offset
+            column, row = divmod(index, 7)
+            count = counts.get(day, 0)
+            shade = palette[0] if not count else palette[1 + min(3, (count * 3) // max(peak, 1))]
+            x, y = 30 + column * cell, 20 + row * cell
+            canvas.create_rectangle(x, y, x + cell - 2, y + cell - 2, fill=shade, outline="")
+            if day.day == 1:
+                canvas.create_text(x, 10, text=day.strftime("%b"), anchor=tk.W, font=("Roboto", 8))
+            day += timedelta(days=1)
+            
+        def on_click(event):
+            if event.x < 30 or event.y < 20:
+                return
+            index = ((event.x - 30) // cell) * 7 + (event.y - 20) // cell
+            clicked = first + timedelta(days=index - offset)
+            if (event.y - 20) // cell < 7 and first <= clicked < end.date():
+                self.open_calendar_day(clicked)
+                
+        canvas.bind("<Button-1>", on_click)
+            
+    def render_kanban(self):
+        """Render the Kanban board with a separately virtualized window per column"""
+        board = ttk.Frame(self.task_container)
+        board.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        column_styles = {0: "success", 1: "warning", 2: "danger", "done": SECONDARY}
+        self.kanban_views = {}
+        self.kanban_slots = {}
+        
+        for column, (key, title) in enumerate(KanbanBoard.COLUMNS):
+            frame = ttk.Frame(board, bootstyle=LIGHT)
+            frame.grid(row=0, column=column, sticky="nsew", padx=5)
+            board.columnconfigure(column, weight=1, uniform="kanban")
+            
+            header = ttk.Label(
+                frame,
+                font=("Roboto", 12, "bold"),
+                bootstyle=f"{column_styles[key]}-inverse",
+                anchor=tk.CENTER
+            )
+            header.pack(fill=tk.X, padx=5, pady=5)
+            
+            body = ttk.Frame(frame)
+            body.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+            
+            scrollbar = ttk.Scrollbar(
+                body,
+                orient=tk.VERTICAL,
+                command=lambda *args, k=key: self.scroll_kanban(k, *args)
+            )
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            
+            
+            slots = []
+            for index in range(self.KANBAN_SLOTS):
+                slot = ttk.Label(
+                    body,
+                    font=("Roboto", 10),
+                    wraplength=150,
+                    justify=tk.LEFT,
+                    padding=(5, 3)
+                )
+                slot.pack(fill=tk.X, padx=(0, 2), pady=1)
+                slot.bindtags((self.KANBAN_TAG, *slot.bindtags()))
+                self.kanban_slots[str(slot)] = (key, index)
+                slots.append(slot)
+                
+            self.kanban_views[key] = (title, header, slots, scrollbar, [])
+            self.refresh_kanban_column(key)
+            
+    def refresh_kanban_column(self, key):
+        """Rebind the visible slots of one column to the tasks at its scroll offset"""
+        title, header, slots, scrollbar, visible = self.kanban_views[key]
+        total = self.engine.kanban.count(key)
+        offset = max(0, min(self.kanban_offsets.get(key, 0), total - len(slots)))
+        self.kanban_offsets[key] = offset
+        
+        visible[:] = self.engine.kanban.window(key, offset, len(slots))
+        header.configure(text=f"{title} ({total})")
+        
+        for index, slot in enumerate(slots):
+            if index < len(visible):
+                task = visible[index]
+                overdue = " ⚠️" if task in self.engine.deadline_timer.overdue else ""
+                slot.configure(text=f"{task.content}{overdue}", bootstyle=SECONDARY if key == "done" else "default")
+            else:
+                slot.configure(text="")
+                
+        if total:
+            scrollbar.set(offset / total, (offset + len(visible)) / total)
+        else:
+            scrollbar.set(0, 1)
+            
+    def scroll_kanban(self, key, action, *args):
+        """Handle scrollbar and mouse wheel events for a Kanban column"""
+        with self.engine.lock:
+            total = self.engine.kanban.count(key)
+            offset = self.kanban_offsets.get(key, 0)
+            if action == "moveto":
+                offset = int(float(args[0]) * total)
+            elif action == "scroll":
+                step = self.KANBAN_SLOTS if args[1] == "pages" else 1
+                offset += int(args[0]) * step
+            self.kanban_offsets[key] = offset
+            self.refresh_kanban_column(key)
+        
+    def on_kanban_wheel(self, event):
+        key, _ = self.kanban_slots[str(event.widget)]
+        self.scroll_kanban(key, "scroll", -1 if event.delta > 0 else 1, "units")
+        
+    def on_kanban_click(self, event, popup=False):
+        """Select the card under a slot, optionally opening the shared card menu"""
+        key, index = self.kanban_slots[str(event.widget)]
+        visible = self.kanban_views[key][4]
+        if index >= len(visible):
+            return
+        task = visible[index]
+        self.select_task(task)
+        if popup and key != "done":
+            self.show_task_menu(task, event.x_root, event.y_root)
+        
+    def show_task_menu(self, task, x, y):
+        """Pop up the task menu, created once and shared by every card, for task"""
+        if self.task_menu is None:
+            self.task_menu = tk.Menu(self.root, tearoff=0)
+            for entry in [
+                ("Edit Task", self.edit_task),
+                ("Set Deadline", self.set_deadline),
+                ("Set Recurrence", self.set_recurrence),
+                ("Set Reminder", self.set_reminder),
+                ("Change Priority", self.change_priority),
+                ("Edit Tags", self.edit_tags),
+                ("Blocked By...", self.edit_blockers),
+                ("Notes...", self.edit_note),
+                ("Add Subtask", self.add_subtask),
+                ("Move to Category", self.move_to_category),
+                None,
+                ("Complete Task", self.complete_task),
+                ("Delete Task", self.delete_task)
+            ]:
+                if entry is None:
+                    self.task_menu.add_separator()
+                    continue
+                label, action = entry
+                self.task_menu.add_command(label=label, command=lambda a=action: a(self.menu_target))
+        self.menu_target = task
+        self.task_menu.tk_popup(x, y)
+        
+    def tag_card(self, card, task, *widgets):
+        """Route clicks on a card and its widgets to the class bindings for CARD_TAG"""
+        self.card_tasks[str(card)] = task
+        for widget in (card, *widgets):
+            widget.bindtags((self.CARD_TAG, *widget.bindtags()))
+            
+    def card_task(self, widget):
+        """Return the task of the card containing widget, walking up its path"""
+        path = str(widget)
+        while path:
+            task = self.card_tasks.get(path)
+            if task is not None:
+                return task
+            path = path.rpartition(".")[0]
+        return None
+        
+    def on_card_click(self, event):
+        task = self.card_task(event.widget)
+        if task is not None:
+            self.select_task(task)
+            
+    def on_card_menu(self, event):
+        task = self.card_task(event.widget)
+        if task is None or task.completion_time:
+            return
+        self.select_task(task)
+        widget = event.widget
+        if self.CARD_MENU_TAG in widget.bindtags():
+            self.show_task_menu(task, widget.winfo_rootx(), widget.winfo_rooty() + widget.winfo_height())
+        else:
+            self.show_task_menu(task, event.x_root, event.y_root)
+            
+    def create_task_card(self, parent, task):
+        """Build a card from a handful of widgets; clicks and the menu are handled per class"""
+        card = ttk.Frame(parent, bootstyle=LIGHT, padding=(10, 5))
         card.pack(fill=tk.X, padx=10, pady=5)
+        card.columnconfigure(1, weight=1)
         
         
         priority_colors = {0: "success", 1: "warning", 2: "danger"}
         priority_color = priority_colors.get(task.priority, "secondary")
         
         
-        content_frame = ttk.Frame(card)
-        content_frame.pack(fill=tk.X, padx=10, pady=5)
-        
+        # A triangle marks tasks whose deadline or age has raised their priority
+        raised = self.engine.urgency.effective(task) < task.priority
         priority_indicator = ttk.Label(
-            content_frame,
-            text="●",
+            card,
+            text="▲" if raised else "●",
             font=("Segoe UI Symbol", 16),
             bootstyle=priority_color
         )
-        priority_indicator.pack(side=tk.LEFT, padx=(0, 5))
+        priority_indicator.grid(row=0, column=0, padx=(0, 5))
         
         content_label = ttk.Label(
-            content_frame,
+            card,
             text=task.content,
             font=("Roboto", 12),
             wraplength=400,
             justify=tk.LEFT
         )
-        content_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        content_label.grid(row=0, column=1, sticky="ew")
         
         
         menu_btn = ttk.Button(
-            content_frame,
+            card,
             text="⋮",
             bootstyle=SECONDARY,
             width=3
         )
-        menu_btn.pack(side=tk.RIGHT, padx=5)
-        
-        
-        menu = tk.Menu(menu_btn, tearoff=0)
-        menu.add_command(label="Edit Task", command=lambda: self.edit_task(task))
-        menu.add_command(label="Set Reminder", command=lambda: self.set_reminder(task))
-        menu.add_command(label="Change Priority", command=lambda: self.change_priority(task))
-        menu.add_command(label="Add Subtask", command=lambda: self.add_subtask(task))
-        menu.add_command(label="Move to Category", command=lambda: self.move_to_category(task))
-        menu.add_separator()
-        menu.add_command(label="Complete Task", command=lambda: self.complete_task(task))
-        menu.add_command(label="Delete Task", command=lambda: self.delete_task(task))
-        
-        menu_btn.configure(command=lambda: menu.tk_popup(
-            menu_btn.winfo_rootx(),
-            menu_btn.winfo_rooty() + menu_btn.winfo_height()
-        ))
-        
-        
-        footer_frame = ttk.Frame(card)
-        footer_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+        menu_btn.grid(row=0, column=2, padx=5)
+        menu_btn.bindtags((self.CARD_MENU_TAG, *menu_btn.bindtags()))
+        self.tag_card(card, task, priority_indicator, content_label)
         
         
-        if task.deadline:
-            deadline_str = task.deadline.strftime("%b %d, %Y")
-            deadline_label = ttk.Label(
-                footer_frame,
-                text=f"Due: {deadline_str}",
-                font=("Roboto", 10),
-                bootstyle=SECONDARY
-            )
-            deadline_label.pack(side=tk.LEFT, padx=(0, 10))
+        waiting_on = self.engine.dependencies.open_blockers(task.id)
+        has_note = task.note_ref or task.note_text
+        if task.deadline or task.tags or waiting_on or has_note:
+            footer_frame = ttk.Frame(card)
+            footer_frame.grid(row=1, column=0, columnspan=3, sticky="ew")
+            self.tag_card(footer_frame, task)
             
             
-            if task.deadline < datetime.now():
-                overdue_label = ttk.Label(
+            if task.deadline:
+                deadline_str = task.deadline.strftime("%b %d, %Y")
+                deadline_label = ttk.Label(
                     footer_frame,
-                    text="⚠️ Overdue",
+                    text=f"Due: {deadline_str}",
                     font=("Roboto", 10),
-                    bootstyle="danger"
+                    bootstyle=SECONDARY
                 )
-                overdue_label.pack(side=tk.LEFT)
-        
-        
-        if task.tags:
-            tag_frame = ttk.Frame(footer_frame)
-            tag_frame.pack(side=tk.RIGHT)
-            
+                deadline_label.pack(side=tk.LEFT, padx=(0, 10))
+                
+                
+                self.task_cards[task] = footer_frame
+                if task in self.engine.deadline_timer.overdue:
+                    self.add_overdue_label(footer_frame)
+                    
+            if waiting_on:
+                chain = self.engine.dependencies.path_length(task.id)
+                ttk.Label(
+                    footer_frame,
+                    text=f"⛓ Blocked by {len(waiting_on)}, critical path {chain - 1}",
+                    font=("Roboto", 10),
+                    bootstyle=WARNING
+                ).pack(side=tk.LEFT, padx=(0, 10))
+                
+            if has_note:
+                ttk.Label(
+                    footer_frame,
+                    text="📝 Note",
+                    font=("Roboto", 10),
+                    bootstyle=SECONDARY
+                ).pack(side=tk.LEFT, padx=(0, 10))
+                    
+                    
             for tag in task.tags[:2]:  
                 tag_label = ttk.Label(
-                    tag_frame,
+                    footer_frame,
                     text=tag,
                     font=("Roboto", 9),
                     bootstyle=f"{priority_color}-inverse",
@@ -750,23 +1111,147 @@ class ModernTodoApp:
                 tag_label.pack(side=tk.RIGHT, padx=2)
                 
         
-        for widget in [card, content_frame, content_label, footer_frame]:
-            widget.bind("<Button-1>", lambda e, t=task: self.select_task(t))
+        if task.subtasks:
+            self.create_subtask_section(card, task).grid(row=2, column=0, columnspan=3, sticky="ew", pady=(0, 5))
             
-        
         return card
         
+    def add_overdue_label(self, footer_frame):
+        overdue_label = ttk.Label(
+            footer_frame,
+            text="⚠️ Overdue",
+            font=("Roboto", 10),
+            bootstyle="danger"
+        )
+        overdue_label.pack(side=tk.LEFT)
+        
+    def schedule_deadline_tick(self):
+        """Arm a Tk timer for the next pending deadline (re-checked at least once a minute)"""
+        if self.deadline_tick is not None:
+            self.root.after_cancel(self.deadline_tick)
+        next_due = self.engine.deadline_timer.next_due()
+        if self.uses_urgency():
+            next_change = self.engine.urgency.next_change()
+            if next_change is not None and (next_due is None or next_change < next_due):
+                next_due = next_change
+        delay = 60000
+        if next_due is not None:
+            delay = int((next_due - datetime.now()).total_seconds() * 1000) + 50
+            delay = max(250, min(delay, 60000))
+        self.deadline_tick = self.root.after(delay, self.on_deadline_tick)
+        
+    def uses_urgency(self):
+        """Whether the task list is shown in effective priority order"""
+        return self.engine.sort_key == "effective" or self.filter_mode.get() == "Next Up"
+        
+    def on_deadline_tick(self):
+        """Flag tasks that just became overdue without rescanning or re-rendering"""
+        self.deadline_tick = None
+        fired = self.engine.tick_deadlines()
+        if self.uses_urgency():
+            # Bumps the urgency facet when the order changed, so drain_ui_calls re-renders
+            self.engine.refresh_priorities()
+        if fired:
+            self.refresh_category_counts()
+            for task in fired:
+                footer_frame = self.task_cards.get(task)
+                if footer_frame is not None and footer_frame.winfo_exists():
+                    self.add_overdue_label(footer_frame)
+            if self.metric_labels:
+                self.metric_labels["Overdue"].configure(text=str(len(self.engine.deadline_timer.overdue)))
+            if self.view_mode.get() == "Kanban":
+                for key in {KanbanBoard.column_for(task) for task in fired}:
+                    if key in self.kanban_views:
+                        self.refresh_kanban_column(key)
+        self.schedule_deadline_tick()
+        
+    def create_subtask_section(self, parent, task, depth=0):
+        """Create a collapsible subtask section for the caller to place; child rows
+        are only built while expanded"""
+        section = ttk.Frame(parent)
+        
+        toggle = ttk.Button(section, bootstyle="secondary-link", padding=0)
+        toggle.pack(anchor=tk.W)
+        children_frame = ttk.Frame(section)
+        
+        def refresh():
+            expanded = task in self.expanded_tasks
+            arrow = "▾" if expanded else "▸"
+            toggle.configure(text=f"{arrow} Subtasks {task.subtask_done}/{task.subtask_total}")
+            if expanded and not children_frame.winfo_children():
+                for child in task.subtasks:
+                    self.create_subtask_row(children_frame, child, depth)
+                children_frame.pack(fill=tk.X)
+            elif not expanded:
+                for widget in children_frame.winfo_children():
+                    widget.destroy()
+                children_frame.pack_forget()
+                
+        def on_toggle():
+            self.expanded_tasks.symmetric_difference_update({task})
+            refresh()
+            
+        toggle.configure(command=on_toggle)
+        refresh()
+        return section
+        
+    def create_subtask_row(self, parent, task, depth):
+        """Create a single subtask row with its own lazily expanded children"""
+        row = ttk.Frame(parent)
+        row.pack(fill=tk.X, pady=1)
+        
+        line = ttk.Frame(row)
+        line.pack(fill=tk.X)
+        
+        priority_colors = {0: "success", 1: "warning", 2: "danger"}
+        done = task.completion_time is not None
+        
+        ttk.Button(
+            line,
+            text="☑" if done else "☐",
+            bootstyle=f"{priority_colors.get(task.priority, 'secondary')}-link",
+            padding=0,
+            command=lambda: self.toggle_subtask(task)
+        ).pack(side=tk.LEFT, padx=(0, 5))
+        
+        ttk.Label(
+            line,
+            text=task.content,
+            font=("Roboto", 10, "overstrike") if done else ("Roboto", 10),
+            bootstyle=SECONDARY if done else "default",
+            wraplength=350,
+            justify=tk.LEFT
+        ).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        ttk.Button(
+            line,
+            text="+",
+            bootstyle="secondary-link",
+            padding=0,
+            command=lambda: self.add_subtask(task)
+        ).pack(side=tk.RIGHT)
+        
+        if task.deadline:
+            ttk.Label(
+                line,
+                text=task.deadline.strftime("%b %d"),
+                font=("Roboto", 9),
+                bootstyle=SECONDARY
+            ).pack(side=tk.RIGHT, padx=5)
+            
+        if task.subtasks:
+            section = self.create_subtask_section(row, task, depth + 1)
+            section.pack(fill=tk.X, padx=(10 + 20 * (depth + 1), 10), pady=(0, 5))
+        return row
+        
     def create_completed_card(self, parent, task):
         
-        card = ttk.Frame(parent, bootstyle=LIGHT)
+        card = ttk.Frame(parent, bootstyle=LIGHT, padding=(10, 5))
         card.pack(fill=tk.X, padx=10, pady=5)
         
         
-        content_frame = ttk.Frame(card)
-        content_frame.pack(fill=tk.X, padx=10, pady=5)
-        
         checkmark = ttk.Label(
-            content_frame,
+            card,
             text="✓",
             font=("Segoe UI Symbol", 14),
             bootstyle=SUCCESS
@@ -774,7 +1259,7 @@ class ModernTodoApp:
         checkmark.pack(side=tk.LEFT, padx=(0, 5))
         
         content_label = ttk.Label(
-            content_frame,
+            card,
             text=task.content,
             font=("Roboto", 12, "overstrike"),  
             wraplength=400,
@@ -786,41 +1271,25 @@ class ModernTodoApp:
         
         completion_time = task.completion_time.strftime("%b %d, %Y %H:%M")
         ttk.Label(
-            content_frame,
+            card,
             text=f"Completed: {completion_time}",
                         font=("Roboto", 9),
             bootstyle=SECONDARY
         ).pack(side=tk.RIGHT, padx=5)
         
         
-        for widget in [card, content_frame, content_label]:
-            widget.bind("<Button-1>", lambda e, t=task: self.select_task(t))
-            
+        self.tag_card(card, task, content_label)
         return card
 
     def get_filtered_tasks(self):
         """Return tasks based on current filters and category"""
-        if self.current_category.get() == "All Tasks":
-            tasks = self.task_list.get_all_tasks()
-        else:
-            
-            tasks = []
-            for path, task in self.task_tree.dfs_traverse():
-                if self.current_category.get() in path:
-                    tasks.append(task)
-        
-        
-        filter_mode = self.filter_mode.get()
-        if filter_mode == "All":
-            return tasks
-        elif filter_mode == "Today":
-            today = datetime.now().date()
-            return [t for t in tasks if t.deadline and t.deadline.date() == today]
-        elif filter_mode == "Priority":
-            return [t for t in tasks if t.priority == 0]  
-        elif filter_mode == "Completed":
-            return self.completed_tasks.get_all_tasks()
-        return tasks
+        if self.active_query:
+            return self.engine.run_query(self.active_query)
+        return self.engine.filter_tasks(
+            self.current_category.get(),
+            self.filter_mode.get(),
+            self.tag_filter.get().strip()
+        )
         
     def select_task(self, task):
         """Select a task for detailed view or editing"""
@@ -833,17 +1302,18 @@ class ModernTodoApp:
         if not content or content == "Add a new task...":
             return
             
-        
-        new_task = Task(content)
-        
-        
-        self.task_list.append(new_task)
-        if self.current_category.get() != "All Tasks":
-            self.task_tree.add_task_to_category(self.current_category.get(), new_task)
-            
-        
-        self.history_stack.append(("add", new_task))
-        self.future_stack.clear()
+        duplicates = self.engine.find_duplicates(content)
+        if duplicates:
+            other, similarity = duplicates[0]
+            if not messagebox.askyesno(
+                "Possible Duplicate",
+                f"This looks like an open task ({similarity:.0%} similar):\n\n{other.content}\n\nAdd it anyway?",
+                parent=self.root
+            ):
+                return
+                
+        category = None if self.active_query else self.current_category.get()
+        self.engine.add_task(content, category=category)
         
         
         self.task_var.set("")
@@ -857,103 +1327,30 @@ class ModernTodoApp:
             initialvalue=task.content,
             parent=self.root
         )
-        if new_content and new_content != task.content:
-            
-            old_content = task.content
-            self.history_stack.append(("edit", task, old_content))
-            self.future_stack.clear()
-            
-            
-            task.content = new_content
+        if new_content and self.engine.edit_task(task, new_content):
             self.render_tasks()
             
     def complete_task(self, task):
         """Mark a task as completed"""
-        
-        self.task_list.pop(task)
-        
-        
-        task.completion_time = datetime.now()
-        
-        
-        self.completed_tasks.append(task)
-        
-        
-        self.history_stack.append(("complete", task))
-        self.future_stack.clear()
-        
-        
+        self.engine.complete_task(task)
         self.render_tasks()
         
     def delete_task(self, task):
         """Delete a task completely"""
-        
-        self.task_list.pop(task)
-        
-        
-        self.history_stack.append(("delete", task))
-        self.future_stack.clear()
-        
-        
+        self.engine.delete_task(task)
         self.render_tasks()
         
     def undo(self):
         """Undo the last action"""
-        if not self.history_stack:
-            return
-            
-        action = self.history_stack.pop()
-        self.future_stack.append(action)
-        
-        if action[0] == "add":
-            
-            task = action[1]
-            self.task_list.pop(task)
-        elif action[0] == "delete":
-            
-            task = action[1]
-            self.task_list.append(task)
-        elif action[0] == "edit":
-            
-            task, old_content = action[1], action[2]
-            task.content = old_content
-        elif action[0] == "complete":
-            
-            task = action[1]
-            self.completed_tasks.pop(task)
-            task.completion_time = None
-            self.task_list.append(task)
-            
-        self.render_tasks()
+        if self.engine.undo():
+            self.schedule_deadline_tick()
+            self.render_tasks()
         
     def redo(self):
         """Redo the last undone action"""
-        if not self.future_stack:
-            return
-            
-        action = self.future_stack.pop()
-        self.history_stack.append(action)
-        
-        if action[0] == "add":
-            
-            task = action[1]
-            self.task_list.append(task)
-        elif action[0] == "delete":
-            
-            task = action[1]
-            self.task_list.pop(task)
-        elif action[0] == "edit":
-            
-            task, old_content = action[1], action[2]
-            task.content = old_content
-        elif action[0] == "complete":
-            
-            task = action[1]
-            self.task_list.pop(task)
-            task.completion_time = datetime.now()
-            self.completed_tasks.append(task)
-            
-        self.render_tasks()
+        if self.engine.redo():
+            self.schedule_deadline_tick()
+            self.render_tasks()
         
     def change_priority(self, task):
         """Change task priority"""
@@ -965,15 +1362,124 @@ class ModernTodoApp:
             maxvalue=2,
             parent=self.root
         )
-        if new_priority is not None and new_priority != task.priority:
+        if new_priority is not None and self.engine.set_priority(task, new_priority):
+            self.render_tasks()
+            
+    def edit_tags(self, task):
+        """Edit the comma-separated tags of a task"""
+        tags_str = simpledialog.askstring(
+            "Edit Tags",
+            "Enter tags separated by commas:",
+            initialvalue=", ".join(task.tags),
+            parent=self.root
+        )
+        if tags_str is not None and self.engine.set_tags(task, tags_str.split(",")):
+            self.render_tasks()
+            
+    def edit_blockers(self, task):
+        """Pick, by content, the open tasks that must be completed before this one"""
+        names = simpledialog.askstring(
+            "Blocked By",
+            "Tasks to finish first, separated by commas (empty to clear):",
+            initialvalue=", ".join(self.engine.tasks_by_id[i].content for i in task.blocked_by if i in self.engine.tasks_by_id),
+            parent=self.root
+        )
+        if names is None:
+            return
             
-            self.history_stack.append(("priority", task, task.priority))
-            self.future_stack.clear()
+        blocker_ids = []
+        for name in filter(None, (name.strip() for name in names.split(","))):
+            matches = [t for t in self.engine.search(name) if t is not task and t.completion_time is None]
+            exact = [t for t in matches if t.content.lower() == name.lower()]
+            if not matches:
+                messagebox.showerror("Error", f"No open task matches '{name}'")
+                return
+            blocker_ids.append((exact or matches)[0].id)
             
+        try:
+            changed = self.engine.set_blockers(task, blocker_ids)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if changed:
+            self.render_tasks()
+            
+    def edit_note(self, task):
+        """Open the note of a task in a window; the note is only read from disk here"""
+        window = ttk.Toplevel(self.root)
+        window.title(f"Notes: {task.content[:40]}")
+        window.geometry("480x360")
+        
+        text = tk.Text(window, wrap=tk.WORD, font=("Roboto", 11), undo=True)
+        text.insert("1.0", self.engine.get_note(task))
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        text.focus_set()
+        
+        def save():
+            if self.engine.set_note(task, text.get("1.0", "end-1c").rstrip()):
+                self.render_tasks()
+            window.destroy()
+            
+        buttons = ttk.Frame(window)
+        buttons.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Button(buttons, text="Save", bootstyle=SUCCESS, command=save).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="Cancel", bootstyle=SECONDARY, command=window.destroy).pack(side=tk.RIGHT, padx=5)
+        
+    def set_tag_filter(self, expression=None):
+        """Filter tasks by tags: 'a b' requires both, 'a|b' either, '-a' excludes"""
+        if expression is None:
+            expression = simpledialog.askstring(
+                "Filter by Tags",
+                "Tags to filter by (e.g. 'work urgent|soon -later'):",
+                initialvalue=self.tag_filter.get(),
+                parent=self.root
+            )
+            if expression is None:
+                return
+        self.tag_filter.set(expression.strip())
+        self.render_tasks()
+        
+    def set_deadline(self, task):
+        """Set or clear the deadline of a task"""
+        deadline_str = simpledialog.askstring(
+            "Set Deadline",
+            "Enter deadline (YYYY-MM-DD or YYYY-MM-DD HH:MM, empty to clear):",
+            initialvalue=task.deadline.strftime("%Y-%m-%d %H:%M") if task.deadline else "",
+            parent=self.root
+        )
+        if deadline_str is None:
+            return
+            
+        try:
+            new_deadline = datetime.fromisoformat(deadline_str.strip()) if deadline_str.strip() else None
+        except ValueError as e:
+            messagebox.showerror("Error", f"Could not parse deadline: {e}")
+            return
             
-            task.priority = new_priority
+        if self.engine.set_deadline(task, new_deadline):
+            self.schedule_deadline_tick()
             self.render_tasks()
             
+    def set_recurrence(self, task):
+        """Make a task repeat ('daily', 'every 2 weeks', 'weekdays', '0 9 * * 1-5')"""
+        text = simpledialog.askstring(
+            "Set Recurrence",
+            "Repeat (daily, weekly, monthly, weekdays, every 2 weeks,\n"
+            "cron like '0 9 * * 1-5'; empty to stop repeating):",
+            initialvalue=task.recurrence or "",
+            parent=self.root
+        )
+        if text is None:
+            return
+            
+        try:
+            self.engine.set_recurrence(task, text)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.schedule_deadline_tick()
+        self.render_tasks()
+        
     def set_reminder(self, task):
         """Set a reminder for a task"""
         reminder_time = simpledialog.askstring(
@@ -1005,22 +1511,21 @@ class ModernTodoApp:
                 messagebox.showerror("Error", f"Could not parse reminder time: {e}")
                 
     def start_reminder_thread(self, task):
-        """Start a thread to monitor reminder time"""
+        """Start a timer thread that shows the reminder through the UI queue"""
         if task in self.reminder_threads:
             self.reminder_threads[task].cancel()
             
         def check_reminder():
-            while datetime.now() < task.reminder_time:
-                time.sleep(1)
-                
-            
-            if task in self.task_list.get_all_tasks():  
-                messagebox.showwarning("Reminder", f"Don't forget: {task.content}")
+            with self.engine.lock:
+                pending = task.id in self.engine.tasks_by_id and task.completion_time is None
+            if pending:
+                self.call_in_ui(messagebox.showwarning, "Reminder", f"Don't forget: {task.content}")
                 
-        thread = threading.Thread(target=check_reminder)
-        thread.daemon = True
-        thread.start()
-        self.reminder_threads[task] = thread
+        delay = max(0, (task.reminder_time - datetime.now()).total_seconds())
+        timer = threading.Timer(delay, check_reminder)
+        timer.daemon = True
+        timer.start()
+        self.reminder_threads[task] = timer
         
     def add_subtask(self, parent_task):
         """Add a subtask to a parent task"""
@@ -1030,12 +1535,17 @@ class ModernTodoApp:
             parent=self.root
         )
         if subtask_content:
-            parent_task.subtasks.append(subtask_content)
+            self.engine.add_subtask(parent_task, subtask_content)
+            self.expanded_tasks.add(parent_task)
             self.render_tasks()
             
+    def toggle_subtask(self, task):
+        """Toggle completion of a subtask"""
+        self.engine.toggle_subtask(task)
+        self.render_tasks()
+            
     def move_to_category(self, task):
         """Move task to a different category"""
-        categories = ["Work", "Personal", "Shopping", "Health", "Education"]
         category = simpledialog.askstring(
             "Move to Category",
             "Enter category name:",
@@ -1043,18 +1553,87 @@ class ModernTodoApp:
             parent=self.root
         )
         if category and category != self.current_category.get():
-            
-            
-            
-            
-            self.task_tree.add_task_to_category(category, task)
+            self.engine.move_to_category(task, category)
             self.render_tasks()
             
+    def refresh_category_counts(self):
+        """Show open and overdue totals on the category buttons
+        
+        The engine keeps the totals per category subtree as tasks change, so
+        this only reads one counter pair per button.
+        """
+        engine = self.engine
+        with engine.lock:
+            for path, button in self.category_buttons.items():
+                if path == "All Tasks":
+                    open_count, overdue = engine.task_list.size, len(engine.deadline_timer.overdue)
+                else:
+                    open_count, overdue = engine.task_tree.counts(path)
+                text = f"{path}  ({open_count})"
+                if overdue:
+                    text += f"  ⚠️ {overdue}"
+                button.configure(text=text)
+                
     def change_category(self, category_name):
         """Change the current category view"""
+        self.active_query = None
         self.current_category.set(category_name)
         self.render_tasks()
         
+    def run_query(self, text=None, name=None):
+        """Show the tasks matching a query such as 'priority<=1 tag:work due<7d'"""
+        if text is None:
+            text = simpledialog.askstring(
+                "Query",
+                "Query (priority<=1 tag:work due<7d category:Work text:\"invoice\"):",
+                initialvalue=self.active_query.text if self.active_query else "",
+                parent=self.root
+            )
+            if not text:
+                return
+        try:
+            self.active_query = TaskQuery(text)
+        except ValueError as e:
+            messagebox.showerror("Query Error", str(e))
+            return
+        self.current_category.set(name or f"Query: {text}")
+        self.render_tasks()
+        
+    def save_query(self):
+        """Save the active query as a sidebar entry"""
+        if not self.active_query:
+            self.run_query()
+            if not self.active_query:
+                return
+        name = simpledialog.askstring(
+            "Save Query",
+            "Name for this query:",
+            parent=self.root
+        )
+        if name:
+            self.engine.saved_queries[name] = self.active_query.text
+            self.add_query_button(name)
+            self.current_category.set(name)
+            
+    def add_query_button(self, name):
+        """Add (or keep) the sidebar entry for a saved query"""
+        if name in self.query_buttons:
+            return
+        if not self.query_buttons:
+            ttk.Label(
+                self.query_frame,
+                text="Saved Queries",
+                font=("Roboto", 11, "bold")
+            ).pack(fill=tk.X, padx=5, pady=(5, 2))
+        btn = ttk.Button(
+            self.query_frame,
+            text=f"🔎 {name}",
+            bootstyle=INFO,
+            command=lambda: self.run_query(self.engine.saved_queries[name], name)
+        )
+        btn.pack(fill=tk.X, padx=5, pady=2)
+        self.query_buttons[name] = btn
+        
     def add_category(self):
         """Add a new custom category"""
         category_name = simpledialog.askstring(
@@ -1063,7 +1642,7 @@ class ModernTodoApp:
             parent=self.root
         )
         if category_name:
-            self.task_tree.add_category(category_name)
+            self.engine.task_tree.add_category(category_name)
             
             
             btn = ttk.Button(
@@ -1073,31 +1652,19 @@ class ModernTodoApp:
                 command=lambda c=category_name: self.change_category(c)
             )
             btn.pack(fill=tk.X, padx=5, pady=2)
-            self.category_buttons.append(btn)
+            self.category_buttons[category_name] = btn
+            self.refresh_category_counts()
             
     def sort_tasks(self, key):
         """Sort tasks by the specified key"""
-        if key == "priority":
-            key_func = lambda x: x.priority
-        elif key == "deadline":
-            key_func = lambda x: x.deadline or datetime.max
-        elif key == "creation_time":
-            key_func = lambda x: x.creation_time
-        else:  
-            key_func = lambda x: x.content.lower()
-            
-        sorted_tasks = self.task_list.merge_sort(key_func)
-        
-        
-        self.task_list = TaskLinkedList()
-        for task in sorted_tasks:
-            self.task_list.append(task)
-            
+        self.engine.sort_tasks(key)
         self.render_tasks()
+        self.schedule_deadline_tick()
         
     def update_view(self):
         """Update the view based on current settings"""
         self.render_tasks()
+        self.schedule_deadline_tick()
         
     def on_search_change(self, *args):
         """Handle search input changes"""
@@ -1107,9 +1674,7 @@ class ModernTodoApp:
             return
             
         
-        all_tasks = self.task_list.get_all_tasks() + self.completed_tasks.get_all_tasks()
-        filtered = [t for t in all_tasks if search_term in t.content.lower() or 
-                   any(search_term in tag.lower() for tag in t.tags)]
+        filtered = self.engine.search(search_term)
                    
         
         for widget in self.task_container.winfo_children():
@@ -1158,6 +1723,10 @@ class ModernTodoApp:
         else:
             self.style.theme_use("flatly")    
             
+    def refresh_query_buttons(self):
+        for name in self.engine.saved_queries:
+            self.add_query_button(name)
+            
     def import_data(self):
         """Import tasks from JSON file"""
         filepath = filedialog.askopenfilename(
@@ -1166,34 +1735,34 @@ class ModernTodoApp:
         )
         if filepath:
             try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    
-                
-                self.task_list = TaskLinkedList()
-                self.completed_tasks = TaskLinkedList()
-                self.task_tree = TaskTree()
-                
-                
-                for task_data in data.get("tasks", []):
-                    task = Task.from_dict(task_data)
-                    self.task_list.append(task)
-                    
-                for task_data in data.get("completed", []):
-                    task = Task.from_dict(task_data)
-                    self.completed_tasks.append(task)
-                    
-                
-                for category, tasks in data.get("categories", {}).items():
-                    for task_data in tasks:
-                        task = Task.from_dict(task_data)
-                        self.task_tree.add_task_to_category(category, task)
-                        
-                messagebox.showinfo("Import Successful", "Tasks imported successfully!")
+                self.engine.import_file(filepath)
+                self.refresh_query_buttons()
+                groups = self.engine.duplicate_report()
+                message = "Tasks imported successfully!"
+                if groups:
+                    message += (
+                        f"\n\n{sum(map(len, groups))} open tasks look like near-duplicates, in {len(groups)} groups. "
+                        "Use Filter > Find Duplicates... to review them."
+                    )
+                messagebox.showinfo("Import Successful", message)
+                self.schedule_deadline_tick()
                 self.render_tasks()
             except Exception as e:
                 messagebox.showerror("Import Error", f"Failed to import tasks: {str(e)}")
                 
+    def show_duplicates(self):
+        """List the largest groups of open tasks that are probably near-duplicates"""
+        groups = self.engine.duplicate_report()
+        if not groups:
+            messagebox.showinfo("Find Duplicates", "No probable duplicates among the open tasks.")
+            return
+        lines = []
+        for group in groups[:10]:
+            lines.append(f"{len(group)} x  " + "  |  ".join(task.content[:40] for task in group[:3]))
+        if len(groups) > 10:
+            lines.append(f"... and {len(groups) - 10} more groups")
+        messagebox.showinfo("Find Duplicates", "\n".join(lines))
+        
     def export_data(self):
         """Export tasks to JSON file"""
         filepath = filedialog.asksaveasfilename(
@@ -1203,77 +1772,141 @@ class ModernTodoApp:
         )
         if filepath:
             try:
-                data = {
-                    "tasks": [t.to_dict() for t in self.task_list.get_all_tasks()],
-                    "completed": [t.to_dict() for t in self.completed_tasks.get_all_tasks()],
-                    "categories": {}
-                }
-                
-                
-                for path, task in self.task_tree.dfs_traverse():
-                    if path != "Root":
-                        if path not in data["categories"]:
-                            data["categories"][path] = []
-                        data["categories"][path].append(task.to_dict())
-                        
-                with open(filepath, 'w') as f:
-                    json.dump(data, f, indent=2)
-                    
+                self.engine.export_file(filepath)
                 messagebox.showinfo("Export Successful", "Tasks exported successfully!")
             except Exception as e:
                 messagebox.showerror("Export Error", f"Failed to export tasks: {str(e)}")
                 
     def load_data(self):
-        """Load tasks from default data file"""
+        """Load the default data file on a worker thread
+        
+        The window works on an empty store until finish_loading swaps the
+        loaded one in, so the first frame never waits for the file.
+        """
+        self.loading = True
+        threading.Thread(target=self._load_in_background, name="task-load", daemon=True).start()
+        
+    def _load_in_background(self):
+        engine = TaskEngine(self.DATA_FILE)
         try:
-            if os.path.exists("tasks.json"):
-                with open("tasks.json", 'r') as f:
-                    data = json.load(f)
-                    
-                for task_data in data.get("tasks", []):
-                    task = Task.from_dict(task_data)
-                    self.task_list.append(task)
-                    
-                for task_data in data.get("completed", []):
-                    task = Task.from_dict(task_data)
-                    self.completed_tasks.append(task)
-                    
-                for category, tasks in data.get("categories", {}).items():
-                    for task_data in tasks:
-                        task = Task.from_dict(task_data)
-                        self.task_tree.add_task_to_category(category, task)
+            engine.load()
         except Exception as e:
             print(f"Error loading data: {e}")
-            
+            engine = None
+        self.call_in_ui(self.finish_loading, engine)
+        
+    def finish_loading(self, engine):
+        """Swap in the loaded store, keeping any edits made while it loaded
+        
+        Edits are merged as records, but their undo history is dropped: it
+        refers to the placeholder store's task objects, not the loaded ones.
+        Every reference is swapped under the placeholder's lock, so a server
+        write cannot land on the discarded store in between.
+        """
+        self.loading = False
+        if engine is not None:
+            with self.engine.lock:
+                if self.engine.change_seq:
+                    engine.merge_changes(self.engine.changes_since(0))
+                if self.server:
+                    self.server.engine = engine
+                if self.analytics:
+                    self.analytics.engine = engine
+                self.engine = engine
+        if self.recorder:
+            self.recorder.attach(self.engine)
+        self.refresh_query_buttons()
+        self.schedule_deadline_tick()
+        self.render_tasks()
+        
+
     def save_data(self):
-        """Save tasks to default data file"""
+        """Save tasks to default data file, merging other instances' changes first"""
         try:
-            data = {
-                "tasks": [t.to_dict() for t in self.task_list.get_all_tasks()],
-                "completed": [t.to_dict() for t in self.completed_tasks.get_all_tasks()],
-                "categories": {}
-            }
-            
-            for path, task in self.task_tree.dfs_traverse():
-                if path != "Root":
-                    if path not in data["categories"]:
-                        data["categories"][path] = []
-                    data["categories"][path].append(task.to_dict())
-                    
-            with open("tasks.json", 'w') as f:
-                json.dump(data, f, indent=2)
+            self.engine.save()
         except Exception as e:
             print(f"Error saving data: {e}")
             
+    def poll_data_file(self):
+        """Pick up changes other instances saved; a stat call when nothing changed"""
+        try:
+            if not self.loading and self.engine.poll():
+                self.refresh_query_buttons()
+                self.render_tasks()
+        except (OSError, ValueError) as e:
+            print(f"Error reloading data: {e}")
+        self.root.after(self.POLL_INTERVAL, self.poll_data_file)
+        
+    def call_in_ui(self, fn, *args):
+        """Queue fn(*args) to run on the Tk thread; safe to call from any thread
+        
+        Returns a concurrent.futures.Future with the result.
+        """
+        future = Future()
+        self.ui_calls.put((future, fn, args))
+        return future
+        
+    def drain_ui_calls(self):
+        """Run queued calls for a few milliseconds, then re-render at most every RENDER_DELAY
+        if the model changed behind the UI's back"""
+        give_up = time.perf_counter() + self.DISPATCH_BUDGET
+        while time.perf_counter() < give_up:
+            try:
+                future, fn, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+                    
+        if self.render_pending is None and tuple(self.engine.versions.values()) != self.rendered_versions:
+            self.render_pending = self.root.after(self.RENDER_DELAY, self.render_tasks)
+        self.root.after(self.DISPATCH_INTERVAL, self.drain_ui_calls)
+        
+    def start_server(self, host="127.0.0.1", port=None):
+        """Serve the in-memory model over local HTTP from a worker thread
+        
+        Requests take the engine lock; drain_ui_calls notices the changes
+        and re-renders.
+        """
+        from task_server import TaskServer
+        self.server = TaskServer(self.engine, host, port or TaskServer.PORT)
+        self.server.start_in_thread()
+        
+    def start_recording(self, path):
+        """Log every operation on the store to a trace for task_trace.py to replay
+        
+        Starts once the data file has loaded, from a snapshot of the store.
+        """
+        from task_trace import TraceRecorder
+        self.recorder = TraceRecorder(path)
+        if not self.loading:
+            self.recorder.attach(self.engine)
+            
     def on_closing(self):
         """Handle window closing event"""
         self.save_data()
+        if self.recorder:
+            self.recorder.close()
         self.root.destroy()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Team J task tracker")
+    parser.add_argument("--serve", nargs="?", type=int, const=0, metavar="PORT",
+                        help="also serve the tasks over HTTP on localhost (port 8765 unless given)")
+    parser.add_argument("--record", metavar="TRACE",
+                        help="log every operation to TRACE for replay with task_trace.py")
+    args = parser.parse_args()
+    
     root = ttk.Window()
     app = ModernTodoApp(root)
+    if args.serve is not None:
+        app.start_server(port=args.serve or None)
+    if args.record:
+        app.start_recording(args.record)
     
     
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
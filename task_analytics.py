@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TaskColumns:
+    """Columnar NumPy copy of the top-level tasks for the Analytics tab
+    
+    created, completed and deadline are datetime64[s] columns holding the
+    tasks' naive local times, with NaT for missing values; priority is an
+    int8 column. The columns are filled once from the engine and then kept
+    current from its change log, so refresh only touches changed tasks.
+    Rows of deleted tasks stay in place but are masked out by live.
+    
+    Every statistic is computed with vectorized operations over the
+    columns; none of them loops over tasks in Python.
+    """
+    COLUMNS = {
+        "created": "datetime64[s]",
+        "completed": "datetime64[s]",
+        "deadline": "datetime64[s]",
+        "priority": "int8",
+        "live": "bool"
+    }
+    PRIORITIES = 3
+    COMPLETION_EDGES = [0, 1, 4, 24, 72, 168, 336, 720]
+    COMPLETION_LABELS = ["<1h", "1-4h", "4h-1d", "1-3d", "3-7d", "1-2w", "2-4w", "30d+"]
+    AGING_EDGES = [0, 1, 3, 7, 14, 30]
+    AGING_LABELS = ["<1d", "1-3d", "3-7d", "1-2w", "2-4w", "30d+"]
+    EPOCH = datetime(1970, 1, 1)
+    SECOND = timedelta(seconds=1)
+    NAT = -2 ** 63
+    
+    def __init__(self, engine):
+        if np is None:
+            raise ImportError("numpy is required for task analytics")
+        self.engine = engine
+        self.rows = {}
+        self.size = 0
+        self.change_log = None
+        self.seq = 0
+        self._allocate(1024, keep=False)
+        
+    def _allocate(self, capacity, keep=True):
+        """Replace the columns with capacity rows, copying the old rows if keep"""
+        for name, dtype in self.COLUMNS.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if keep:
+                old = getattr(self, name)
+                column[:len(old)] = old
+            setattr(self, name, column)
+            
+    def _store(self, tasks):
+        """Write tasks into their rows, appending rows for new ids"""
+        if not tasks:
+            return
+        indexes = []
+        for task in tasks:
+            index = self.rows.get(task.id)
+            if index is None:
+                index = self.rows[task.id] = self.size
+                self.size += 1
+            indexes.append(index)
+        if self.size > len(self.live):
+            self._allocate(max(self.size, 2 * len(self.live)))
+            
+        indexes = np.array(indexes)
+        self.created[indexes] = self._times([t.creation_time for t in tasks])
+        self.completed[indexes] = self._times([t.completion_time for t in tasks])
+        self.deadline[indexes] = self._times([t.deadline for t in tasks])
+        self.priority[indexes] = [t.priority for t in tasks]
+        self.live[indexes] = True
+        
+    @classmethod
+    def _times(cls, times):
+        """Convert naive datetimes, or None, to a datetime64[s] array
+        
+        Goes through int64 seconds, which is far faster than letting NumPy
+        convert datetime objects one by one.
+        """
+        seconds = ((t - cls.EPOCH) // cls.SECOND if t else cls.NAT for t in times)
+        return np.fromiter(seconds, np.int64, len(times)).view("datetime64[s]")
+        
+    def refresh(self):
+        """Bring the columns up to date with the engine"""
+        engine = self.engine
+        with engine.lock:
+            if engine.change_log is not self.change_log:
+                self.rows.clear()
+                self.size = 0
+                tasks = engine.list_tasks("all")
+                self._allocate(max(1024, 2 * len(tasks)), keep=False)
+                self._store(tasks)
+            elif engine.change_seq != self.seq:
+                delta = engine.changes_since(self.seq)
+                changed = (engine.tasks_by_id.get(record["id"]) for record in delta["tasks"] + delta["completed"])
+                self._store([task for task in changed if task is not None])
+                dead = [self.rows[task_id] for task_id in [*delta["deleted"], *delta["archived"]] if task_id in self.rows]
+                self.live[dead] = False
+            self.change_log = engine.change_log
+            self.seq = engine.change_seq
+            
+    def _view(self):
+        live = self.live[:self.size]
+        return (
+            self.created[:self.size][live],
+            self.completed[:self.size][live],
+            self.deadline[:self.size][live],
+            self.priority[:self.size][live]
+        )
+        
+    @staticmethod
+    def _now(now):
+        return np.datetime64(now or datetime.now(), "s")
+        
+    @staticmethod
+    def _buckets(times, period, periods, now):
+        """Map times to period indexes ending with the period containing now
+        
+        Returns a mask of the times inside the window, their period
+        indexes, and the first day of each period. Weeks start on Monday.
+        """
+        step = 7 if period == "week" else 1
+        # Day 0 (1970-01-01) is a Thursday; shifting by 3 makes weeks start on Monday
+        shift = 3 if period == "week" else 0
+        days = times.astype("datetime64[D]").astype(np.int64)
+        current = (np.datetime64(now, "D").astype(np.int64) + shift) // step
+        first = current - periods + 1
+        buckets = (days + shift) // step - first
+        inside = ~np.isnat(times) & (buckets >= 0) & (buckets < periods)
+        starts = (np.arange(first, current + 1) * step - shift).astype("datetime64[D]")
+        return inside, buckets[inside], starts
+        
+    def completion_times(self):
+        """Histogram completion durations in hours
+        
+        Returns the bucket labels, counts, and the median and 90th
+        percentile durations in hours (NaN if nothing was completed).
+        """
+        created, completed, _, _ = self._view()
+        hours = (completed - created) / np.timedelta64(1, "h")
+        hours = hours[~np.isnan(hours)]
+        edges = self.COMPLETION_EDGES + [np.inf]
+        counts, _ = np.histogram(np.clip(hours, 0, None), bins=edges)
+        median, p90 = np.percentile(hours, [50, 90]) if hours.size else (np.nan, np.nan)
+        return self.COMPLETION_LABELS, counts, median, p90
+        
+    def throughput(self, period="day", periods=30, now=None):
+        """Count tasks created and completed per day or week
+        
+        Returns the first day of each period and the created and completed
+        counts, oldest period first.
+        """
+        now = self._now(now)
+        created, completed, _, _ = self._view()
+        _, created_buckets, starts = self._buckets(created, period, periods, now)
+        _, completed_buckets, _ = self._buckets(completed, period, periods, now)
+        return (
+            starts,
+            np.bincount(created_buckets, minlength=periods),
+            np.bincount(completed_buckets, minlength=periods)
+        )
+        
+    def overdue_aging(self, now=None):
+        """Histogram how many days open tasks are past their deadline"""
+        now = self._now(now)
+        _, completed, deadline, _ = self._view()
+        overdue = np.isnat(completed) & (deadline < now)
+        days = (now - deadline[overdue]) / np.timedelta64(1, "D")
+        counts, _ = np.histogram(days, bins=self.AGING_EDGES + [np.inf])
+        return self.AGING_LABELS, counts
+        
+    def priority_mix(self, period="day", periods=30, now=None):
+        """Count tasks created per period and priority
+        
+        Returns the first day of each period and a (periods, PRIORITIES)
+        array of counts.
+        """
+        now = self._now(now)
+        created, _, _, priority = self._view()
+        inside, buckets, starts = self._buckets(created, period, periods, now)
+        priorities = np.clip(priority[inside], 0, self.PRIORITIES - 1)
+        counts = np.bincount(buckets * self.PRIORITIES + priorities, minlength=periods * self.PRIORITIES)
+        return starts, counts.reshape(periods, self.PRIORITIES)
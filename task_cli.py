@@ -0,0 +1,234 @@
+"""Headless command line for scripts and shell loops
+
+    python task_cli.py add "Pay invoice" -p 1 --deadline 2025-07-01 --tag work
+    printf 'one\\ntwo\\n' | python task_cli.py add -       # one task per line
+    python task_cli.py list --status all --json
+    python task_cli.py query "due:today"
+    python task_cli.py complete ID [ID ...]
+    python task_cli.py block ID BLOCKER_ID [...]           # ID waits on the blockers
+    python task_cli.py list --status ready
+    python task_cli.py next --limit 5                     # most urgent unblocked tasks
+    python task_cli.py dupes --status all                 # groups of near-duplicate tasks
+    python task_cli.py note ID                            # print the task's note
+    python task_cli.py note ID "Call back after 3pm"      # replace it; '-' reads stdin
+    python task_cli.py import backup.json
+    python task_cli.py export > backup.json
+    python task_cli.py stats
+
+Only task_engine is imported, never tkinter, ttkbootstrap or PIL. Each
+invocation loads the store once and applies every operation it was
+given; add, complete, block, note and import then save once at the end.
+An error stops the batch but what was applied before it is still saved.
+Listings are written a line at a time as tasks are visited.
+"""
+import argparse
+import json
+import os
+import sys
+
+from task_engine import TaskEngine
+
+
+def read_items(values):
+    """Return values, reading one item per non-empty stdin line in place of '-'"""
+    for value in values:
+        if value == "-":
+            for line in sys.stdin:
+                line = line.strip()
+                if line:
+                    yield line
+        else:
+            yield value
+
+
+def format_task(engine, task, as_json):
+    if as_json:
+        return json.dumps(engine.record_for(task))
+    deadline = task.deadline.strftime("%Y-%m-%d %H:%M") if task.deadline else "-"
+    return f"{task.id}\t{'x' if task.completion_time else ' '}\tp{task.priority}\t{deadline}\t{task.content}"
+
+
+def write_tasks(engine, tasks, limit, as_json, out):
+    for count, task in enumerate(tasks):
+        if limit is not None and count >= limit:
+            break
+        out.write(format_task(engine, task, as_json) + "\n")
+
+
+def add(engine, args, out):
+    deadline = TaskEngine.parse_deadline(args.deadline)
+    for content in read_items(args.content or ["-"]):
+        task = engine.add_task(content, priority=args.priority, deadline=deadline, tags=args.tag, category=args.category)
+        out.write(task.id + "\n")
+        for other, similarity in engine.find_duplicates(content, args.tag, exclude=task, limit=1):
+            print(f"Warning: {task.id} looks like {other.id} ({similarity:.0%} similar): {other.content}", file=sys.stderr)
+
+
+def complete(engine, args, out):
+    missing = 0
+    for task_id in read_items(args.ids or ["-"]):
+        task = engine.tasks_by_id.get(task_id)
+        if task is None:
+            print(f"No task with id {task_id!r}", file=sys.stderr)
+            missing += 1
+        elif task.completion_time is None:
+            engine.complete_task(task)
+            out.write(task_id + "\n")
+    return 1 if missing else 0
+
+
+def block(engine, args, out):
+    task = engine.get_task(args.id)
+    engine.set_blockers(task, [engine.get_task(blocker).id for blocker in args.blockers])
+    path = engine.critical_path(task)
+    out.write(f"{len(path)} open tasks on the critical path to {task.id}\n")
+
+
+def note(engine, args, out):
+    task = engine.get_task(args.id)
+    if args.text is None:
+        text = engine.get_note(task)
+        out.write(text + ("\n" if text and not text.endswith("\n") else ""))
+    else:
+        engine.set_note(task, sys.stdin.read() if args.text == "-" else args.text)
+
+
+def list_tasks(engine, args, out):
+    with engine.lock:
+        write_tasks(engine, engine.list_tasks(args.status), args.limit, args.json, out)
+
+
+def query(engine, args, out):
+    with engine.lock:
+        write_tasks(engine, engine.run_query(args.query), args.limit, args.json, out)
+
+
+def next_tasks(engine, args, out):
+    with engine.lock:
+        for task in engine.next_tasks(args.limit):
+            line = format_task(engine, task, args.json)
+            out.write(line + "\n" if args.json else f"{line}\t(effective {engine.effective_priority(task)})\n")
+
+
+def import_tasks(engine, args, out):
+    engine.import_file(args.file)
+    out.write(f"{engine.task_list.size + engine.completed_tasks.size} tasks imported\n")
+    groups = engine.duplicate_report()
+    if groups:
+        print(f"Warning: {sum(map(len, groups))} open tasks look like near-duplicates; see 'dupes'", file=sys.stderr)
+
+
+def dupes(engine, args, out):
+    with engine.lock:
+        for group in engine.duplicate_report(args.status, args.threshold):
+            if args.json:
+                out.write(json.dumps([task.id for task in group]) + "\n")
+            else:
+                out.write("\n".join(format_task(engine, task, False) for task in group) + "\n\n")
+
+
+def export(engine, args, out):
+    if args.file == "-":
+        engine.write_data(out)
+    else:
+        engine.export_file(args.file)
+
+
+def stats(engine, args, out):
+    out.write(json.dumps(engine.stats(), indent=None if args.json else 2) + "\n")
+
+
+WRITES = (add, complete, block, note, import_tasks)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Work with the task store without the GUI")
+    parser.add_argument("--data", default=TaskEngine.DATA_FILE, help="data file to use")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    command = commands.add_parser("add", help="add tasks; '-' or no content reads one per stdin line")
+    command.add_argument("content", nargs="*")
+    command.add_argument("-p", "--priority", type=int, default=0, choices=(0, 1, 2))
+    command.add_argument("--deadline", help="ISO date and time")
+    command.add_argument("--tag", action="append", default=[])
+    command.add_argument("--category")
+    command.set_defaults(run=add)
+    
+    command = commands.add_parser("complete", help="complete tasks by id; '-' or no ids reads stdin")
+    command.add_argument("ids", nargs="*")
+    command.set_defaults(run=complete)
+    
+    command = commands.add_parser("block", help="make a task wait on other tasks; no blockers clears them")
+    command.add_argument("id")
+    command.add_argument("blockers", nargs="*")
+    command.set_defaults(run=block)
+    
+    command = commands.add_parser("note", help="print a task's note, or replace it with TEXT; '-' reads stdin")
+    command.add_argument("id")
+    command.add_argument("text", nargs="?")
+    command.set_defaults(run=note)
+    
+    command = commands.add_parser("list", help="list top-level tasks; ready ones are open and not blocked")
+    command.add_argument("--status", default="open", choices=("open", "ready", "done", "all"))
+    command.set_defaults(run=list_tasks)
+    
+    command = commands.add_parser("query", help="list tasks matching a query such as 'priority<=1 due<7d'")
+    command.add_argument("query")
+    command.set_defaults(run=query)
+    
+    command = commands.add_parser("dupes", help="list groups of probable near-duplicates by content and tags")
+    command.add_argument("--status", default="open", choices=("open", "done", "all"))
+    command.add_argument("--threshold", type=float, help="estimated similarity needed, 0 to 1 (default 0.7)")
+    command.add_argument("--json", action="store_true", help="one JSON list of ids per group")
+    command.set_defaults(run=dupes)
+    
+    command = commands.add_parser("next", help="list the most urgent unblocked tasks by effective priority")
+    command.set_defaults(run=next_tasks)
+    
+    for name in ("list", "query", "next"):
+        commands.choices[name].add_argument("--limit", type=int)
+        commands.choices[name].add_argument("--json", action="store_true", help="one JSON object per line")
+        
+    command = commands.add_parser("import", help="replace the store with an exported file")
+    command.add_argument("file")
+    command.set_defaults(run=import_tasks)
+    
+    command = commands.add_parser("export", help="write the store to a file, or stdout by default")
+    command.add_argument("file", nargs="?", default="-")
+    command.set_defaults(run=export)
+    
+    command = commands.add_parser("stats", help="print counts and total completion time")
+    command.add_argument("--json", action="store_true", help="print on one line")
+    command.set_defaults(run=stats)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    engine = TaskEngine(args.data)
+    out = sys.stdout
+    loaded = False
+    try:
+        engine.load()
+        loaded = True
+        status = args.run(engine, args, out)
+        out.flush()
+    except BrokenPipeError:
+        # The reader (head, say) went away; stop quietly like other shell tools
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        status = 0
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        status = 1
+    # Operations applied before an error are kept; a store that failed to load is never overwritten
+    if loaded and args.run in WRITES:
+        try:
+            engine.save()
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    return status or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
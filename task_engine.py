@@ -0,0 +1,3768 @@
+import json
+import mmap
+import os
+import threading
+import functools
+import re
+import sys
+import time
+import shlex
+import uuid
+import heapq
+import bisect
+import calendar
+import random
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from collections import deque, OrderedDict
+from itertools import islice
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+class TagDictionary:
+    """Interns tag names to small integer ids shared by every task
+    
+    Tasks store their tags as a tuple of ids in the order they were given,
+    so per-task tag storage stays a few small ints however many tags exist.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.folded = {}
+        self.lock = threading.Lock()
+        
+    def intern(self, name):
+        """Return the id for a tag name, assigning a new one if needed
+        
+        Shared by every engine, so new ids are assigned under a lock.
+        """
+        tag_id = self.ids.get(name)
+        if tag_id is None:
+            with self.lock:
+                tag_id = self.ids.get(name)
+                if tag_id is None:
+                    tag_id = len(self.names)
+                    name = sys.intern(name)
+                    self.names.append(name)
+                    self.folded.setdefault(name.lower(), []).append(tag_id)
+                    self.ids[name] = tag_id
+        return tag_id
+        
+    def ids_for(self, name):
+        """Return the ids of all tags equal to name, ignoring case"""
+        return self.folded.get(name.lower(), [])
+        
+    def matching(self, term):
+        """Return the set of ids of tags whose lowercase name contains term
+        
+        Works on a snapshot, since a loader thread may intern tags meanwhile.
+        """
+        with self.lock:
+            folded = [(folded_name, list(tag_ids)) for folded_name, tag_ids in self.folded.items()]
+        return {tag_id for folded_name, tag_ids in folded if term in folded_name for tag_id in tag_ids}
+        
+    def encode(self, tags):
+        return tuple(dict.fromkeys(self.intern(tag) for tag in tags))
+        
+    def decode(self, tag_ids):
+        return [self.names[tag_id] for tag_id in tag_ids]
+
+
+class RecurrenceRule:
+    """Parsed recurrence such as 'daily', 'every 2 weeks', 'weekdays' or a
+    cron expression like '0 9 * * 1-5'
+    
+    A rule only describes the series; occurrences are computed on demand from
+    an anchor datetime, so a recurring task costs the same to store whether
+    it repeats ten times or forever.
+    """
+    UNITS = {"day": "days", "week": "weeks", "month": "months", "year": "years"}
+    NAMED = {
+        "daily": ("days", 1),
+        "weekly": ("weeks", 1),
+        "monthly": ("months", 1),
+        "yearly": ("years", 1),
+        "annually": ("years", 1),
+        "weekdays": ("days", 1)
+    }
+    _cache = {}
+    
+    def __init__(self, text):
+        self.text = text.strip()
+        self.unit = None
+        self.interval = 1
+        self.weekdays = None
+        self.cron = None
+        
+        spec = self.text.lower()
+        if spec.startswith("cron "):
+            spec = spec[5:].strip()
+        match = re.match(r"^every\s+(\d+\s+)?(day|week|month|year)s?$", spec)
+        if spec in self.NAMED:
+            self.unit, self.interval = self.NAMED[spec]
+            if spec == "weekdays":
+                self.weekdays = {0, 1, 2, 3, 4}
+        elif match:
+            self.unit = self.UNITS[match.group(2)]
+            self.interval = int(match.group(1) or 1)
+            if self.interval < 1:
+                raise ValueError("Recurrence interval must be at least 1")
+        elif len(spec.split()) == 5:
+            self.cron = self._parse_cron(spec.split())
+        else:
+            raise ValueError(f"Unknown recurrence '{text}'")
+            
+    @classmethod
+    def parse(cls, text):
+        """Return a shared, parsed rule for text"""
+        rule = cls._cache.get(text)
+        if rule is None:
+            rule = cls._cache[text] = cls(text)
+        return rule
+        
+    @staticmethod
+    def _parse_cron_field(spec, low, high):
+        values = set()
+        for part in spec.split(","):
+            step = 1
+            if "/" in part:
+                part, step_str = part.split("/", 1)
+                step = int(step_str)
+                if step < 1:
+                    raise ValueError(f"Invalid cron step in '{spec}'")
+            if part == "*":
+                first, last = low, high
+            elif "-" in part:
+                first, last = (int(value) for value in part.split("-", 1))
+            else:
+                first = int(part)
+                last = high if step > 1 else first
+            if first < low or last > high or first > last:
+                raise ValueError(f"Cron field '{spec}' out of range {low}-{high}")
+            values.update(range(first, last + 1, step))
+        return sorted(values)
+        
+    def _parse_cron(self, fields):
+        minute, hour, day, month, weekday = fields
+        try:
+            return {
+                "minutes": self._parse_cron_field(minute, 0, 59),
+                "hours": self._parse_cron_field(hour, 0, 23),
+                "days": set(self._parse_cron_field(day, 1, 31)),
+                "months": set(self._parse_cron_field(month, 1, 12)),
+                
+                "weekdays": {(value - 1) % 7 for value in self._parse_cron_field(weekday, 0, 7)},
+                "any_day": day == "*",
+                "any_weekday": weekday == "*"
+            }
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression: {e}")
+            
+    def _cron_day_matches(self, day):
+        cron = self.cron
+        if day.month not in cron["months"]:
+            return False
+        if cron["any_day"] and cron["any_weekday"]:
+            return True
+        if cron["any_day"]:
+            return day.weekday() in cron["weekdays"]
+        if cron["any_weekday"]:
+            return day.day in cron["days"]
+        return day.day in cron["days"] or day.weekday() in cron["weekdays"]
+        
+    def _cron_next(self, after):
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 5):
+            if self._cron_day_matches(day):
+                for hour in self.cron["hours"]:
+                    if day == start.date() and hour < start.hour:
+                        continue
+                    for minute in self.cron["minutes"]:
+                        if day == start.date() and hour == start.hour and minute < start.minute:
+                            continue
+                        return datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute)
+            day += timedelta(days=1)
+        return None
+        
+    @staticmethod
+    def add_months(moment, months):
+        """Add months to a datetime, clamping the day to the target month's length"""
+        index = moment.year * 12 + moment.month - 1 + months
+        year, month = divmod(index, 12)
+        day = min(moment.day, calendar.monthrange(year, month + 1)[1])
+        return moment.replace(year=year, month=month + 1, day=day)
+        
+    def next_after(self, anchor, after):
+        """Return the first occurrence of the series anchored at anchor that is
+        strictly after `after`, or None if there is none"""
+        if self.cron:
+            return self._cron_next(max(after, anchor - timedelta(microseconds=1)))
+        if after < anchor:
+            occurrence = anchor
+        elif self.unit in ("days", "weeks"):
+            step = timedelta(days=self.interval * (7 if self.unit == "weeks" else 1))
+            occurrence = anchor + step * ((after - anchor) // step + 1)
+        else:
+            months = self.interval * (12 if self.unit == "years" else 1)
+            elapsed = (after.year - anchor.year) * 12 + after.month - anchor.month
+            count = max(0, elapsed // months)
+            occurrence = self.add_months(anchor, count * months)
+            while occurrence <= after:
+                count += 1
+                occurrence = self.add_months(anchor, count * months)
+                
+        if self.weekdays is not None:
+            while occurrence.weekday() not in self.weekdays:
+                occurrence += timedelta(days=1)
+        return occurrence
+        
+    def occurrences(self, anchor, start, end):
+        """Lazily yield the occurrences that fall in [start, end)"""
+        occurrence = self.next_after(anchor, start - timedelta(microseconds=1))
+        while occurrence is not None and occurrence < end:
+            yield occurrence
+            occurrence = self.next_after(anchor, occurrence)
+            
+    def days(self, anchor, start, end):
+        """Lazily yield (first occurrence, count) for each day in [start, end) that has any
+        
+        A cron rule firing several times a day is counted per day from its
+        times of day, so a '* * * * *' rule costs one step per day rather
+        than one per minute.
+        """
+        times = []
+        if self.cron:
+            times = sorted(hour * 60 + minute for hour in self.cron["hours"] for minute in self.cron["minutes"])
+        if len(times) < 2:
+            for occurrence in self.occurrences(anchor, start, end):
+                yield occurrence, 1
+            return
+            
+        minute = timedelta(minutes=1)
+        lower = max(start, anchor)
+        day = lower.date()
+        midnight = datetime.combine(day, datetime.min.time())
+        while midnight < end:
+            if self._cron_day_matches(day):
+                first = bisect.bisect_left(times, -((midnight - lower) // minute)) if lower > midnight else 0
+                last = bisect.bisect_left(times, -((midnight - end) // minute)) if end < midnight + timedelta(days=1) else len(times)
+                if first < last:
+                    yield midnight + times[first] * minute, last - first
+            day += timedelta(days=1)
+            midnight += timedelta(days=1)
+
+
+class FileLock:
+    """Advisory inter-process lock held on a companion lock file"""
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self.handle = None
+        
+    def __enter__(self):
+        self.handle = open(self.path, "a+")
+        give_up = time.monotonic() + self.timeout
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    self.handle.seek(0)
+                    msvcrt.locking(self.handle.fileno(), msvcrt.LK_NBLCK, 1)
+                return self
+            except OSError:
+                if time.monotonic() > give_up:
+                    self.handle.close()
+                    raise TimeoutError(f"Timed out waiting for lock on {self.path}")
+                time.sleep(0.05)
+                
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+            else:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.handle.close()
+            
+    @staticmethod
+    def signature(path):
+        """Cheap change detector for a file: (mtime, size, inode), or None if missing"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class ArchiveSegment:
+    """Append-only cold file of archived completed tasks, one JSON line each
+    
+    Only the first size bytes count. The data file records size and count,
+    so a save that dies between appending here and replacing the data file
+    leaves a tail that the next load cuts off. Pages are read backwards from
+    the end, newest first, and only the bytes of the requested page and the
+    pages after it are ever touched.
+    """
+    PAGE = 50
+    BLOCK = 1 << 16
+    
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.count = 0
+        self.ids = None
+        self.marks = [0]
+        
+    def restore(self, size, count):
+        """Adopt the committed size from a freshly loaded data file, dropping any uncommitted tail
+        
+        A missing or shorter file (say, a data file copied without its
+        archive) starts a fresh archive.
+        """
+        actual = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if actual < size:
+            size = count = 0
+        self.size, self.count = size, count
+        self.ids = None
+        self.marks = [size]
+        if actual > size:
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+                
+    def advance(self, size, count):
+        """Adopt a larger committed size written by another instance; returns the new ids"""
+        if size <= self.size:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.size)
+            added = [self._line_id(line) for line in f.read(size - self.size).splitlines()]
+        if self.ids is not None:
+            self.ids.update(added)
+        self.size, self.count = size, count
+        self.marks = [size]
+        return added
+        
+    def append(self, records):
+        """Append records after the committed end and flush them to disk
+        
+        Each record is {"id", "task", "subtasks", "categories"}; the id
+        comes first so ids can be read without parsing whole lines.
+        """
+        lines = "".join(json.dumps(record) + "\n" for record in records).encode()
+        with open(self.path, "r+b" if os.path.exists(self.path) else "wb") as f:
+            f.seek(self.size)
+            f.truncate()
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        if self.ids is not None:
+            self.ids.update(record["id"] for record in records)
+        self.size += len(lines)
+        self.count += len(records)
+        self.marks = [self.size]
+        
+    @staticmethod
+    def _line_id(line):
+        # Lines start with {"id": "<id>"
+        return line[8:line.index(b'"', 8)].decode()
+        
+    def __contains__(self, task_id):
+        """Whether task_id was archived; the first call reads every id once"""
+        if self.ids is None:
+            self.ids = set()
+            if self.size:
+                with open(self.path, "rb") as f:
+                    self.ids.update(self._line_id(line) for line in f.read(self.size).splitlines())
+        return task_id in self.ids
+        
+    def _back(self, f, end, lines):
+        """Return the offset of the line that starts lines lines before end"""
+        position = end - 1
+        while lines and position > 0:
+            start = max(0, position - self.BLOCK)
+            f.seek(start)
+            block = f.read(position - start)
+            index = len(block)
+            while lines:
+                index = block.rfind(b"\n", 0, index)
+                if index < 0:
+                    break
+                lines -= 1
+                if not lines:
+                    return start + index + 1
+            position = start
+        return 0 if lines else end
+        
+    def read(self, skip, limit):
+        """Return up to limit archived records, newest first, after skipping the newest skip"""
+        if skip >= self.count or limit <= 0:
+            return []
+        with open(self.path, "rb") as f:
+            while len(self.marks) <= skip // self.PAGE:
+                self.marks.append(self._back(f, self.marks[-1], self.PAGE))
+            end = self._back(f, self.marks[skip // self.PAGE], skip % self.PAGE)
+            start = self._back(f, end, limit)
+            f.seek(start)
+            lines = f.read(end - start).splitlines()
+        return [json.loads(line) for line in reversed(lines)]
+
+
+class NoteStore:
+    """Append-only blob file of task notes, read through a memory map
+    
+    A note is addressed by the (offset, length) of its UTF-8 bytes, which
+    its task keeps as note_ref and the data file saves. Bytes are never
+    rewritten, so a reference stays valid for every instance sharing the
+    file; an edited note is appended again and its old bytes stay behind.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.map = None
+        
+    def _view(self, end):
+        """Map the file, mapping it again if it has grown past end since"""
+        if self.map is None or len(self.map) < end:
+            self.close()
+            with open(self.path, "rb") as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+        
+    def read(self, ref):
+        offset, length = ref
+        return self._view(offset + length)[offset:offset + length].decode() if length else ""
+        
+    def append(self, texts):
+        """Append texts and flush them to disk; returns their references"""
+        if not texts:
+            return []
+        self.close()
+        refs = []
+        with open(self.path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            for text in texts:
+                data = text.encode()
+                f.write(data)
+                refs.append((offset, len(data)))
+                offset += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return refs
+        
+    # Characters whose lowercase is another character but which are neither
+    # its upper nor title case
+    FOLDS = {"i": "\u0130", "\u0307": "\u0130", "\u03b8": "\u03f4", "\xdf": "\u1e9e",
+             "\u03c9": "\u2126", "k": "\u212a", "\xe5": "\u212b"}
+    
+    def find(self, term):
+        """Return the sorted (start, end) byte spans that may spell a lowercase term
+        
+        Scans the mapped file in C without decoding any note. Every spelling
+        whose str.lower() contains term is found, overlapping ones included,
+        but a span can be a false positive that the caller has to verify.
+        """
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if not term or not size:
+            return []
+        pattern = b"".join(
+            b"(?:" + b"|".join(re.escape(variant.encode()) for variant in sorted(
+                {char, char.upper(), char.title(), *self.FOLDS.get(char, "")}, key=len
+            )) + b")"
+            for char in term
+        )
+        finder = re.compile(b"(?=(" + pattern + b"))")
+        return [match.span(1) for match in finder.finditer(self._view(size))]
+        
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+
+class Task:
+    """Node class for task linked list implementation"""
+    tag_dictionary = TagDictionary()
+    
+    def __init__(self, content, priority=0, deadline=None, tags=None, subtasks=None):
+        self.id = uuid.uuid4().hex
+        self.content = content
+        self.priority = priority  
+        self.deadline = deadline
+        self.completion_time = None
+        self.tags = tags or []
+        self.parent = None
+        self.subtasks = []
+        self.subtask_total = 0
+        self.subtask_done = 0
+        self.next = None
+        self.prev = None
+        self.creation_time = datetime.now()
+        self.reminder_time = None
+        self.recurrence = None
+        self.recurrence_anchor = None
+        self.version = 1
+        self.origin = ""
+        self.seq = 0
+        self.blocked_by = []
+        self.note_ref = None
+        self.note_text = None
+        
+        for subtask in subtasks or []:
+            self.add_subtask(Task(subtask) if isinstance(subtask, str) else subtask)
+
+    def __lt__(self, other):
+        
+        if self.priority != other.priority:
+            return self.priority < other.priority
+        if self.deadline and other.deadline:
+            return self.deadline < other.deadline
+        if self.deadline:
+            return True
+        return False
+        
+    def touch(self):
+        """Bump the version after a change so merges can pick the newest copy"""
+        self.version += 1
+        
+    def stamp(self):
+        """The (Lamport time, replica) pair that orders concurrent copies of this task"""
+        return (self.version, self.origin)
+        
+    @property
+    def rule(self):
+        """The parsed recurrence rule, shared between tasks with the same text"""
+        return RecurrenceRule.parse(self.recurrence) if self.recurrence else None
+        
+    def next_occurrence(self, after):
+        """Return the deadline of the occurrence following after, or None"""
+        if not self.recurrence:
+            return None
+        return self.rule.next_after(self.recurrence_anchor or self.deadline or after, after)
+        
+    @property
+    def tags(self):
+        return self.tag_dictionary.decode(self.tag_ids)
+        
+    @tags.setter
+    def tags(self, tags):
+        self.tag_ids = self.tag_dictionary.encode(tags)
+        
+    def _propagate(self, total_delta, done_delta):
+        """Roll a change in subtask counts up to every ancestor"""
+        node = self.parent
+        while node:
+            node.subtask_total += total_delta
+            node.subtask_done += done_delta
+            node = node.parent
+            
+    def add_subtask(self, child):
+        """Attach a child task, updating aggregate progress in O(depth)"""
+        child.parent = self
+        self.subtasks.append(child)
+        total_delta = 1 + child.subtask_total
+        done_delta = (1 if child.completion_time else 0) + child.subtask_done
+        self.subtask_total += total_delta
+        self.subtask_done += done_delta
+        self._propagate(total_delta, done_delta)
+        return child
+        
+    def remove_subtask(self, child):
+        """Detach a child task, updating aggregate progress in O(depth)"""
+        self.subtasks.remove(child)
+        child.parent = None
+        total_delta = 1 + child.subtask_total
+        done_delta = (1 if child.completion_time else 0) + child.subtask_done
+        self.subtask_total -= total_delta
+        self.subtask_done -= done_delta
+        self._propagate(-total_delta, -done_delta)
+        
+    def set_completion_time(self, completion_time):
+        """Set the completion time, rolling the done count up to ancestors"""
+        done_delta = (completion_time is not None) - (self.completion_time is not None)
+        self.completion_time = completion_time
+        if done_delta:
+            self._propagate(0, done_delta)
+            
+    def iter_descendants(self):
+        """Yield all subtasks in pre-order without recursion"""
+        stack = list(reversed(self.subtasks))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.subtasks))
+        
+    def to_dict(self):
+        """Convert task to dictionary for JSON serialization
+        
+        Subtasks are not inlined; each one is serialized separately with a
+        reference to its parent id.
+        """
+        return {
+            "id": self.id,
+            "parent": self.parent.id if self.parent else None,
+            "content": self.content,
+            "priority": self.priority,
+            "deadline": self.deadline.isoformat() if self.deadline else None,
+            "completion_time": self.completion_time.isoformat() if self.completion_time else None,
+            "tags": self.tags,
+            "creation_time": self.creation_time.isoformat(),
+            "reminder_time": self.reminder_time.isoformat() if self.reminder_time else None,
+            "recurrence": self.recurrence,
+            "recurrence_anchor": self.recurrence_anchor.isoformat() if self.recurrence_anchor else None,
+            "version": self.version,
+            "origin": self.origin,
+            "seq": self.seq,
+            "blocked_by": self.blocked_by,
+            "note": list(self.note_ref) if self.note_ref else self.note_text
+        }
+    
+    @staticmethod
+    def row_from_dict(data):
+        """Convert a serialized record into a compact, cheaply pickled tuple
+        
+        Worker processes use this to parse records in parallel; from_row
+        turns the tuple back into a task.
+        """
+        parse = lambda value: datetime.fromisoformat(value) if value else None
+        return (
+            data.get("id") or uuid.uuid4().hex,
+            data.get("parent"),
+            data["content"],
+            data["priority"],
+            parse(data["deadline"]),
+            parse(data["completion_time"]),
+            tuple(data["tags"]),
+            parse(data["creation_time"]),
+            parse(data["reminder_time"]),
+            data.get("recurrence"),
+            parse(data.get("recurrence_anchor")) if data.get("recurrence") else None,
+            data.get("version", 1),
+            data.get("origin", ""),
+            data.get("seq", 0),
+            tuple(data.get("blocked_by") or ()),
+            data.get("note")
+        )
+        
+    @classmethod
+    def from_row(cls, row):
+        """Create a Task from a row_from_dict tuple, skipping the work __init__ does"""
+        task = cls.__new__(cls)
+        (task.id, _, task.content, task.priority, task.deadline, task.completion_time, tags,
+         task.creation_time, task.reminder_time, task.recurrence, task.recurrence_anchor,
+         task.version, task.origin, task.seq, blocked_by, note) = row
+        task.tag_ids = cls.tag_dictionary.encode(tags)
+        task.blocked_by = list(blocked_by)
+        task.note_ref, task.note_text = cls.note_fields(note)
+        task.parent = None
+        task.subtasks = []
+        task.subtask_total = 0
+        task.subtask_done = 0
+        task.next = None
+        task.prev = None
+        return task
+        
+    @staticmethod
+    def note_fields(note):
+        """Split a serialized note into (note_ref, note_text)
+        
+        The data file holds an [offset, length] reference into the notes
+        file; exports and sync deltas carry the text itself, which stays
+        in memory until the next save appends it.
+        """
+        if isinstance(note, (list, tuple)):
+            return tuple(note), None
+        return None, note or None
+        
+    @classmethod
+    def from_dict(cls, data):
+        """Create a Task from dictionary data"""
+        task = cls.from_row(cls.row_from_dict(data))
+        for subtask in data.get("subtasks") or []:
+            task.add_subtask(Task(subtask) if isinstance(subtask, str) else subtask)
+        return task
+        
+    def apply_dict(self, data):
+        """Overwrite this task's fields in place with a newer serialized copy"""
+        self.content = data["content"]
+        self.priority = data["priority"]
+        self.deadline = datetime.fromisoformat(data["deadline"]) if data["deadline"] else None
+        self.tags = data["tags"]
+        completion_time = datetime.fromisoformat(data["completion_time"]) if data["completion_time"] else None
+        self.set_completion_time(completion_time)
+        self.reminder_time = datetime.fromisoformat(data["reminder_time"]) if data["reminder_time"] else None
+        self.recurrence = data.get("recurrence")
+        anchor = data.get("recurrence_anchor")
+        self.recurrence_anchor = datetime.fromisoformat(anchor) if anchor else None
+        self.version = data.get("version", 1)
+        self.origin = data.get("origin", "")
+        self.blocked_by = list(data.get("blocked_by") or [])
+        self.note_ref, self.note_text = self.note_fields(data.get("note"))
+
+
+class TaskLinkedList:
+    """Doubly linked list implementation for tasks
+    
+    Each appended task is stamped with an increasing position, so tasks
+    found through an index can be put back in list order by sorting.
+    """
+    def __init__(self):
+        self.head = None
+        self.tail = None
+        self.size = 0
+        self.appended = 0
+        
+    def append(self, task):
+        """Add a task to the end of the list"""
+        task.next = None
+        task.prev = None
+        task.position = self.appended
+        self.appended += 1
+        if not self.head:
+            self.head = task
+            self.tail = task
+        else:
+            task.prev = self.tail
+            self.tail.next = task
+            self.tail = task
+        self.size += 1
+        
+    def pop(self, task):
+        """Remove a specific task from the list"""
+        if not task:
+            return None
+            
+        if task == self.head and task == self.tail:
+            self.head = None
+            self.tail = None
+        elif task == self.head:
+            self.head = task.next
+            if self.head:
+                self.head.prev = None
+        elif task == self.tail:
+            self.tail = task.prev
+            if self.tail:
+                self.tail.next = None
+        else:
+            task.prev.next = task.next
+            task.next.prev = task.prev
+            
+        task.next = None
+        task.prev = None
+        self.size -= 1
+        return task
+        
+    def __iter__(self):
+        """Iterate over tasks from head to tail without building a list"""
+        current = self.head
+        while current:
+            next_task = current.next
+            yield current
+            current = next_task
+            
+    def __reversed__(self):
+        """Iterate over tasks from tail to head"""
+        current = self.tail
+        while current:
+            prev_task = current.prev
+            yield current
+            current = prev_task
+            
+    def get_all_tasks(self):
+        """Return all tasks as a list"""
+        tasks = []
+        current = self.head
+        while current:
+            tasks.append(current)
+            current = current.next
+        return tasks
+        
+    def binary_search(self, target_content):
+        """Search for a task by content using binary search (after sorting)"""
+        tasks = sorted(self.get_all_tasks(), key=lambda x: x.content)
+        
+        left, right = 0, len(tasks) - 1
+        while left <= right:
+            mid = (left + right) // 2
+            if tasks[mid].content == target_content:
+                return tasks[mid]
+            elif tasks[mid].content < target_content:
+                left = mid + 1
+            else:
+                right = mid - 1
+                
+        return None
+        
+    def merge_sort(self, key_func=None):
+        """Sort tasks using merge sort and return sorted list"""
+        tasks = self.get_all_tasks()
+        if not key_func:
+            key_func = lambda x: x.content
+            
+        if len(tasks) <= 1:
+            return tasks
+            
+        def merge_sort_internal(arr):
+            if len(arr) <= 1:
+                return arr
+                
+            mid = len(arr) // 2
+            left = merge_sort_internal(arr[:mid])
+            right = merge_sort_internal(arr[mid:])
+            
+            return merge(left, right)
+            
+        def merge(left, right):
+            result = []
+            i = j = 0
+            
+            while i < len(left) and j < len(right):
+                if key_func(left[i]) <= key_func(right[j]):
+                    result.append(left[i])
+                    i += 1
+                else:
+                    result.append(right[j])
+                    j += 1
+                    
+            result.extend(left[i:])
+            result.extend(right[j:])
+            return result
+            
+        return merge_sort_internal(tasks)
+
+
+class DeadlineIndex:
+    """Sorted deadline index for calendar range queries"""
+    def __init__(self):
+        self.keys = []
+        self.tasks = []
+        self.entries = {}
+        self.day_counts = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, task):
+        return task in self.entries
+
+    def add(self, task):
+        """Index a task by its deadline (tasks without a deadline are skipped)"""
+        if not task.deadline or task in self.entries:
+            return
+        self.counter += 1
+        key = (task.deadline, self.counter)
+        pos = bisect.bisect_right(self.keys, key)
+        self.keys.insert(pos, key)
+        self.tasks.insert(pos, task)
+        self.entries[task] = key
+
+        day = task.deadline.date()
+        self.day_counts[day] = self.day_counts.get(day, 0) + 1
+
+    def add_many(self, tasks):
+        """Index many tasks with a single sort instead of one insertion each"""
+        entries = list(zip(self.keys, self.tasks))
+        for task in tasks:
+            if not task.deadline or task in self.entries:
+                continue
+            self.counter += 1
+            key = (task.deadline, self.counter)
+            entries.append((key, task))
+            self.entries[task] = key
+            day = task.deadline.date()
+            self.day_counts[day] = self.day_counts.get(day, 0) + 1
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [key for key, _ in entries]
+        self.tasks = [task for _, task in entries]
+
+    def remove(self, task):
+        """Remove a task from the index using the deadline it was indexed with"""
+        key = self.entries.pop(task, None)
+        if key is None:
+            return
+        pos = bisect.bisect_left(self.keys, key)
+        del self.keys[pos]
+        del self.tasks[pos]
+
+        day = key[0].date()
+        if self.day_counts[day] == 1:
+            del self.day_counts[day]
+        else:
+            self.day_counts[day] -= 1
+
+    def update(self, task):
+        """Re-index a task after its deadline changed"""
+        self.remove(task)
+        self.add(task)
+
+    def bounds(self, start, end):
+        """Return the slice bounds of deadlines in [start, end)"""
+        lo = bisect.bisect_left(self.keys, (start,))
+        hi = bisect.bisect_left(self.keys, (end,), lo)
+        return lo, hi
+
+    def range(self, start, end):
+        """Return tasks due in [start, end) ordered by deadline"""
+        lo, hi = self.bounds(start, end)
+        return self.tasks[lo:hi]
+
+    def count(self, start, end):
+        """Count tasks due in [start, end) without materializing them"""
+        lo, hi = self.bounds(start, end)
+        return hi - lo
+
+    def on_day(self, day):
+        """Return tasks due on a given date"""
+        start = datetime.combine(day, datetime.min.time())
+        return self.range(start, start + timedelta(days=1))
+
+    def count_by_day(self, first_day, last_day):
+        """Return {date: count} for days in [first_day, last_day) that have tasks"""
+        counts = {}
+        day = first_day
+        while day < last_day:
+            count = self.day_counts.get(day)
+            if count:
+                counts[day] = count
+            day += timedelta(days=1)
+        return counts
+
+
+class DeadlineTimer:
+    """Min-heap of pending deadlines that fires each task once when it becomes overdue
+    
+    Rescheduling or completing a task only invalidates its heap entry; stale
+    entries are skipped when they surface and compacted away when they pile
+    up. A tick with nothing due is a single peek at the heap top.
+    """
+    def __init__(self):
+        self.heap = []
+        self.armed = {}
+        self.overdue = set()
+        self.counter = 0
+        
+    def __len__(self):
+        return len(self.armed)
+        
+    def arm(self, task, now=None):
+        """Schedule (or reschedule) the deadline of an open task"""
+        self.disarm(task)
+        if task.deadline is None or task.completion_time is not None:
+            return
+        if task.deadline <= (now or datetime.now()):
+            self.overdue.add(task)
+            return
+        self.counter += 1
+        self.armed[task] = self.counter
+        heapq.heappush(self.heap, (task.deadline, self.counter, task))
+        
+    def disarm(self, task):
+        """Forget a task's deadline; its heap entry becomes stale"""
+        self.armed.pop(task, None)
+        self.overdue.discard(task)
+        
+    def tick(self, now=None):
+        """Return the tasks whose deadline passed since the previous tick"""
+        now = now or datetime.now()
+        heap = self.heap
+        fired = []
+        while heap and heap[0][0] <= now:
+            _, seq, task = heapq.heappop(heap)
+            if self.armed.get(task) == seq:
+                del self.armed[task]
+                self.overdue.add(task)
+                fired.append(task)
+                
+        if len(heap) > 2 * len(self.armed) + 64:
+            self.heap = [entry for entry in heap if self.armed.get(entry[2]) == entry[1]]
+            heapq.heapify(self.heap)
+        return fired
+        
+    def next_due(self):
+        """Return the earliest pending deadline, or None"""
+        heap = self.heap
+        while heap and self.armed.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+
+class UrgencyIndex:
+    """Open tasks ordered by effective priority, recomputed lazily as time passes
+    
+    The effective priority of a task is its base priority (0=High) minus
+    one step for every deadline threshold it has crossed (due within a day,
+    within an hour, overdue) and every age threshold (open for a week, for
+    a month), so it can go below 0. It only changes when the task crosses a
+    threshold, so each task is filed in a min-heap under the time of its
+    next crossing and refresh recomputes just the tasks whose time came.
+    Ties go to the earlier deadline, then the older task.
+    """
+    DEADLINE_STEPS = (timedelta(days=1), timedelta(hours=1), timedelta(0))
+    AGE_STEPS = (timedelta(days=7), timedelta(days=30))
+    
+    def __init__(self):
+        self.keys = []
+        self.tasks = []
+        self.entries = {}
+        self.heap = []
+        self.armed = {}
+        self.counter = 0
+        
+    def __len__(self):
+        return len(self.keys)
+        
+    def __contains__(self, task):
+        return task in self.entries
+        
+    @classmethod
+    def level(cls, task, now):
+        """Return a task's effective priority at now and when it next changes (or None)"""
+        boost = 0
+        changes = []
+        if task.deadline is not None:
+            remaining = task.deadline - now
+            for step in cls.DEADLINE_STEPS:
+                if remaining <= step:
+                    boost += 1
+                else:
+                    changes.append(task.deadline - step)
+        age = now - task.creation_time
+        for step in cls.AGE_STEPS:
+            if age >= step:
+                boost += 1
+            else:
+                changes.append(task.creation_time + step)
+        return task.priority - boost, min(changes, default=None)
+        
+    def _entry(self, task, now):
+        """Return a task's sort key and its heap entry, or None if it never changes again"""
+        effective, change = self.level(task, now)
+        self.counter += 1
+        self.entries[task] = key = (effective, task.deadline or datetime.max, task.creation_time, self.counter)
+        if change is None:
+            return key, None
+        self.armed[task] = self.counter
+        return key, (change, self.counter, task)
+        
+    def add(self, task, now=None):
+        """Index an open task, or re-index it after its priority or deadline changed"""
+        self.remove(task)
+        key, pending = self._entry(task, now or datetime.now())
+        if pending:
+            heapq.heappush(self.heap, pending)
+        pos = bisect.bisect_right(self.keys, key)
+        self.keys.insert(pos, key)
+        self.tasks.insert(pos, task)
+        
+    update = add
+    
+    def add_many(self, tasks, now=None):
+        """Index many open tasks with a single sort instead of one insertion each"""
+        now = now or datetime.now()
+        for task in tasks:
+            self.remove(task)
+        entries = list(zip(self.keys, self.tasks))
+        for task in tasks:
+            key, pending = self._entry(task, now)
+            entries.append((key, task))
+            if pending:
+                self.heap.append(pending)
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [key for key, _ in entries]
+        self.tasks = [task for _, task in entries]
+        heapq.heapify(self.heap)
+        
+    def remove(self, task):
+        """Forget a task; its heap entry becomes stale"""
+        key = self.entries.pop(task, None)
+        if key is None:
+            return
+        self.armed.pop(task, None)
+        pos = bisect.bisect_left(self.keys, key)
+        del self.keys[pos]
+        del self.tasks[pos]
+        
+    def refresh(self, now=None):
+        """Recompute the tasks that crossed a threshold since the last refresh and return them"""
+        now = now or datetime.now()
+        heap = self.heap
+        due = []
+        while heap and heap[0][0] <= now:
+            _, seq, task = heapq.heappop(heap)
+            if self.armed.get(task) == seq:
+                due.append(task)
+        for task in due:
+            self.add(task, now)
+            
+        if len(heap) > 2 * len(self.armed) + 64:
+            self.heap = [entry for entry in heap if self.armed.get(entry[2]) == entry[1]]
+            heapq.heapify(self.heap)
+        return due
+        
+    def next_change(self):
+        """Return when the next effective priority changes, or None"""
+        heap = self.heap
+        while heap and self.armed.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+        
+    def effective(self, task):
+        """Return the effective priority a task was last indexed with"""
+        key = self.entries.get(task)
+        return task.priority if key is None else key[0]
+        
+    def ordered(self):
+        """Return the open tasks, most urgent first"""
+        return list(self.tasks)
+
+
+class KanbanBoard:
+    """Per-column task buckets backing the Kanban view
+    
+    Each column keeps its cards in placement order next to a sorted list of
+    placement stamps, so a card is found by bisection and a window of cards
+    is a slice rather than a walk from the top of the column.
+    """
+    COLUMNS = [(0, "High"), (1, "Medium"), (2, "Low"), ("done", "Done")]
+
+    def __init__(self):
+        
+        self.stamps = {key: [] for key, _ in self.COLUMNS}
+        self.columns = {key: [] for key, _ in self.COLUMNS}
+        self.location = {}
+        self.counter = 0
+
+    @staticmethod
+    def column_for(task):
+        """Return the column key a task belongs to"""
+        if task.completion_time:
+            return "done"
+        return task.priority if task.priority in (0, 1, 2) else 2
+
+    def place(self, task):
+        """Add a task or move it to the end of the column matching its state"""
+        key = self.column_for(task)
+        current = self.location.get(task)
+        if current is not None:
+            if current[0] == key:
+                return
+            self.remove(task)
+        self.counter += 1
+        self.stamps[key].append(self.counter)
+        self.columns[key].append(task)
+        self.location[task] = (key, self.counter)
+
+    def remove(self, task):
+        """Remove a task from whichever column holds it"""
+        current = self.location.pop(task, None)
+        if current is not None:
+            key, stamp = current
+            pos = bisect.bisect_left(self.stamps[key], stamp)
+            del self.stamps[key][pos]
+            del self.columns[key][pos]
+
+    def count(self, key):
+        return len(self.columns[key])
+
+    def window(self, key, offset, limit):
+        """Return up to limit cards of a column starting at offset"""
+        return self.columns[key][offset:offset + limit]
+
+
+class TagIndex:
+    """Posting sets from interned tag ids to the tasks carrying them"""
+    def __init__(self):
+        self.postings = {}
+        self.indexed = {}
+        
+    def add(self, task):
+        """Index a task under its current tags"""
+        if task in self.indexed:
+            return
+        self.indexed[task] = task.tag_ids
+        for tag_id in task.tag_ids:
+            self.postings.setdefault(tag_id, set()).add(task)
+            
+    def remove(self, task):
+        """Remove a task using the tags it was indexed with"""
+        tag_ids = self.indexed.pop(task, None)
+        if tag_ids is None:
+            return
+        for tag_id in tag_ids:
+            posting = self.postings[tag_id]
+            posting.discard(task)
+            if not posting:
+                del self.postings[tag_id]
+            
+    def update(self, task):
+        """Re-index a task after its tags changed"""
+        if task in self.indexed:
+            self.remove(task)
+            self.add(task)
+            
+    def tasks_with(self, name):
+        """Return the set of tasks tagged with name (ignoring case)"""
+        tag_ids = Task.tag_dictionary.ids_for(name)
+        if len(tag_ids) == 1:
+            return self.postings.get(tag_ids[0], set())
+        return set().union(*(self.postings.get(tag_id, ()) for tag_id in tag_ids))
+        
+    def query(self, all_of=(), any_of=(), none_of=()):
+        """Return tasks having every tag in all_of, at least one tag from each
+        group in any_of and no tag in none_of"""
+        required = [self.tasks_with(name) for name in all_of]
+        for group in any_of:
+            required.append(set().union(*(self.tasks_with(name) for name in group)))
+            
+        if required:
+            required.sort(key=len)
+            result = required[0].intersection(*required[1:])
+        else:
+            result = set(self.indexed)
+            
+        for name in none_of:
+            if not result:
+                break
+            result.difference_update(self.tasks_with(name))
+        return result
+        
+    @staticmethod
+    def parse_filter(text):
+        """Parse 'work a|b -later' into (all_of, any_of, none_of)"""
+        all_of, any_of, none_of = [], [], []
+        for token in text.split():
+            if token.startswith("-") and len(token) > 1:
+                none_of.append(token[1:])
+            elif "|" in token:
+                any_of.append([name for name in token.split("|") if name])
+            else:
+                all_of.append(token)
+        return all_of, any_of, none_of
+
+
+class TextIndex:
+    """Word-prefix index over task content
+    
+    Tasks added in bulk are only queued; they are tokenized and indexed the
+    first time the index is searched, so loading a store does not pay for
+    text queries that may never come.
+    """
+    WORD = re.compile(r"\w+")
+    
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        self.indexed = {}
+        self.pending = {}
+        
+    @classmethod
+    def tokenize(cls, text):
+        return set(cls.WORD.findall(text.lower()))
+        
+    def add(self, task):
+        """Index the words of a task's content"""
+        if task in self.indexed or task in self.pending:
+            return
+        words = self.tokenize(task.content)
+        self.indexed[task] = words
+        for word in words:
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = set()
+                bisect.insort(self.vocabulary, word)
+            posting.add(task)
+            
+    def add_many(self, tasks, words=None):
+        """Queue many tasks for indexing on the next search
+        
+        words optionally maps tasks to the words of their content, tokenized elsewhere.
+        """
+        words = words or {}
+        for task in tasks:
+            if task not in self.indexed:
+                self.pending[task] = words.get(task)
+                
+    def _flush(self):
+        """Index the queued tasks, sorting the vocabulary once at the end"""
+        pending, self.pending = self.pending, {}
+        fresh = False
+        for task, task_words in pending.items():
+            task_words = task_words or self.tokenize(task.content)
+            self.indexed[task] = task_words
+            for word in task_words:
+                posting = self.postings.get(word)
+                if posting is None:
+                    posting = self.postings[word] = set()
+                    fresh = True
+                posting.add(task)
+        if fresh:
+            self.vocabulary = sorted(self.postings)
+            
+    def remove(self, task):
+        """Remove a task using the words it was indexed with"""
+        if task in self.pending:
+            del self.pending[task]
+            return
+        words = self.indexed.pop(task, None)
+        if words is None:
+            return
+        for word in words:
+            posting = self.postings[word]
+            posting.discard(task)
+            if not posting:
+                del self.postings[word]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+                
+    def update(self, task):
+        """Re-index a task after its content changed"""
+        if task in self.pending:
+            self.pending[task] = None
+        elif task in self.indexed:
+            self.remove(task)
+            self.add(task)
+            
+    def _prefixed(self, prefix):
+        lo = bisect.bisect_left(self.vocabulary, prefix)
+        hi = bisect.bisect_left(self.vocabulary, prefix + "\U0010ffff", lo)
+        return self.vocabulary[lo:hi]
+        
+    def estimate(self, prefixes):
+        """Upper bound on the number of tasks matching every prefix"""
+        if self.pending:
+            self._flush()
+        return min(
+            (sum(len(self.postings[word]) for word in self._prefixed(prefix)) for prefix in prefixes),
+            default=len(self.indexed)
+        )
+        
+    def lookup(self, prefixes):
+        """Return tasks having, for every prefix, a word starting with it"""
+        if self.pending:
+            self._flush()
+        result = None
+        for prefix in prefixes:
+            matches = set().union(*(self.postings[word] for word in self._prefixed(prefix)))
+            result = matches if result is None else result & matches
+            if not result:
+                break
+        return result if result is not None else set(self.indexed)
+        
+    @classmethod
+    def matches(cls, text, prefixes):
+        words = cls.tokenize(text)
+        return all(any(word.startswith(prefix) for word in words) for prefix in prefixes)
+
+
+def hash_coefficients(count, seed):
+    """Odd multipliers and offsets for multiply-shift hashing, the same on every run"""
+    generator = random.Random(seed)
+    return tuple((generator.getrandbits(64) | 1, generator.getrandbits(64)) for _ in range(count))
+
+
+class DuplicateIndex:
+    """MinHash signatures of open tasks, banded for locality-sensitive lookup
+    
+    The shingles of a task are the byte trigrams of its lower-cased,
+    whitespace-collapsed content plus one token per tag. HASHES
+    multiply-shift hashes turn them into a signature; the share of positions
+    where two signatures agree estimates the Jaccard similarity of their
+    shingle sets. Each signature is cut into BANDS bands of ROWS values and
+    every band is hashed to a bucket, so only tasks sharing a bucket are
+    ever compared. Like TextIndex, tasks are only queued when tracked and
+    hashed on the next lookup.
+    """
+    HASHES = 32
+    BANDS = 8
+    ROWS = 4
+    SIMILARITY = 0.7
+    MASK = (1 << 64) - 1
+    MIX = 0x9E3779B97F4A7C15
+    COEFFICIENTS = hash_coefficients(HASHES, seed=0xD0C5)
+    
+    def __init__(self):
+        self.signatures = {}
+        self.buckets = {}
+        self.pending = set()
+        
+    @staticmethod
+    def collapse(content):
+        return " ".join(content.lower().split()).encode()
+        
+    @classmethod
+    def normalize(cls, content):
+        """Collapsed content padded so even an empty task has trigrams, and word edges count"""
+        return b"  " + cls.collapse(content) + b"  "
+        
+    @staticmethod
+    def tag_token(tag):
+        # Above every trigram value, so tags never collide with content
+        return zlib.crc32(tag.lower().encode()) + (1 << 24)
+        
+    @classmethod
+    def shingles(cls, content, tags=()):
+        data = cls.normalize(content)
+        grams = {data[i] << 16 | data[i + 1] << 8 | data[i + 2] for i in range(len(data) - 2)}
+        grams.update(cls.tag_token(tag) for tag in tags)
+        return grams
+        
+    @classmethod
+    def signature(cls, content, tags=()):
+        grams = cls.shingles(content, tags)
+        mask = cls.MASK
+        return array("I", [min(((a * x + b) & mask) >> 32 for x in grams) for a, b in cls.COEFFICIENTS])
+        
+    @classmethod
+    def band_keys(cls, signature):
+        """Return one bucket key per band; the band number is mixed in so bands never share buckets"""
+        keys = []
+        for band in range(cls.BANDS):
+            key = band + 1
+            for value in signature[band * cls.ROWS:(band + 1) * cls.ROWS]:
+                key = ((key ^ value) * cls.MIX) & cls.MASK
+            keys.append(key)
+        return keys
+        
+    @staticmethod
+    def similarity(first, second):
+        return sum(a == b for a, b in zip(first, second)) / len(first)
+        
+    def add(self, task):
+        self.pending.add(task)
+        
+    def add_many(self, tasks):
+        self.pending.update(tasks)
+        
+    def remove(self, task):
+        self.pending.discard(task)
+        signature = self.signatures.pop(task, None)
+        if signature is None:
+            return
+        for key in self.band_keys(signature):
+            bucket = self.buckets[key]
+            bucket.remove(task)
+            if not bucket:
+                del self.buckets[key]
+                
+    def update(self, task):
+        """Re-hash a task after its content or tags changed"""
+        if task in self.signatures:
+            self.remove(task)
+            self.pending.add(task)
+            
+    def _file(self, task, signature):
+        self.signatures[task] = signature
+        for key in self.band_keys(signature):
+            self.buckets.setdefault(key, []).append(task)
+            
+    def _flush(self):
+        """Hash the queued tasks, all at once with NumPy when there are many"""
+        pending, self.pending = list(self.pending), set()
+        if len(pending) >= 1000:
+            matrix = self.signature_matrix(pending)
+            if matrix is not None:
+                for task, row in zip(pending, matrix):
+                    self._file(task, array("I", row.tobytes()))
+                return
+        for task in pending:
+            self._file(task, self.signature(task.content, task.tags))
+            
+    def similar(self, content, tags=(), exclude=None, threshold=None):
+        """Return (task, similarity) for indexed tasks that are probably near-duplicates, most similar first
+        
+        Every task sharing a bucket with content is compared once, however
+        crowded the bucket.
+        """
+        if self.pending:
+            self._flush()
+        threshold = self.SIMILARITY if threshold is None else threshold
+        signature = self.signature(content, tags)
+        seen = {exclude}
+        found = []
+        for key in self.band_keys(signature):
+            for task in self.buckets.get(key, ()):
+                if task in seen:
+                    continue
+                seen.add(task)
+                score = self.similarity(signature, self.signatures[task])
+                if score >= threshold:
+                    found.append((task, score))
+        found.sort(key=lambda pair: -pair[1])
+        return found
+        
+    @classmethod
+    def signature_matrix(cls, tasks, chunk=100000):
+        """Signatures of many tasks as a (len(tasks), HASHES) uint32 array, or None without NumPy
+        
+        Trigrams are cut from one concatenated buffer and every hash runs
+        over a whole chunk of tasks at a time; the values match signature().
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            return None
+        result = np.empty((len(tasks), cls.HASHES), dtype=np.uint32)
+        coefficients = [(np.uint64(a), np.uint64(b)) for a, b in cls.COEFFICIENTS]
+        tokens = {}
+        for start in range(0, len(tasks), chunk):
+            batch = tasks[start:start + chunk]
+            texts = [cls.collapse(task.content) for task in batch]
+            lengths = np.fromiter(map(len, texts), np.int64, len(texts)) + 4
+            data = np.frombuffer(b"  " + b"    ".join(texts) + b"  ", dtype=np.uint8).astype(np.uint64)
+            grams = data[:-2] << np.uint64(16) | data[1:-1] << np.uint64(8) | data[2:]
+            
+            # The last two trigrams of every text run into the next one
+            ends = np.cumsum(lengths)
+            valid = np.ones(len(data), dtype=bool)
+            valid[ends - 1] = False
+            valid[ends - 2] = False
+            grams = grams[valid[:-2]]
+            owners = np.repeat(np.arange(len(batch)), lengths - 2)
+            
+            tagged = [(i, task.tags) for i, task in enumerate(batch) if task.tag_ids]
+            if tagged:
+                tag_owners = [i for i, tags in tagged for _ in tags]
+                tag_values = [
+                    tokens.get(tag) or tokens.setdefault(tag, cls.tag_token(tag))
+                    for _, tags in tagged for tag in tags
+                ]
+                grams = np.concatenate([grams, np.array(tag_values, dtype=np.uint64)])
+                owners = np.concatenate([owners, np.array(tag_owners)])
+                order = np.argsort(owners, kind="stable")
+                grams, owners = grams[order], owners[order]
+            starts = np.searchsorted(owners, np.arange(len(batch)))
+            
+            # The shift commutes with the minimum, so it is applied to the minima only
+            hashed = np.empty_like(grams)
+            with np.errstate(over="ignore"):
+                for column, (a, b) in enumerate(coefficients):
+                    np.multiply(grams, a, out=hashed)
+                    np.add(hashed, b, out=hashed)
+                    result[start:start + len(batch), column] = np.minimum.reduceat(hashed, starts) >> np.uint64(32)
+        return result
+        
+    @classmethod
+    def groups(cls, tasks, threshold=None):
+        """Cluster tasks into groups of probable near-duplicates, largest group first
+        
+        Every task sharing a bucket is compared with the first task filed
+        there, and matches are joined into connected components. With NumPy
+        both steps run as whole-array operations, so a million tasks take
+        seconds; without it, a union-find over the buckets does the same.
+        """
+        threshold = cls.SIMILARITY if threshold is None else threshold
+        tasks = list(tasks)
+        matrix = cls.signature_matrix(tasks) if len(tasks) >= 1000 else None
+        if matrix is None:
+            groups = cls._union_groups(tasks, cls._bucket_pairs(tasks, threshold))
+        else:
+            groups = cls._component_groups(tasks, *cls._banded_pairs(matrix, threshold))
+        return sorted(groups, key=len, reverse=True)
+        
+    @classmethod
+    def _bucket_pairs(cls, tasks, threshold):
+        signatures = [cls.signature(task.content, task.tags) for task in tasks]
+        leaders = {}
+        for i, signature in enumerate(signatures):
+            for key in cls.band_keys(signature):
+                j = leaders.setdefault(key, i)
+                if j != i and cls.similarity(signature, signatures[j]) >= threshold:
+                    yield i, j
+                    
+    @staticmethod
+    def _union_groups(tasks, pairs):
+        parent = list(range(len(tasks)))
+        
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+            
+        for i, j in pairs:
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_i] = root_j
+        clusters = {}
+        for i in range(len(tasks)):
+            clusters.setdefault(find(i), []).append(tasks[i])
+        return [group for group in clusters.values() if len(group) > 1]
+        
+    @classmethod
+    def _banded_pairs(cls, matrix, threshold):
+        """Return the candidate and leader indexes of every matching pair, over all bands"""
+        import numpy as np
+        mix = np.uint64(cls.MIX)
+        found = []
+        for band in range(cls.BANDS):
+            keys = np.full(len(matrix), band + 1, dtype=np.uint64)
+            with np.errstate(over="ignore"):
+                for row in range(band * cls.ROWS, (band + 1) * cls.ROWS):
+                    keys = (keys ^ matrix[:, row].astype(np.uint64)) * mix
+            order = np.argsort(keys, kind="stable")
+            ordered = keys[order]
+            first = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+            leaders = order[np.repeat(first, np.diff(np.r_[first, len(order)]))]
+            members = order != leaders
+            candidates, leaders = order[members], leaders[members]
+            matched = (matrix[candidates] == matrix[leaders]).sum(axis=1) >= threshold * cls.HASHES
+            found.append((candidates[matched], leaders[matched]))
+        return np.concatenate([pair[0] for pair in found]), np.concatenate([pair[1] for pair in found])
+        
+    @staticmethod
+    def _component_groups(tasks, first, second):
+        """Label connected components by propagating the smallest index until nothing changes"""
+        import numpy as np
+        labels = np.arange(len(tasks))
+        while True:
+            lowest = np.minimum(labels[first], labels[second])
+            updated = labels.copy()
+            np.minimum.at(updated, first, lowest)
+            np.minimum.at(updated, second, lowest)
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+        order = np.argsort(labels, kind="stable")
+        ordered = labels[order]
+        bounds = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1], True])
+        return [
+            [tasks[i] for i in order[bounds[k]:bounds[k + 1]].tolist()]
+            for k in np.flatnonzero(np.diff(bounds) > 1).tolist()
+        ]
+
+
+class DependencyGraph:
+    """Blocking dependencies between top-level tasks, keyed by task id
+    
+    An edge runs from a blocker to a task waiting on it. Edges come from
+    each task's blocked_by ids, so they are saved and merged with the task.
+    Completed, deleted and unknown blockers count as done.
+    
+    Nodes with edges keep a topological position. Adding an edge that
+    breaks the order only reshuffles the nodes between its endpoints
+    (Pearce-Kelly); removing one never does. For each task it also keeps
+    the number of open blockers, whether it is blocked (the ready frontier
+    is every other open task), and its critical path length: the longest
+    chain of open tasks that ends with it. A change is pushed forward in
+    topological order to the nodes it affects and no further.
+    """
+    def __init__(self):
+        self.blockers = {}
+        self.dependents = {}
+        self.position = {}
+        self.next_position = 0
+        self.active = set()
+        self.waiting = {}
+        self.blocked = set()
+        self.depth = {}
+        
+    def _node(self, task_id):
+        if task_id not in self.position:
+            self.position[task_id] = self.next_position
+            self.next_position += 1
+            self.blockers.setdefault(task_id, set())
+            self.dependents.setdefault(task_id, set())
+            
+    def _reach(self, start, edges, inside, target=None):
+        """Collect the nodes reachable from start through nodes whose position is inside"""
+        seen = {start}
+        stack = [start]
+        while stack:
+            for other in edges[stack.pop()]:
+                if other == target:
+                    raise ValueError("That dependency would create a cycle")
+                if other not in seen and inside(self.position[other]):
+                    seen.add(other)
+                    stack.append(other)
+        return seen
+        
+    def _reorder(self, blocker, task_id):
+        """Restore the topological order for a new edge, or raise ValueError on a cycle"""
+        low, high = self.position[task_id], self.position[blocker]
+        if high < low:
+            return
+        forward = self._reach(task_id, self.dependents, lambda p: p < high, target=blocker)
+        backward = self._reach(blocker, self.blockers, lambda p: p > low)
+        nodes = sorted(backward, key=self.position.get) + sorted(forward, key=self.position.get)
+        for node, position in zip(nodes, sorted(self.position[node] for node in nodes)):
+            self.position[node] = position
+            
+    def _wait(self, task_id, delta):
+        self.waiting[task_id] = self.waiting.get(task_id, 0) + delta
+        self._refresh_blocked(task_id)
+        
+    def _refresh_blocked(self, task_id):
+        if task_id in self.active and self.waiting.get(task_id):
+            self.blocked.add(task_id)
+        else:
+            self.blocked.discard(task_id)
+            
+    def _settle(self, changed):
+        """Recompute critical path lengths forward from changed nodes, each affected node once"""
+        heap = [(self.position[node], node) for node in changed if node in self.position]
+        heapq.heapify(heap)
+        queued = {node for _, node in heap}
+        while heap:
+            _, node = heapq.heappop(heap)
+            depth = 0
+            if node in self.active:
+                depth = 1 + max((self.path_length(b) for b in self.blockers[node] if b in self.active), default=0)
+            if depth != self.depth.get(node):
+                self.depth[node] = depth
+                for dependent in self.dependents[node]:
+                    if dependent not in queued:
+                        queued.add(dependent)
+                        heapq.heappush(heap, (self.position[dependent], dependent))
+                        
+    def add_edge(self, blocker, task_id):
+        """Make task_id wait on blocker; raises ValueError if that would form a cycle"""
+        if blocker == task_id:
+            raise ValueError("A task cannot block itself")
+        self._node(blocker)
+        self._node(task_id)
+        if blocker in self.blockers[task_id]:
+            return
+        self._reorder(blocker, task_id)
+        self.blockers[task_id].add(blocker)
+        self.dependents[blocker].add(task_id)
+        if blocker in self.active:
+            self._wait(task_id, 1)
+            self._settle([task_id])
+            
+    def remove_edge(self, blocker, task_id):
+        if blocker not in self.blockers.get(task_id, ()):
+            return
+        self.blockers[task_id].discard(blocker)
+        self.dependents[blocker].discard(task_id)
+        if blocker in self.active:
+            self._wait(task_id, -1)
+            self._settle([task_id])
+            
+    def set_active(self, task_id, active):
+        """Record whether a task is open, updating the tasks waiting on it"""
+        if (task_id in self.active) == active:
+            return
+        if active:
+            self.active.add(task_id)
+        else:
+            self.active.discard(task_id)
+        for dependent in self.dependents.get(task_id, ()):
+            self._wait(dependent, 1 if active else -1)
+        self._refresh_blocked(task_id)
+        self._settle([task_id])
+        
+    def update(self, task):
+        """Register a task, or pick up changes to its blocked_by ids and completion
+        
+        Edges that would close a cycle, which only merges from other
+        stores can produce, are left out of the graph.
+        """
+        current = self.blockers.get(task.id, set())
+        wanted = set(task.blocked_by)
+        for blocker in current - wanted:
+            self.remove_edge(blocker, task.id)
+        for blocker in wanted - current:
+            try:
+                self.add_edge(blocker, task.id)
+            except ValueError:
+                pass
+        self.set_active(task.id, task.completion_time is None)
+        
+    def update_many(self, tasks):
+        """Register many tasks, ordering the graph once rather than edge by edge"""
+        linked = False
+        for task in tasks:
+            if task.completion_time is None:
+                self.active.add(task.id)
+            for blocker in task.blocked_by:
+                if blocker != task.id:
+                    self._node(blocker)
+                    self._node(task.id)
+                    self.blockers[task.id].add(blocker)
+                    self.dependents[blocker].add(task.id)
+                    linked = True
+            linked = linked or bool(self.dependents.get(task.id))
+        if linked:
+            self._rebuild()
+            
+    def _rebuild(self):
+        """Recompute the order, counts and path lengths of the whole graph (Kahn's algorithm)
+        
+        Edges closing a cycle are dropped: whenever every remaining node
+        still waits on another, the first in the old order loses the edges
+        from the remaining ones.
+        """
+        remaining = {node: len(self.blockers[node]) for node in self.position}
+        pending = sorted(remaining, key=self.position.get)
+        ready = deque(node for node in pending if not remaining[node])
+        order = []
+        while remaining:
+            if not ready:
+                node = next(node for node in pending if node in remaining)
+                for blocker in [b for b in self.blockers[node] if b in remaining]:
+                    self.blockers[node].discard(blocker)
+                    self.dependents[blocker].discard(node)
+                ready.append(node)
+            while ready:
+                node = ready.popleft()
+                del remaining[node]
+                order.append(node)
+                for dependent in self.dependents[node]:
+                    remaining[dependent] -= 1
+                    if not remaining[dependent]:
+                        ready.append(dependent)
+                        
+        self.position = {node: index for index, node in enumerate(order)}
+        self.next_position = len(order)
+        self.depth.clear()
+        for node in order:
+            open_blockers = [b for b in self.blockers[node] if b in self.active]
+            self.waiting[node] = len(open_blockers)
+            self._refresh_blocked(node)
+            if node in self.active:
+                self.depth[node] = 1 + max((self.depth[b] for b in open_blockers), default=0)
+                
+    def discard(self, task_id):
+        """Treat a task that left the store, for now, as done"""
+        self.set_active(task_id, False)
+        
+    def forget(self, task_id):
+        """Drop a deleted task's own edges, and the node once nothing waits on it"""
+        self.set_active(task_id, False)
+        for blocker in list(self.blockers.get(task_id, ())):
+            self.remove_edge(blocker, task_id)
+        if task_id in self.position and not self.dependents[task_id]:
+            for table in (self.position, self.blockers, self.dependents, self.waiting, self.depth):
+                table.pop(task_id, None)
+                
+    def is_blocked(self, task_id):
+        return task_id in self.blocked
+        
+    def open_blockers(self, task_id):
+        return [blocker for blocker in self.blockers.get(task_id, ()) if blocker in self.active]
+        
+    def path_length(self, task_id):
+        """Number of open tasks on the longest chain ending with this one (0 if done)"""
+        if task_id not in self.active:
+            return 0
+        return self.depth.get(task_id, 1)
+        
+    def critical_path(self, task_id):
+        """The longest chain of open tasks ending with task_id, first blocker first"""
+        path = []
+        while task_id in self.active:
+            path.append(task_id)
+            task_id = max(self.open_blockers(task_id), key=self.path_length, default=None)
+        path.reverse()
+        return path
+        
+    def order_key(self, task_id):
+        """Sort key placing every task after its blockers; tasks without edges sort first"""
+        return self.position.get(task_id, -1)
+
+
+class TaskQuery:
+    """Parsed filter query such as 'priority<=1 tag:work due<7d text:"invoice"'
+    
+    Supported terms (prefix any term but status with '-' to negate it):
+        priority<=1, p=0         priority comparison
+        tag:work                 tag, ignoring case
+        due<7d, due:today        deadline; values are Nd/Nw/Nh, today,
+                                 tomorrow, overdue, none or an ISO date
+        category:Work/ProjectA   category subtree
+        text:"invoice", invoice  word-prefix match on content
+        status:open|done|all     which tasks to search (default open)
+    """
+    OPERATORS = ("<=", ">=", "!=", "<", ">", "=", ":")
+    ALIASES = {"p": "priority", "cat": "category", "is": "status", "#": "tag"}
+    
+    def __init__(self, text):
+        self.text = text
+        self.status = "open"
+        self.terms = []
+        
+        try:
+            tokens = shlex.split(text)
+        except ValueError as e:
+            raise ValueError(f"Invalid query: {e}")
+            
+        for token in tokens:
+            negated = token.startswith("-") and len(token) > 1
+            if negated:
+                token = token[1:]
+            if token.startswith("#"):
+                token = "tag:" + token[1:]
+                
+            match = re.match(r"^(\w+)(<=|>=|!=|<|>|=|:)(.*)$", token)
+            if match and self.ALIASES.get(match.group(1), match.group(1)) in (
+                    "priority", "tag", "due", "category", "text", "status"):
+                key, op, value = match.groups()
+                key = self.ALIASES.get(key, key)
+            else:
+                key, op, value = "text", ":", token
+                
+            if key == "status":
+                if value not in ("open", "done", "all"):
+                    raise ValueError(f"Unknown status '{value}'")
+                self.status = value
+            elif key == "priority":
+                if not value.isdigit():
+                    raise ValueError(f"Priority must be a number, got '{value}'")
+                self.terms.append((key, op, int(value), negated))
+            elif key == "due":
+                self.terms.append((key, op, self.parse_due(value), negated))
+            elif key == "text":
+                self.terms.append((key, op, [word.lower() for word in TextIndex.WORD.findall(value)], negated))
+            else:
+                self.terms.append((key, op, value, negated))
+                
+    @staticmethod
+    def parse_due(value):
+        """Resolve a due value to a [start, end) interval, or None for 'none'"""
+        value = value.lower()
+        now = datetime.now()
+        midnight = datetime.combine(now.date(), datetime.min.time())
+        if value == "none":
+            return None
+        if value == "overdue":
+            return datetime.min, now
+        if value == "today":
+            return midnight, midnight + timedelta(days=1)
+        if value == "tomorrow":
+            return midnight + timedelta(days=1), midnight + timedelta(days=2)
+        
+        match = re.match(r"^(\d+)([hdw])$", value)
+        if match:
+            amount, unit = int(match.group(1)), match.group(2)
+            point = now + {"h": timedelta(hours=amount), "d": timedelta(days=amount), "w": timedelta(weeks=amount)}[unit]
+            return point, point
+        try:
+            point = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Unknown due value '{value}'")
+        if len(value) <= 10:
+            return point, point + timedelta(days=1)
+        return point, point
+        
+    @staticmethod
+    def due_bounds(op, interval):
+        """Translate a comparison against an interval into a [lo, hi) range"""
+        start, end = interval
+        if end == start:
+            end = start + timedelta(microseconds=1)
+        if op == "<":
+            return datetime.min, start
+        if op == "<=":
+            return datetime.min, end
+        if op == ">":
+            return end, datetime.max
+        if op == ">=":
+            return start, datetime.max
+        return start, end
+        
+    def plan(self, source):
+        """Build the execution plan against a source exposing the task indexes
+        
+        Returns (driver, filters) where driver is the cheapest index-backed
+        step (or None for a full scan) and filters are the predicates that
+        are evaluated as a stream over the driver's candidates.
+        """
+        steps = []
+        for key, op, value, negated in self.terms:
+            step = getattr(self, f"_plan_{key}")(source, op, value)
+            if negated:
+                test = step["test"]
+                step = {"cost": None, "test": lambda t, test=test: not test(t), "order": step["order"], "name": f"not {step['name']}"}
+            steps.append(step)
+            
+        indexed = [step for step in steps if step["cost"] is not None]
+        driver = min(indexed, key=lambda step: step["cost"]()) if indexed else None
+        filters = sorted((step for step in steps if step is not driver), key=lambda step: step["order"])
+        return driver, filters
+        
+    def explain(self, source):
+        """Describe the chosen plan, mainly for debugging slow queries"""
+        driver, filters = self.plan(source)
+        scan = f"index scan on {driver['name']}" if driver else f"full scan of {self.status} tasks"
+        return " -> ".join([scan] + [f"filter {step['name']}" for step in filters])
+        
+    def execute(self, source):
+        """Yield matching tasks, open ones first, each group in the source's sort order
+        
+        A full scan streams the lists; candidates from an index come in no
+        particular order, so their matches are collected and sorted first.
+        """
+        driver, filters = self.plan(source)
+        tests = [step["test"] for step in filters]
+        status = self.status
+        tasks_by_id = source.tasks_by_id
+        by_urgency = source.sort_key == "effective"
+        
+        if driver is None:
+            candidates = []
+            if status in ("open", "all"):
+                candidates.append(source.urgency.tasks if by_urgency else source.task_list)
+            if status in ("done", "all"):
+                candidates.append(source.completed_tasks)
+            candidates = (task for group in candidates for task in group)
+            for task in candidates:
+                if all(test(task) for test in tests):
+                    yield task
+            return
+            
+        matches = []
+        for task in driver["candidates"]():
+            if tasks_by_id.get(task.id) is not task:
+                continue
+            if status == "open" and task.completion_time is not None:
+                continue
+            if status == "done" and task.completion_time is None:
+                continue
+            if all(test(task) for test in tests):
+                matches.append(task)
+        urgency = source.urgency.entries if by_urgency else {}
+        matches.sort(key=lambda t: (t.completion_time is not None, urgency.get(t, ()), t.position))
+        yield from matches
+                
+    def _plan_priority(self, source, op, value):
+        compare = {
+            "<": lambda t: t.priority < value,
+            "<=": lambda t: t.priority <= value,
+            ">": lambda t: t.priority > value,
+            ">=": lambda t: t.priority >= value,
+            "!=": lambda t: t.priority != value,
+        }.get(op, lambda t: t.priority == value)
+        return {"cost": None, "test": compare, "order": 0, "name": f"priority{op}{value}"}
+        
+    def _plan_tag(self, source, op, value):
+        tag_ids = set(Task.tag_dictionary.ids_for(value))
+        return {
+            "cost": lambda: len(source.tag_index.tasks_with(value)),
+            "candidates": lambda: source.tag_index.tasks_with(value),
+            "test": lambda t: not tag_ids.isdisjoint(t.tag_ids),
+            "order": 1,
+            "name": f"tag:{value}"
+        }
+        
+    def _plan_due(self, source, op, value):
+        if value is None:
+            return {"cost": None, "test": lambda t: t.deadline is None, "order": 1, "name": "due:none"}
+        lo, hi = self.due_bounds(op, value)
+        in_range = lambda t: t.deadline is not None and lo <= t.deadline < hi
+        step = {"cost": None, "test": in_range, "order": 1, "name": f"due in [{lo:%Y-%m-%d %H:%M}, {hi:%Y-%m-%d %H:%M})"}
+        if op == "!=":
+            step["test"] = lambda t: not in_range(t)
+        elif self.status == "open":
+            step["cost"] = lambda: source.deadline_index.count(lo, hi)
+            step["candidates"] = lambda: source.deadline_index.range(lo, hi)
+        return step
+        
+    def _plan_category(self, source, op, value):
+        members = []
+        
+        def subtree():
+            if not members:
+                members.append(set(source.task_tree.subtree_tasks(value)))
+            return members[0]
+            
+        return {
+            "cost": lambda: len(subtree()),
+            "candidates": subtree,
+            "test": lambda t: t in subtree(),
+            "order": 2,
+            "name": f"category:{value}"
+        }
+        
+    def _plan_text(self, source, op, value):
+        return {
+            "cost": lambda: source.text_index.estimate(value),
+            "candidates": lambda: source.text_index.lookup(value),
+            "test": lambda t: TextIndex.matches(t.content, value),
+            "order": 3,
+            "name": f"text:{' '.join(value)}"
+        }
+
+
+class ResultCache:
+    """LRU cache of filter results validated by version stamps
+    
+    Each entry remembers the versions of the model facets it was computed
+    from, so a mutation only invalidates entries that depend on the facet it
+    changed.
+    """
+    def __init__(self, capacity=32):
+        self.entries = OrderedDict()
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        
+    def get(self, key, stamp):
+        """Return the cached value for key if it is still valid, else None"""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+        
+    def put(self, key, stamp, value):
+        self.entries[key] = (stamp, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            
+    def clear(self):
+        self.entries.clear()
+
+
+class TaskTree:
+    """Implementation of a tree structure for categorized tasks
+    
+    Every node keeps how many open and overdue tasks are filed in its
+    subtree. The tree remembers where each task is filed and whether it
+    was last counted as open and overdue, so a change to one task only
+    walks from its categories up to the root.
+    """
+    class TreeNode:
+        def __init__(self, name):
+            self.name = name
+            self.tasks = []
+            self.children = []
+            self.child_index = {}
+            self.parent = None
+            self.path = ""
+            self.full_path = name
+            self.open_count = 0
+            self.overdue_count = 0
+            
+        def add_child(self, child):
+            child.parent = self
+            child.path = f"{self.path}/{child.name}" if self.path else child.name
+            child.full_path = f"{self.full_path}/{child.name}"
+            self.children.append(child)
+            self.child_index[child.name] = child
+            return child
+            
+        def add_task(self, task):
+            self.tasks.append(task)
+            
+        def adjust(self, open_delta, overdue_delta):
+            """Add to the counts of this node and all its ancestors"""
+            node = self
+            while node is not None:
+                node.open_count += open_delta
+                node.overdue_count += overdue_delta
+                node = node.parent
+                
+    def __init__(self):
+        self.root = self.TreeNode("Root")
+        self.filings = {}
+        self.states = {}
+        
+    def add_category(self, path, create_missing=True):
+        """Add a category at the specified path (e.g., 'Work/Project A')"""
+        if not path:
+            return self.root
+            
+        parts = path.split('/')
+        if parts[0] == self.root.name:
+            
+            parts = parts[1:]
+        current = self.root
+        
+        for part in parts:
+            child = current.child_index.get(part)
+            if child is None:
+                if not create_missing:
+                    return None
+                child = current.add_child(self.TreeNode(part))
+            current = child
+                    
+        return current
+        
+    def find(self, path):
+        """Return the node for a category path, or None if it does not exist"""
+        return self.add_category(path, create_missing=False)
+        
+    def add_task_to_category(self, path, task, state=(False, False)):
+        """Add a task to a specific category; state is whether it is (open, overdue)"""
+        node = self.add_category(path)
+        if node:
+            self.file(node, task, state)
+            
+    def file(self, node, task, state=(False, False)):
+        """File a task under node and count it there and in every ancestor; filing it twice does nothing"""
+        nodes = self.filings.setdefault(task, [])
+        if node in nodes:
+            return
+        node.add_task(task)
+        nodes.append(node)
+        self.states[task] = state
+        node.adjust(*state)
+        
+    def set_state(self, task, is_open, overdue):
+        """Recount a task that became open or closed, overdue or not, in O(depth)"""
+        nodes = self.filings.get(task)
+        if nodes is None:
+            return
+        old_open, old_overdue = self.states[task]
+        if (is_open, overdue) == (old_open, old_overdue):
+            return
+        self.states[task] = (is_open, overdue)
+        for node in nodes:
+            node.adjust(is_open - old_open, overdue - old_overdue)
+            
+    def unfile(self, tasks):
+        """Take tasks out of every category they are filed in"""
+        removed = set(tasks)
+        touched = set()
+        for task in removed:
+            self.set_state(task, False, False)
+            self.states.pop(task, None)
+            touched.update(self.filings.pop(task, ()))
+        for node in touched:
+            node.tasks = [task for task in node.tasks if task not in removed]
+            
+    def move(self, task, path, state=(False, False)):
+        """File a task under path only, taking it out of its other categories"""
+        self.refile(task, [path], state)
+        
+    def refile(self, task, paths, state=(False, False)):
+        """File a task under exactly these paths, taking it out of any others"""
+        nodes = [self.add_category(path) for path in paths]
+        if self.filings.get(task, []) == nodes:
+            return
+        self.unfile([task])
+        for node in nodes:
+            self.file(node, task, state)
+            
+    def counts(self, path):
+        """Return the open and overdue counts of a category subtree, (0, 0) if it does not exist"""
+        node = self.find(path)
+        return (node.open_count, node.overdue_count) if node else (0, 0)
+            
+    def iter_nodes(self, start=None, breadth_first=False):
+        """Yield the nodes of the subtree at start (default root) without recursion"""
+        start = start or self.root
+        if breadth_first:
+            queue = deque([start])
+            while queue:
+                node = queue.popleft()
+                yield node
+                queue.extend(node.children)
+        else:
+            stack = [start]
+            while stack:
+                node = stack.pop()
+                yield node
+                stack.extend(reversed(node.children))
+                
+    def iter_tasks(self, path=None, breadth_first=False):
+        """Yield (node, task) pairs for a category subtree, stopping whenever the caller does"""
+        start = self.root if path is None else self.find(path)
+        if start is None:
+            return
+        for node in self.iter_nodes(start, breadth_first):
+            for task in node.tasks:
+                yield node, task
+                
+    def subtree_tasks(self, path):
+        """Return the tasks filed under a category path or any of its subcategories"""
+        return [task for _, task in self.iter_tasks(path)]
+        
+    def dfs_traverse(self):
+        """Depth-first traversal of the tree"""
+        return [(node.full_path, task) for node, task in self.iter_tasks()]
+        
+    def bfs_traverse(self):
+        """Breadth-first traversal of the tree"""
+        return [(node.full_path, task) for node, task in self.iter_tasks(breadth_first=True)]
+
+
+
+def synchronized(method):
+    """Run a TaskEngine method while holding the engine's lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class TaskEngine:
+    """The task store without any UI
+    
+    Owns the open and completed lists, the category tree, every incremental
+    index, the undo history and persistence. The Tk app and the local server
+    both drive one of these.
+    
+    Public methods hold a re-entrant lock, so worker threads may call them
+    directly. Code that walks the lists or indexes itself (rendering, for
+    instance) should hold engine.lock while it does.
+    """
+    DATA_FILE = "tasks.json"
+    ARCHIVE_DAYS = 30
+    TOMBSTONE_DAYS = 30
+    TOMBSTONE_EXPIRY_DAYS = 365
+    FACETS = ("tasks", "order", "content", "priority", "deadline", "tags", "category", "urgency")
+    NEXT_LIMIT = 10
+    # Everything reset() rebuilds, swapped in as a whole by import_file
+    STATE = (
+        "task_list", "completed_tasks", "task_tree", "deadline_index", "deadline_timer", "urgency",
+        "kanban", "tag_index", "text_index", "duplicates", "dependencies", "tasks_by_id",
+        "recurring_tasks", "deleted_ids", "deleted_at", "tombstone_seq", "change_log", "change_seq", "clock"
+    )
+    ACTION_FACETS = {
+        "add": ("tasks", "category"),
+        "delete": ("tasks", "category"),
+        "complete": ("tasks", "category"),
+        "edit": ("content",),
+        "deadline": ("deadline",),
+        "priority": ("priority",),
+        "tags": ("tags",),
+        "blockers": ("tasks",),
+        "note": ("content",)
+    }
+    
+    def __init__(self, data_file=None):
+        self.lock = threading.RLock()
+        self.data_file = data_file or self.DATA_FILE
+        self.priority_queue = []                   
+        self.history_stack = []                    
+        self.future_stack = []                     
+        self.task_queue = deque()                  
+        self.saved_queries = {}
+        self.data_signature = None
+        self.result_cache = ResultCache()          
+        self.versions = dict.fromkeys(self.FACETS, 0)
+        self.sort_key = None
+        self.replica_id = uuid.uuid4().hex
+        self.peers = {}
+        self.archive_days = self.ARCHIVE_DAYS
+        self.archive = ArchiveSegment(os.path.splitext(self.data_file)[0] + ".archive.jsonl")
+        self.notes = NoteStore(os.path.splitext(self.data_file)[0] + ".notes")
+        self.reset()
+        
+    @synchronized
+    def reset(self, deleted=None):
+        """Drop every task and start again with empty indexes"""
+        self.task_list = TaskLinkedList()          
+        self.completed_tasks = TaskLinkedList()    
+        self.task_tree = TaskTree()                
+        self.deadline_index = DeadlineIndex()      
+        self.deadline_timer = DeadlineTimer()      
+        self.urgency = UrgencyIndex()
+        self.kanban = KanbanBoard()                
+        self.tag_index = TagIndex()                
+        self.text_index = TextIndex()              
+        self.duplicates = DuplicateIndex()
+        self.dependencies = DependencyGraph()
+        self.tasks_by_id = {}                      
+        self.recurring_tasks = set()               
+        self.deleted_ids = dict(deleted or {})
+        self.deleted_at = {}
+        self.tombstone_seq = {}
+        self.change_log = OrderedDict()
+        self.change_seq = 0
+        self.clock = max(self.deleted_ids.values(), default=0)
+        self.result_cache.clear()
+        self._bump(*self.FACETS)
+        
+    def _bump(self, *facets):
+        """Record that the given model facets changed"""
+        for facet in facets:
+            self.versions[facet] += 1
+            
+    def _cached(self, key, facets, compute):
+        """Return a memoized result, recomputing only if a facet it depends on changed"""
+        stamp = tuple(self.versions[facet] for facet in facets)
+        result = self.result_cache.get(key, stamp)
+        if result is None:
+            result = compute()
+            self.result_cache.put(key, stamp, result)
+        return result
+        
+    def _track_task(self, task):
+        """Register a task with the incremental indexes, or refresh its position in them"""
+        if task.completion_time is None:
+            self.deadline_index.add(task)
+            self.deadline_timer.arm(task)
+            self.urgency.add(task)
+            self.duplicates.add(task)
+            if task.recurrence:
+                self.recurring_tasks.add(task)
+        self.kanban.place(task)
+        self.tag_index.add(task)
+        self.text_index.add(task)
+        self.dependencies.update(task)
+        self.tasks_by_id[task.id] = task
+        self._count(task)
+        self._bump("tasks")
+        
+    def _track_many(self, tasks, words=None):
+        """Register many new tasks, rebuilding the sorted indexes once"""
+        now = datetime.now()
+        open_tasks = [task for task in tasks if task.completion_time is None]
+        self.deadline_index.add_many(open_tasks)
+        self.urgency.add_many(open_tasks, now)
+        self.duplicates.add_many(open_tasks)
+        for task in open_tasks:
+            self.deadline_timer.arm(task, now)
+            if task.recurrence:
+                self.recurring_tasks.add(task)
+        for task in tasks:
+            self.kanban.place(task)
+            self.tag_index.add(task)
+            self.tasks_by_id[task.id] = task
+            self._count(task)
+        self.text_index.add_many(tasks, words)
+        self.dependencies.update_many(tasks)
+        self._bump("tasks")
+        
+    def _untrack_task(self, task):
+        """Remove a task from the incremental indexes"""
+        self.deadline_index.remove(task)
+        self.deadline_timer.disarm(task)
+        self.urgency.remove(task)
+        self.duplicates.remove(task)
+        self.recurring_tasks.discard(task)
+        self.kanban.remove(task)
+        self.tag_index.remove(task)
+        self.text_index.remove(task)
+        self.dependencies.discard(task.id)
+        self.tasks_by_id.pop(task.id, None)
+        self._count(task)
+        self._bump("tasks")
+        
+    def _category_state(self, task):
+        """Whether a task counts as (open, overdue) in the category totals"""
+        is_open = task.completion_time is None and self.tasks_by_id.get(task.id) is task
+        return is_open, is_open and task in self.deadline_timer.overdue
+        
+    def _count(self, task):
+        """Bring the category totals up to date with a task's state"""
+        self.task_tree.set_state(task, *self._category_state(task))
+        
+    def _arm_deadline(self, task):
+        """Reschedule the deadline of an open task, which may make it overdue at once"""
+        self.deadline_timer.arm(task)
+        self.urgency.update(task)
+        self._count(task)
+        
+    @synchronized
+    def tick_deadlines(self, now=None):
+        """Return the tasks that became overdue since the last tick, updating category totals"""
+        fired = self.deadline_timer.tick(now)
+        for task in fired:
+            self._count(task)
+        return fired
+        
+    @synchronized
+    def refresh_priorities(self, now=None):
+        """Recompute the effective priority of tasks that crossed a deadline or age threshold"""
+        changed = self.urgency.refresh(now)
+        if changed:
+            self._bump("urgency")
+        return changed
+        
+    @synchronized
+    def effective_priority(self, task):
+        """Return a task's priority raised by deadline proximity and age; see UrgencyIndex"""
+        self.refresh_priorities()
+        return self.urgency.effective(task)
+        
+    @synchronized
+    def next_tasks(self, limit=None):
+        """Return the most urgent open tasks that are not blocked, most urgent first"""
+        self.refresh_priorities()
+        tasks = (t for t in self.urgency.tasks if not self.dependencies.is_blocked(t.id))
+        return list(islice(tasks, self.NEXT_LIMIT if limit is None else limit))
+        
+    def _log(self, task_id, task):
+        """Append a change to the log; task is None for a deletion"""
+        self.change_seq += 1
+        if task is None:
+            self.tombstone_seq[task_id] = self.change_seq
+        else:
+            task.seq = self.change_seq
+            self.tombstone_seq.pop(task_id, None)
+        self.change_log[task_id] = task
+        self.change_log.move_to_end(task_id)
+        
+    def _touch(self, task):
+        """Stamp a local change with the next Lamport time and log it for sync"""
+        self.clock = max(self.clock, task.version) + 1
+        task.version = self.clock
+        task.origin = self.replica_id
+        self._log(task.id, task)
+        
+    def _tombstone(self, task):
+        """Record a deletion so other stores drop their copy"""
+        self.clock = max(self.clock, task.version) + 1
+        task.version = self.clock
+        self.deleted_ids[task.id] = task.version
+        self.deleted_at[task.id] = datetime.now().isoformat(timespec="seconds")
+        self._log(task.id, None)
+        
+    def _record(self, action):
+        self.history_stack.append(action)
+        self.future_stack.clear()
+        
+    @synchronized
+    def get_task(self, task_id):
+        """Return the top-level task with the given id or raise KeyError"""
+        task = self.tasks_by_id.get(task_id)
+        if task is None:
+            raise KeyError(f"No task with id {task_id!r}")
+        return task
+        
+    @synchronized
+    def filter_tasks(self, category="All Tasks", filter_mode="All", tag_filter=""):
+        """Return tasks in a category subtree, narrowed by filter mode and tag expression"""
+        facets = ["tasks", "order"]
+        if category != "All Tasks":
+            facets.append("category")
+        if filter_mode == "Today":
+            facets.append("deadline")
+        elif filter_mode == "Priority":
+            facets.append("priority")
+        if tag_filter:
+            facets.append("tags")
+        if self.sort_key == "effective" or filter_mode == "Next Up":
+            facets += ["priority", "deadline", "urgency"]
+            self.refresh_priorities()
+        day = datetime.now().date() if filter_mode == "Today" else None
+        key = ("filter", category, filter_mode, tag_filter, day, self.sort_key)
+        return self._cached(key, facets, lambda: self._compute_filtered_tasks(category, filter_mode, tag_filter))
+        
+    def _compute_filtered_tasks(self, category, filter_mode, tag_filter):
+        by_urgency = self.sort_key == "effective" or filter_mode == "Next Up"
+        if category == "All Tasks":
+            tasks = self.urgency.tasks if by_urgency else self.task_list
+        elif by_urgency:
+            filed = set(self.task_tree.subtree_tasks(category))
+            tasks = (t for t in self.urgency.tasks if t in filed)
+        else:
+            tasks = (
+                task for _, task in self.task_tree.iter_tasks(category)
+                if task.completion_time is None and self.tasks_by_id.get(task.id) is task
+            )
+        
+        
+        if filter_mode == "Today":
+            due_today = self.deadline_index.on_day(datetime.now().date())
+            if category == "All Tasks":
+                tasks = due_today
+            else:
+                due_today = set(due_today)
+                tasks = (t for t in tasks if t in due_today)
+        elif filter_mode == "Priority":
+            tasks = (t for t in tasks if t.priority == 0)
+        elif filter_mode == "Completed":
+            tasks = self.completed_tasks
+        elif filter_mode in ("Ready", "Next Up"):
+            tasks = (t for t in tasks if not self.dependencies.is_blocked(t.id))
+            
+        
+        if tag_filter:
+            matched = self.tag_index.query(*TagIndex.parse_filter(tag_filter))
+            tasks = (t for t in tasks if t in matched)
+        if filter_mode == "Next Up":
+            tasks = islice(tasks, self.NEXT_LIMIT)
+        return list(tasks)
+        
+    @synchronized
+    def run_query(self, query):
+        """Return the tasks matching a TaskQuery (or query text), memoized"""
+        if isinstance(query, str):
+            query = TaskQuery(query)
+        
+        clock = datetime.now().replace(second=0, microsecond=0) if "due" in query.text else None
+        if self.sort_key == "effective":
+            self.refresh_priorities()
+        key = ("query", query.text, clock, self.sort_key)
+        return self._cached(key, self.FACETS, lambda: list(query.execute(self)))
+        
+    @synchronized
+    def search(self, search_term):
+        """Return open and completed tasks whose content, tags or note contain search_term
+        
+        Saved notes are searched in the notes file itself, so no note is
+        loaded unless it matches.
+        """
+        search_term = search_term.lower()
+        
+        def compute():
+            tag_ids = Task.tag_dictionary.matching(search_term)
+            hits = self.notes.find(search_term)
+            return [
+                t for tasks in (self.task_list, self.completed_tasks) for t in tasks
+                if tag_ids and not tag_ids.isdisjoint(t.tag_ids) or search_term in t.content.lower()
+                or (t.note_ref or t.note_text) and self._note_matches(t, search_term, hits)
+            ]
+            
+        return self._cached(
+            ("search", search_term, self.sort_key),
+            ("tasks", "order", "content", "tags"),
+            compute
+        )
+        
+    def _note_matches(self, task, term, hits):
+        """Whether a task's note contains term, given the spans NoteStore.find returned for it"""
+        if task.note_text is not None:
+            return term in task.note_text.lower()
+        offset, length = task.note_ref
+        index = bisect.bisect_left(hits, (offset,))
+        while index < len(hits) and hits[index][0] < offset + length:
+            if hits[index][1] <= offset + length:
+                return term in self.notes.read(task.note_ref).lower()
+            index += 1
+        return False
+        
+    @synchronized
+    def find_duplicates(self, content, tags=(), exclude=None, limit=5):
+        """Return (task, similarity) for open tasks that content and tags probably duplicate"""
+        return self.duplicates.similar(content, tags, exclude)[:limit]
+        
+    @synchronized
+    def duplicate_report(self, status="open", threshold=None):
+        """Group the top-level tasks with the given status into probable near-duplicates"""
+        return DuplicateIndex.groups(self.list_tasks(status), threshold)
+        
+    @synchronized
+    def list_tasks(self, status="open"):
+        """Return open, ready (open and not blocked), done or all top-level tasks"""
+        if status not in ("open", "ready", "done", "all"):
+            raise ValueError(f"Unknown status {status!r}")
+        if status == "ready":
+            return [t for t in self.task_list if not self.dependencies.is_blocked(t.id)]
+        lists = {"open": (self.task_list,), "done": (self.completed_tasks,)}
+        return [t for tasks in lists.get(status, (self.task_list, self.completed_tasks)) for t in tasks]
+        
+    @synchronized
+    def stats(self, now=None):
+        """Return counts and total completion time over the top-level tasks"""
+        return self.summarize(
+            ((t.priority, t.deadline, t.completion_time, t.creation_time)
+             for tasks in (self.task_list, self.completed_tasks) for t in tasks),
+            now or datetime.now()
+        )
+        
+    @staticmethod
+    def summarize(rows, now):
+        """Aggregate (priority, deadline, completion_time, creation_time) rows
+        
+        Summaries are additive, so those of disjoint shards can be combined
+        with merge_summaries.
+        """
+        total = completed = overdue = 0
+        completion_seconds = 0.0
+        priorities = {}
+        for priority, deadline, completion_time, creation_time in rows:
+            total += 1
+            if completion_time:
+                completed += 1
+                completion_seconds += (completion_time - creation_time).total_seconds()
+            else:
+                priorities[priority] = priorities.get(priority, 0) + 1
+                if deadline and deadline < now:
+                    overdue += 1
+        return {
+            "total": total,
+            "completed": completed,
+            "overdue": overdue,
+            "priorities": priorities,
+            "completion_seconds": completion_seconds
+        }
+        
+    @staticmethod
+    def merge_summaries(summaries):
+        """Add up summaries of disjoint sets of tasks"""
+        merged = {"total": 0, "completed": 0, "overdue": 0, "priorities": {}, "completion_seconds": 0.0}
+        for summary in summaries:
+            for key in ("total", "completed", "overdue", "completion_seconds"):
+                merged[key] += summary[key]
+            for priority, count in summary["priorities"].items():
+                merged["priorities"][priority] = merged["priorities"].get(priority, 0) + count
+        return merged
+        
+    @synchronized
+    def add_task(self, content, priority=0, deadline=None, tags=None, category=None):
+        """Add a new open task, optionally filing it under a category"""
+        new_task = Task(content, priority=priority, deadline=deadline, tags=tags)
+        self._touch(new_task)
+        self.task_list.append(new_task)
+        self._track_task(new_task)
+        if category and category != "All Tasks":
+            self.task_tree.add_task_to_category(category, new_task, self._category_state(new_task))
+            self._bump("category")
+        self._record(("add", new_task, self._paths(new_task)))
+        return new_task
+        
+    @synchronized
+    def edit_task(self, task, new_content):
+        """Replace the content of a task"""
+        if new_content == task.content:
+            return False
+        self._record(("edit", task, task.content, new_content))
+        task.content = new_content
+        self._touch(task)
+        self.text_index.update(task)
+        self.duplicates.update(task)
+        self._bump("content")
+        return True
+        
+    @synchronized
+    def complete_task(self, task):
+        """Mark a task as completed, spawning its next occurrence if it repeats"""
+        
+        self.task_list.pop(task)
+        self._untrack_task(task)
+        
+        
+        task.completion_time = datetime.now()
+        self._touch(task)
+        
+        
+        self.completed_tasks.append(task)
+        self._track_task(task)
+        
+        
+        next_task = self.spawn_next_occurrence(task)
+        self._record(("complete", task, next_task))
+        return next_task
+        
+    @synchronized
+    def delete_task(self, task):
+        """Delete a task completely, leaving a tombstone for other instances"""
+        (self.completed_tasks if task.completion_time else self.task_list).pop(task)
+        self._untrack_task(task)
+        self.dependencies.forget(task.id)
+        paths = self._paths(task)
+        if paths:
+            self.task_tree.unfile([task])
+            self._bump("category")
+        self._tombstone(task)
+        self._record(("delete", task, paths))
+        
+    def _paths(self, task):
+        """Return the category paths a task is filed under"""
+        return [node.path for node in self.task_tree.filings.get(task, ())]
+        
+    @synchronized
+    def set_priority(self, task, new_priority):
+        """Change task priority (0=High, 1=Medium, 2=Low)"""
+        if new_priority not in (0, 1, 2):
+            raise ValueError(f"Priority must be 0, 1 or 2, not {new_priority!r}")
+        if new_priority == task.priority:
+            return False
+        self._record(("priority", task, task.priority, new_priority))
+        task.priority = new_priority
+        self._touch(task)
+        self.kanban.place(task)
+        if task in self.urgency:
+            self.urgency.update(task)
+        self._bump("priority")
+        return True
+        
+    @synchronized
+    def set_tags(self, task, tags):
+        """Replace the tags of a task"""
+        old_ids = task.tag_ids
+        task.tags = [tag.strip() for tag in tags if tag.strip()]
+        if task.tag_ids == old_ids:
+            return False
+        self._touch(task)
+        self._record(("tags", task, old_ids, task.tag_ids))
+        self.tag_index.update(task)
+        self.duplicates.update(task)
+        self._bump("tags")
+        return True
+        
+    @synchronized
+    def set_blockers(self, task, blocker_ids):
+        """Make task wait until each of the given tasks is completed
+        
+        Raises ValueError, leaving the task as it was, if a blocker is the
+        task itself or already waits on it.
+        """
+        old_ids = tuple(task.blocked_by)
+        new_ids = tuple(dict.fromkeys(blocker_ids))
+        if set(new_ids) == set(old_ids):
+            return False
+        try:
+            for blocker_id in new_ids:
+                self.dependencies.add_edge(blocker_id, task.id)
+        except ValueError:
+            self.dependencies.update(task)
+            raise
+        task.blocked_by = list(new_ids)
+        self.dependencies.update(task)
+        self._touch(task)
+        self._record(("blockers", task, old_ids, new_ids))
+        self._bump("tasks")
+        return True
+        
+    def add_dependency(self, task, blocker):
+        """Make task wait until blocker is completed"""
+        return self.set_blockers(task, [*task.blocked_by, blocker.id])
+        
+    def remove_dependency(self, task, blocker):
+        return self.set_blockers(task, [task_id for task_id in task.blocked_by if task_id != blocker.id])
+        
+    @synchronized
+    def critical_path(self, task):
+        """Return the longest chain of open tasks that ends with task, first blocker first"""
+        return [self.tasks_by_id[task_id] for task_id in self.dependencies.critical_path(task.id)]
+        
+    @synchronized
+    def get_note(self, task):
+        """Return the note of a task, reading it from the notes file if it was saved"""
+        if task.note_text is not None:
+            return task.note_text
+        return self.notes.read(task.note_ref) if task.note_ref else ""
+        
+    @synchronized
+    def set_note(self, task, text):
+        """Replace the note of a task; it is appended to the notes file on the next save"""
+        if text == self.get_note(task):
+            return False
+        old = (task.note_ref, task.note_text)
+        task.note_ref, task.note_text = None, text or None
+        self._touch(task)
+        self._record(("note", task, old, (task.note_ref, task.note_text)))
+        self._bump("content")
+        return True
+        
+    def _store_notes(self):
+        """Append notes edited since the last save to the notes file"""
+        pending = [
+            task for tasks in (self.task_list, self.completed_tasks) for top in tasks
+            for task in (top, *top.iter_descendants()) if task.note_text is not None
+        ]
+        for task, ref in zip(pending, self.notes.append([task.note_text for task in pending])):
+            task.note_ref, task.note_text = ref, None
+            
+    @synchronized
+    def record_for(self, task):
+        """Serialize a task for another store, with its note inline instead of a notes file reference"""
+        record = task.to_dict()
+        if task.note_ref:
+            record["note"] = self.notes.read(task.note_ref)
+        return record
+        
+    @synchronized
+    def set_deadline(self, task, new_deadline):
+        """Set or clear the deadline of a task"""
+        if new_deadline == task.deadline:
+            return False
+        self._record(("deadline", task, task.deadline, new_deadline))
+        task.deadline = new_deadline
+        self._touch(task)
+        if task.completion_time is None:
+            self.deadline_index.update(task)
+            self._arm_deadline(task)
+        self._bump("deadline")
+        return True
+        
+    @synchronized
+    def set_recurrence(self, task, text):
+        """Make a task repeat, or stop it repeating when text is empty
+        
+        Raises ValueError for rules that cannot be parsed or never occur.
+        """
+        text = (text or "").strip()
+        rule = RecurrenceRule.parse(text) if text else None
+        
+        deadline = task.deadline
+        if rule and not deadline:
+            now = datetime.now().replace(second=0, microsecond=0)
+            deadline = rule.next_after(now, now)
+            if deadline is None:
+                raise ValueError("This rule never occurs")
+                
+        old = (task.recurrence, task.recurrence_anchor, task.deadline)
+        new = (text or None, deadline if rule else None, deadline)
+        if new == old:
+            return False
+        self._record(("recurrence", task, old, new))
+        self._set_recurrence(task, new)
+        self._touch(task)
+        return True
+        
+    def _set_recurrence(self, task, state):
+        """Give a task a (recurrence, anchor, deadline) state, keeping the indexes in step"""
+        task.recurrence, task.recurrence_anchor, deadline = state
+        if deadline != task.deadline:
+            task.deadline = deadline
+            if task.completion_time is None:
+                self.deadline_index.update(task)
+                self._arm_deadline(task)
+            self._bump("deadline")
+        if task.recurrence and task.completion_time is None:
+            self.recurring_tasks.add(task)
+        else:
+            self.recurring_tasks.discard(task)
+        self._bump("tasks")
+            
+    @synchronized
+    def spawn_next_occurrence(self, task):
+        """Create the next open occurrence of a completed recurring task
+        
+        It keeps the task's tags, blockers, note and categories.
+        """
+        if not task.recurrence:
+            return None
+        after = max(task.deadline or task.completion_time, task.completion_time)
+        deadline = task.next_occurrence(after)
+        if deadline is None:
+            return None
+            
+        next_task = Task(task.content, priority=task.priority, deadline=deadline)
+        next_task.tag_ids = task.tag_ids
+        next_task.recurrence = task.recurrence
+        next_task.recurrence_anchor = task.recurrence_anchor or task.deadline
+        next_task.blocked_by = list(task.blocked_by)
+        next_task.note_ref, next_task.note_text = task.note_ref, task.note_text
+        self._touch(next_task)
+        self.task_list.append(next_task)
+        self._track_task(next_task)
+        self._refile_occurrence(task, next_task)
+        return next_task
+        
+    def _refile_occurrence(self, task, next_task):
+        """File an occurrence under the categories of the task it follows"""
+        paths = self._paths(task)
+        if paths:
+            self.task_tree.refile(next_task, paths, self._category_state(next_task))
+            self._bump("category")
+        
+    def recurring_occurrences(self, start, end):
+        """Yield (deadline, task) for future occurrences of open recurring tasks
+        in [start, end), generated only for the requested window"""
+        for task in self.recurring_tasks:
+            after = max(start, task.deadline + timedelta(microseconds=1)) if task.deadline else start
+            anchor = task.recurrence_anchor or task.deadline or start
+            for occurrence in task.rule.occurrences(anchor, after, end):
+                yield occurrence, task
+                
+    def recurring_days(self, start, end):
+        """Yield (first occurrence, count, task) per day of [start, end) on which
+        an open recurring task has future occurrences, for calendar views"""
+        for task in self.recurring_tasks:
+            after = max(start, task.deadline + timedelta(microseconds=1)) if task.deadline else start
+            anchor = task.recurrence_anchor or task.deadline or start
+            for first, count in task.rule.days(anchor, after, end):
+                yield first, count, task
+                
+    @synchronized
+    def add_subtask(self, parent_task, content):
+        """Add a subtask to a parent task"""
+        subtask = parent_task.add_subtask(Task(content, priority=parent_task.priority))
+        self._touch(subtask)
+        self._record(("subtask", parent_task, subtask))
+        return subtask
+        
+    @synchronized
+    def toggle_subtask(self, task):
+        """Toggle completion of a subtask"""
+        old_time = task.completion_time
+        new_time = None if old_time else datetime.now()
+        task.set_completion_time(new_time)
+        self._touch(task)
+        self._record(("toggle", task, old_time, new_time))
+        
+    @synchronized
+    def move_to_category(self, task, category):
+        """File a task under a category, creating it if needed, and take it out of its old one"""
+        self.task_tree.move(task, category, self._category_state(task))
+        self._touch(task)
+        self._bump("category")
+        
+    @synchronized
+    def sort_tasks(self, key):
+        """Sort open tasks by priority, deadline, creation_time, dependencies, effective or content
+        
+        Sorting by dependencies places every task after its blockers. The
+        effective order is kept by the urgency index as time passes, so
+        choosing it only switches the views over to that index.
+        """
+        if key == "effective":
+            self.sort_key = key
+            self._bump("order")
+            return
+        if key == "priority":
+            key_func = lambda x: x.priority
+        elif key == "deadline":
+            key_func = lambda x: x.deadline or datetime.max
+        elif key == "creation_time":
+            key_func = lambda x: x.creation_time
+        elif key == "dependencies":
+            key_func = lambda x: self.dependencies.order_key(x.id)
+        else:  
+            key_func = lambda x: x.content.lower()
+            
+        sorted_tasks = self.task_list.merge_sort(key_func)
+        
+        
+        self.task_list = TaskLinkedList()
+        for task in sorted_tasks:
+            self.task_list.append(task)
+            
+        self.sort_key = key
+        self._bump("order")
+        
+    @synchronized
+    def undo(self):
+        """Undo the last action; returns it, or None if there was nothing to undo"""
+        if not self.history_stack:
+            return None
+            
+        action = self.history_stack.pop()
+        self.future_stack.append(action)
+        
+        if action[0] == "add":
+            
+            task = action[1]
+            self.task_list.pop(task)
+            self._untrack_task(task)
+            self.task_tree.unfile([task])
+            self._tombstone(task)
+        elif action[0] == "delete":
+            
+            task = action[1]
+            (self.completed_tasks if task.completion_time else self.task_list).append(task)
+            self._track_task(task)
+            self.task_tree.refile(task, action[2] if len(action) > 2 else [], self._category_state(task))
+            self.deleted_ids.pop(task.id, None)
+        elif action[0] == "edit":
+            
+            task, old_content = action[1], action[2]
+            task.content = old_content
+            self.text_index.update(task)
+            self.duplicates.update(task)
+        elif action[0] == "deadline":
+            
+            task, old_deadline = action[1], action[2]
+            task.deadline = old_deadline
+            if task.completion_time is None:
+                self.deadline_index.update(task)
+                self._arm_deadline(task)
+        elif action[0] == "complete":
+            
+            task = action[1]
+            self.completed_tasks.pop(task)
+            self._untrack_task(task)
+            task.set_completion_time(None)
+            self.task_list.append(task)
+            self._track_task(task)
+            if len(action) > 2 and action[2]:
+                self.task_list.pop(action[2])
+                self._untrack_task(action[2])
+                self.task_tree.unfile([action[2]])
+                self._tombstone(action[2])
+        elif action[0] == "priority":
+            
+            task, old_priority = action[1], action[2]
+            task.priority = old_priority
+            self.kanban.place(task)
+            if task in self.urgency:
+                self.urgency.update(task)
+        elif action[0] == "subtask":
+            
+            parent_task, subtask = action[1], action[2]
+            parent_task.remove_subtask(subtask)
+            self._tombstone(subtask)
+        elif action[0] == "toggle":
+            
+            task, old_time = action[1], action[2]
+            task.set_completion_time(old_time)
+        elif action[0] == "tags":
+            
+            task, old_ids = action[1], action[2]
+            task.tag_ids = old_ids
+            self.tag_index.update(task)
+            self.duplicates.update(task)
+        elif action[0] == "blockers":
+            
+            task, old_ids = action[1], action[2]
+            task.blocked_by = list(old_ids)
+            self.dependencies.update(task)
+        elif action[0] == "note":
+            
+            task = action[1]
+            task.note_ref, task.note_text = action[2]
+        elif action[0] == "recurrence":
+            
+            self._set_recurrence(action[1], action[2])
+            
+        if action[1].id not in self.deleted_ids:
+            self._touch(action[1])
+        self._bump(*self.ACTION_FACETS.get(action[0], ()))
+        return action
+        
+    @synchronized
+    def redo(self):
+        """Redo the last undone action; returns it, or None if there was nothing to redo"""
+        if not self.future_stack:
+            return None
+            
+        action = self.future_stack.pop()
+        self.history_stack.append(action)
+        
+        if action[0] == "add":
+            
+            task = action[1]
+            self.task_list.append(task)
+            self._track_task(task)
+            self.task_tree.refile(task, action[2] if len(action) > 2 else [], self._category_state(task))
+            self.deleted_ids.pop(task.id, None)
+        elif action[0] == "delete":
+            
+            task = action[1]
+            (self.completed_tasks if task.completion_time else self.task_list).pop(task)
+            self._untrack_task(task)
+            self.task_tree.unfile([task])
+            self._tombstone(task)
+        elif action[0] == "edit":
+            
+            task, new_content = action[1], action[3]
+            task.content = new_content
+            self.text_index.update(task)
+            self.duplicates.update(task)
+        elif action[0] == "deadline":
+            
+            task, new_deadline = action[1], action[3]
+            task.deadline = new_deadline
+            if task.completion_time is None:
+                self.deadline_index.update(task)
+                self._arm_deadline(task)
+        elif action[0] == "complete":
+            
+            task = action[1]
+            self.task_list.pop(task)
+            self._untrack_task(task)
+            task.set_completion_time(datetime.now())
+            self.completed_tasks.append(task)
+            self._track_task(task)
+            if len(action) > 2 and action[2]:
+                self.task_list.append(action[2])
+                self._track_task(action[2])
+                self._refile_occurrence(task, action[2])
+                self.deleted_ids.pop(action[2].id, None)
+                self._touch(action[2])
+        elif action[0] == "priority":
+            
+            task, new_priority = action[1], action[3]
+            task.priority = new_priority
+            self.kanban.place(task)
+            if task in self.urgency:
+                self.urgency.update(task)
+        elif action[0] == "subtask":
+            
+            parent_task, subtask = action[1], action[2]
+            parent_task.add_subtask(subtask)
+            self.deleted_ids.pop(subtask.id, None)
+            self._touch(subtask)
+        elif action[0] == "toggle":
+            
+            task, new_time = action[1], action[3]
+            task.set_completion_time(new_time)
+        elif action[0] == "tags":
+            
+            task, new_ids = action[1], action[3]
+            task.tag_ids = new_ids
+            self.tag_index.update(task)
+            self.duplicates.update(task)
+        elif action[0] == "blockers":
+            
+            task, new_ids = action[1], action[3]
+            task.blocked_by = list(new_ids)
+            self.dependencies.update(task)
+        elif action[0] == "note":
+            
+            task = action[1]
+            task.note_ref, task.note_text = action[3]
+        elif action[0] == "recurrence":
+            
+            self._set_recurrence(action[1], action[3])
+            
+        if action[1].id not in self.deleted_ids:
+            self._touch(action[1])
+        self._bump(*self.ACTION_FACETS.get(action[0], ()))
+        return action
+        
+    @synchronized
+    def apply(self, request):
+        """Apply one operation given as a dict, e.g. {"op": "add", "content": "..."}
+        
+        Supported ops are add, complete, delete, edit, priority, deadline,
+        tags, blockers, note, query, search, list and next. Returns a
+        JSON-serializable result; an added task lists the open tasks it
+        probably duplicates. Raises KeyError for unknown task ids and
+        ValueError for bad requests.
+        """
+        if not isinstance(request, dict):
+            raise ValueError("an operation must be a JSON object")
+        op = request.get("op")
+        if op == "add":
+            content = str(request.get("content") or "").strip()
+            if not content:
+                raise ValueError("add needs non-empty content")
+            task = self.add_task(
+                content,
+                priority=self.parse_priority(request.get("priority", 0)),
+                deadline=self.parse_deadline(request.get("deadline")),
+                tags=list(request.get("tags") or []),
+                category=request.get("category")
+            )
+            record = task.to_dict()
+            duplicates = self.find_duplicates(task.content, task.tags, exclude=task)
+            if duplicates:
+                record["duplicates"] = [{"id": other.id, "similarity": round(score, 2)} for other, score in duplicates]
+            return record
+        if op in ("query", "search", "list", "next"):
+            if op == "query":
+                tasks = self.run_query(str(request.get("q", "")))
+            elif op == "search":
+                tasks = self.search(str(request.get("q", "")))
+            elif op == "next":
+                tasks = self.next_tasks(request.get("limit"))
+            else:
+                tasks = self.list_tasks(request.get("status", "open"))
+            return [self.record_for(t) for t in islice(tasks, request.get("limit"))]
+            
+        task = self.get_task(request.get("id"))
+        if op == "complete":
+            if task.completion_time is None:
+                self.complete_task(task)
+        elif op == "delete":
+            self.delete_task(task)
+            return {"id": task.id, "deleted": True}
+        elif op == "edit":
+            self.edit_task(task, str(request["content"]))
+        elif op == "priority":
+            self.set_priority(task, self.parse_priority(request["priority"]))
+        elif op == "deadline":
+            self.set_deadline(task, self.parse_deadline(request.get("deadline")))
+        elif op == "tags":
+            self.set_tags(task, list(request.get("tags") or []))
+        elif op == "blockers":
+            self.set_blockers(task, [self.get_task(str(task_id)).id for task_id in request.get("blocked_by") or []])
+        elif op == "note":
+            self.set_note(task, str(request.get("note") or ""))
+        else:
+            raise ValueError(f"Unknown op {op!r}")
+        return self.record_for(task)
+        
+    @synchronized
+    def apply_batch(self, requests):
+        """Apply several operations in order, collecting a result or error for each"""
+        results = []
+        for request in requests:
+            try:
+                results.append({"ok": self.apply(request)})
+            except (KeyError, ValueError, TypeError) as e:
+                results.append({"error": str(e.args[0]) if e.args else type(e).__name__})
+        return results
+        
+    @staticmethod
+    def parse_deadline(value):
+        """ISO date or datetime string to a datetime, None for empty"""
+        return datetime.fromisoformat(value) if value else None
+        
+    @staticmethod
+    def parse_priority(value):
+        """Priority as 0, 1 or 2, ValueError for anything else"""
+        priority = int(value)
+        if priority not in (0, 1, 2):
+            raise ValueError(f"Priority must be 0, 1 or 2, not {value!r}")
+        return priority
+        
+    def _attach_subtasks(self, records):
+        """Rebuild subtask trees from flat records that reference their parent id
+        
+        Records are dicts, or (parent id, Task) pairs already parsed elsewhere.
+        """
+        by_id = dict(self.tasks_by_id)
+        for record in records:
+            parent_id, subtask = (record.get("parent"), record) if isinstance(record, dict) else record
+            parent = by_id.get(parent_id)
+            if parent:
+                subtask = parent.add_subtask(Task.from_dict(subtask) if isinstance(subtask, dict) else subtask)
+                by_id[subtask.id] = subtask
+                
+    @synchronized
+    def write_data(self, f, local=False):
+        """Stream the whole store to f as JSON, one record per line
+        
+        Records are serialized as they are visited, so saving never builds
+        the full document in memory. Subtasks are written flat in pre-order
+        so parents precede children. Our own data file (local) references
+        notes by their place in the notes file and records how much of the
+        archive file is committed; anything else gets the notes inline.
+        """
+        def write_list(records):
+            f.write("[")
+            separator = "\n  "
+            for record in records:
+                f.write(separator)
+                f.write(json.dumps(record))
+                separator = ",\n  "
+            f.write("\n]")
+            
+        serialize = Task.to_dict if local else self.record_for
+        f.write('{"tasks": ')
+        write_list(serialize(t) for t in self.task_list)
+        f.write(',\n"completed": ')
+        write_list(serialize(t) for t in self.completed_tasks)
+        f.write(',\n"subtasks": ')
+        write_list(
+            serialize(subtask)
+            for tasks in (self.task_list, self.completed_tasks)
+            for task in tasks
+            for subtask in task.iter_descendants()
+        )
+        
+        f.write(',\n"categories": {')
+        separator = "\n"
+        for node in self.task_tree.iter_nodes():
+            if node is self.task_tree.root or not node.tasks:
+                continue
+            f.write(f"{separator}{json.dumps(node.path)}: ")
+            write_list(serialize(t) for t in node.tasks)
+            separator = ",\n"
+        f.write("},\n")
+        f.write(f'"deleted": {json.dumps(self.deleted_ids)},\n')
+        deleted_at = {task_id: self.deleted_at[task_id] for task_id in self.deleted_ids if task_id in self.deleted_at}
+        f.write(f'"deleted_at": {json.dumps(deleted_at)},\n')
+        tombstones = {task_id: seq for task_id, seq in self.tombstone_seq.items() if task_id in self.deleted_ids}
+        f.write(f'"deleted_seq": {json.dumps(tombstones)},\n')
+        f.write(f'"replica": {json.dumps(self.replica_id)},\n')
+        f.write(f'"peers": {json.dumps(self.peers)},\n')
+        if local:
+            f.write(f'"archive": {json.dumps({"size": self.archive.size, "count": self.archive.count})},\n')
+        f.write(f'"queries": {json.dumps(self.saved_queries)}}}\n')
+        
+    @synchronized
+    def read_data(self, data, words=None):
+        """Add the tasks, categories and queries of a loaded document
+        
+        The task sections may hold records or Task objects parsed elsewhere
+        (see task_parallel), with words mapping tasks to their content words.
+        """
+        self.deleted_ids.update(data.get("deleted", {}))
+        self._stamp_tombstones(data.get("deleted_at", {}))
+            
+        loaded = []
+        for section, tasks in (("tasks", self.task_list), ("completed", self.completed_tasks)):
+            for task_data in data.get(section, []):
+                task = Task.from_dict(task_data) if isinstance(task_data, dict) else task_data
+                tasks.append(task)
+                loaded.append(task)
+        self._track_many(loaded, words)
+            
+        self._attach_subtasks(data.get("subtasks", []))
+            
+        for category, tasks in data.get("categories", {}).items():
+            for task_data in tasks:
+                task = self.tasks_by_id.get(task_data.get("id")) or Task.from_dict(task_data)
+                self.task_tree.add_task_to_category(category, task, self._category_state(task))
+                
+        self.saved_queries.update(data.get("queries", {}))
+        self._rebuild_change_log(data.get("deleted_seq", {}))
+        
+    def _stamp_tombstones(self, deleted_at):
+        """Give tombstones their deletion time, taking now for ones saved without it"""
+        now = datetime.now().isoformat(timespec="seconds")
+        for task_id in self.deleted_ids:
+            if task_id not in self.deleted_at:
+                self.deleted_at[task_id] = deleted_at.get(task_id, now)
+                
+    @synchronized
+    def prune_tombstones(self, now=None):
+        """Forget tombstones that no store should need any more; returns how many
+        
+        A tombstone goes once it is TOMBSTONE_DAYS old and every known peer
+        has pulled past it, or once it is TOMBSTONE_EXPIRY_DAYS old even if
+        some peer never came back. Its change log entry stays until the next
+        load and is reported as archived, so local consumers still drop it.
+        """
+        now = now or datetime.now()
+        settled = (now - timedelta(days=self.TOMBSTONE_DAYS)).isoformat(timespec="seconds")
+        expired = (now - timedelta(days=self.TOMBSTONE_EXPIRY_DAYS)).isoformat(timespec="seconds")
+        pulled = min((state.get("pushed", 0) for state in self.peers.values()), default=self.change_seq)
+        pruned = 0
+        for task_id in list(self.deleted_ids):
+            deleted_at = self.deleted_at.get(task_id, settled)
+            if deleted_at <= expired or deleted_at <= settled and self.tombstone_seq.get(task_id, 0) <= pulled:
+                del self.deleted_ids[task_id]
+                pruned += 1
+        self.deleted_at = {task_id: self.deleted_at[task_id] for task_id in self.deleted_ids if task_id in self.deleted_at}
+        return pruned
+        
+    def _rebuild_change_log(self, tombstone_seq):
+        """Order the change log by the sequence numbers saved with each record"""
+        entries = [
+            (task.seq, task.id, task)
+            for tasks in (self.task_list, self.completed_tasks)
+            for top in tasks
+            for task in (top, *top.iter_descendants())
+        ]
+        entries.extend((tombstone_seq.get(task_id, 0), task_id, None) for task_id in self.deleted_ids)
+        entries.sort(key=lambda entry: entry[0])
+        
+        self.change_log = OrderedDict((task_id, task) for _, task_id, task in entries)
+        self.tombstone_seq = {task_id: seq for seq, task_id, task in entries if task is None}
+        self.change_seq = entries[-1][0] if entries else 0
+        self.clock = max([self.clock] + [task.version for _, _, task in entries if task] + list(self.deleted_ids.values()))
+        
+    @synchronized
+    def import_file(self, filepath, pool=None):
+        """Replace the store with the contents of an exported file
+        
+        A task_parallel.TaskPool, if given, parses the records in parallel.
+        The file is read into a separate engine first, so a file that fails
+        to parse leaves the store as it was.
+        """
+        with open(filepath, 'r') as f:
+            data, words = pool.parse(f) if pool else (json.load(f), None)
+        staged = TaskEngine(self.data_file)
+        staged.reset(data.get("deleted", {}))
+        staged.read_data(data, words)
+        for name in self.STATE:
+            setattr(self, name, getattr(staged, name))
+        self.saved_queries.update(staged.saved_queries)
+        self.result_cache.clear()
+        self._bump(*self.FACETS)
+        
+    @synchronized
+    def export_file(self, filepath):
+        """Write the whole store to filepath"""
+        with open(filepath, 'w') as f:
+            self.write_data(f)
+            
+    @synchronized
+    def load(self, pool=None):
+        """Load tasks from the data file, if there is one
+        
+        A task_parallel.TaskPool, if given, parses the records in parallel.
+        """
+        if os.path.exists(self.data_file):
+            with FileLock(self.data_file + ".lock"):
+                with open(self.data_file, 'r') as f:
+                    data, words = pool.parse(f) if pool else (json.load(f), None)
+                self.data_signature = FileLock.signature(self.data_file)
+                self.archive.restore(**data.get("archive", {"size": 0, "count": 0}))
+            self.replica_id = data.get("replica", self.replica_id)
+            self.peers.update(data.get("peers", {}))
+            self.read_data(data, words)
+            
+    @synchronized
+    def save(self):
+        """Save tasks to the data file
+        
+        Runs under the data file lock. If another instance wrote the file
+        since we last read it, its changes are merged in first so they are
+        not overwritten. Completed tasks older than archive_days are then
+        appended to the archive and edited notes to the notes file, and the
+        new file, which commits both, is swapped in atomically.
+        """
+        with FileLock(self.data_file + ".lock"):
+            if FileLock.signature(self.data_file) not in (None, self.data_signature):
+                with open(self.data_file, 'r') as f:
+                    data = json.load(f)
+                self._adopt_archive(data)
+                self.merge_data(data)
+            self._archive_old()
+            self._store_notes()
+            self.prune_tombstones()
+                    
+            temp_path = self.data_file + ".tmp"
+            with open(temp_path, 'w') as f:
+                self.write_data(f, local=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.data_file)
+            self.data_signature = FileLock.signature(self.data_file)
+            
+    @synchronized
+    def poll(self):
+        """Merge changes other instances saved; a stat call when nothing changed
+        
+        Returns the number of tasks that changed.
+        """
+        signature = FileLock.signature(self.data_file)
+        if signature is None or signature == self.data_signature:
+            return 0
+        with FileLock(self.data_file + ".lock", timeout=0.5):
+            with open(self.data_file, 'r') as f:
+                data = json.load(f)
+            self.data_signature = FileLock.signature(self.data_file)
+            dropped = self._adopt_archive(data)
+        return dropped + self.merge_data(data)
+        
+    def _archive_cutoff(self, now=None):
+        if self.archive_days is None:
+            return datetime.min
+        return (now or datetime.now()) - timedelta(days=self.archive_days)
+        
+    def _archive_old(self, now=None):
+        """Append completed tasks older than archive_days to the archive and drop them
+        
+        Only called from save, under the file lock; returns how many moved.
+        """
+        cutoff = self._archive_cutoff(now)
+        old = [task for task in self.completed_tasks if task.completion_time < cutoff]
+        if not old:
+            return 0
+        archived = set(old)
+        paths = {}
+        for node in self.task_tree.iter_nodes():
+            for task in node.tasks:
+                if task in archived and node is not self.task_tree.root:
+                    paths.setdefault(task, []).append(node.path)
+        self.archive.append([
+            {
+                "id": task.id,
+                "task": task.to_dict(),
+                "subtasks": [subtask.to_dict() for subtask in task.iter_descendants()],
+                "categories": paths.get(task, [])
+            }
+            for task in old
+        ])
+        self._drop_archived(old)
+        return len(old)
+        
+    def _adopt_archive(self, data):
+        """Drop our copies of tasks another instance has archived since we last looked"""
+        info = data.get("archive")
+        if not info:
+            return 0
+        added = self.archive.advance(info["size"], info["count"])
+        dropped = [task for task in map(self.tasks_by_id.get, added) if task and task.completion_time]
+        self._drop_archived(dropped)
+        return len(dropped)
+        
+    def _drop_archived(self, tasks):
+        """Forget archived tasks: lists, indexes, categories, change log and undo history"""
+        if not tasks:
+            return
+        archived = set(tasks)
+        for task in tasks:
+            self.completed_tasks.pop(task)
+            self._untrack_task(task)
+            self.dependencies.forget(task.id)
+            for node in (task, *task.iter_descendants()):
+                # Logged as a removal without a tombstone, so local consumers of
+                # changes_since drop their copies but other stores keep theirs
+                self._log(node.id, None)
+        self.task_tree.unfile(archived)
+        self.history_stack = [action for action in self.history_stack if action[1] not in archived]
+        self.future_stack = [action for action in self.future_stack if action[1] not in archived]
+        self._bump(*self.FACETS)
+        
+    @synchronized
+    def completed_page(self, number, size=ArchiveSegment.PAGE):
+        """Return one page of completed tasks, newest first, and the total count
+        
+        Tasks still in the store come first, then archived ones, which are
+        read from the archive file as detached Task objects. Only the hot
+        list and the archive lines up to the page are visited.
+        """
+        hot = self.completed_tasks.size
+        start = number * size
+        tasks = list(islice(reversed(self.completed_tasks), start, start + size))
+        if len(tasks) < size:
+            records = self.archive.read(max(0, start - hot), size - len(tasks))
+            tasks.extend(Task.from_dict(record["task"]) for record in records)
+        return tasks, hot + self.archive.count
+        
+    @synchronized
+    def merge_data(self, data):
+        """Merge another store's saved state or delta by task id
+        
+        Copies are ordered by their (Lamport version, origin replica) stamp,
+        so every store applying the same records ends up with the same
+        winner. Tombstones delete local copies that are not newer. Applied
+        records are re-logged so they travel on to further peers. Returns
+        the number of tasks that changed.
+        """
+        changed = 0
+        nodes = None
+        placed = []
+        
+        def find_node(task_id):
+            nonlocal nodes
+            if nodes is None:
+                nodes = {}
+                for tasks in (self.task_list, self.completed_tasks):
+                    for task in tasks:
+                        nodes[task.id] = task
+                        for subtask in task.iter_descendants():
+                            nodes[subtask.id] = subtask
+            return nodes.get(task_id)
+            
+        for task_id, version in data.get("deleted", {}).items():
+            self.clock = max(self.clock, version)
+            local = self.tasks_by_id.get(task_id)
+            if version > self.deleted_ids.get(task_id, 0):
+                self.deleted_ids[task_id] = version
+                self.deleted_at.pop(task_id, None)
+                self._log(task_id, None)
+                local = local or find_node(task_id)
+            if local and version >= local.version:
+                if local.parent:
+                    local.parent.remove_subtask(local)
+                else:
+                    (self.completed_tasks if local.completion_time else self.task_list).pop(local)
+                    self._untrack_task(local)
+                    self.dependencies.forget(local.id)
+                    self.task_tree.unfile([local])
+                changed += 1
+                
+        for record in data.get("tasks", []) + data.get("completed", []):
+            version = record.get("version", 1)
+            self.clock = max(self.clock, version)
+            if self.deleted_ids.get(record.get("id"), 0) >= version:
+                continue
+            local = self.tasks_by_id.get(record.get("id"))
+            if local is None:
+                task = Task.from_dict(record)
+                if task.completion_time and task.completion_time < self._archive_cutoff() and task.id in self.archive:
+                    continue
+                (self.completed_tasks if task.completion_time else self.task_list).append(task)
+                self._track_task(task)
+                self._log(task.id, task)
+                placed.append(task)
+                changed += 1
+            elif (version, record.get("origin", "")) > local.stamp():
+                was_done = local.completion_time is not None
+                self._untrack_task(local)
+                local.apply_dict(record)
+                if was_done != (local.completion_time is not None):
+                    (self.completed_tasks if was_done else self.task_list).pop(local)
+                    (self.task_list if was_done else self.completed_tasks).append(local)
+                self._track_task(local)
+                self._log(local.id, local)
+                placed.append(local)
+                changed += 1
+                
+        for record in data.get("subtasks", []):
+            version = record.get("version", 1)
+            self.clock = max(self.clock, version)
+            if self.deleted_ids.get(record.get("id"), 0) >= version:
+                continue
+            local = find_node(record.get("id"))
+            if local is None:
+                parent = find_node(record.get("parent"))
+                if parent:
+                    subtask = nodes[record["id"]] = parent.add_subtask(Task.from_dict(record))
+                    self._log(subtask.id, subtask)
+                    changed += 1
+            elif (version, record.get("origin", "")) > local.stamp():
+                local.apply_dict(record)
+                self._log(local.id, local)
+                changed += 1
+                
+        # A winning record brings its categories along: the paths listed for
+        # it replace wherever it was filed here, so moves carry across
+        if placed and "categories" in data:
+            paths = {}
+            for path, records in data["categories"].items():
+                for record in records:
+                    paths.setdefault(record.get("id"), []).append(path)
+            for task in placed:
+                self.task_tree.refile(task, paths.get(task.id, []), self._category_state(task))
+                
+        for name, text in data.get("queries", {}).items():
+            if name not in self.saved_queries:
+                self.saved_queries[name] = text
+                
+        self._stamp_tombstones(data.get("deleted_at", {}))
+        if changed:
+            self._bump(*self.FACETS)
+        return changed
+        
+    @synchronized
+    def changes_since(self, seq, exclude_origin=None):
+        """Return a delta with every record logged after sequence number seq
+        
+        The delta has the same shape as the data file, so merge_data can
+        apply it, plus the replica id and the sequence number to resume
+        from next time. Records last written by exclude_origin are left
+        out, since that peer already has them. Ids moved to the archive or
+        whose tombstone was pruned are listed under archived for local
+        consumers; merge_data ignores them.
+        Walks the log backwards, so the cost is proportional to the number
+        of changes, not the store.
+        """
+        changed = []
+        for task_id in reversed(self.change_log):
+            task = self.change_log[task_id]
+            entry_seq = self.tombstone_seq.get(task_id, 0) if task is None else task.seq
+            if entry_seq <= seq:
+                break
+            changed.append((task_id, task))
+        changed.reverse()
+        
+        delta = {"tasks": [], "completed": [], "subtasks": [], "deleted": {}, "archived": [], "categories": {}}
+        live = set()
+        for task_id, task in changed:
+            if task is None:
+                if task_id in self.deleted_ids:
+                    delta["deleted"][task_id] = self.deleted_ids[task_id]
+                else:
+                    delta["archived"].append(task_id)
+            elif exclude_origin is None or task.origin != exclude_origin:
+                section = "subtasks" if task.parent else "completed" if task.completion_time else "tasks"
+                delta[section].append(self.record_for(task))
+                live.add(task)
+                
+        if live:
+            for node in self.task_tree.iter_nodes():
+                filed = [{"id": task.id} for task in node.tasks if task in live]
+                if filed and node is not self.task_tree.root:
+                    delta["categories"][node.path] = filed
+        delta.update(replica=self.replica_id, seq=self.change_seq, clock=self.clock, queries=self.saved_queries)
+        return delta
+        
+    @synchronized
+    def merge_changes(self, delta):
+        """Apply a delta from changes_since; returns the number of tasks that changed"""
+        self.clock = max(self.clock, delta.get("clock", 0))
+        return self.merge_data(delta)
+        
+    def sync(self, other):
+        """Exchange deltas with another in-process store"""
+        state = self.peers.setdefault(other.replica_id, {"pulled": 0, "pushed": 0})
+        outgoing = self.changes_since(state["pushed"], exclude_origin=other.replica_id)
+        incoming = other.changes_since(state["pulled"], exclude_origin=self.replica_id)
+        changed = self.merge_changes(incoming)
+        other.merge_changes(outgoing)
+        state["pulled"], state["pushed"] = incoming["seq"], outgoing["seq"]
+        other.peers[self.replica_id] = {"pulled": outgoing["seq"], "pushed": incoming["seq"]}
+        return changed
+        
+    @synchronized
+    def exchange(self, request):
+        """Serve one side of a remote sync
+        
+        request carries the peer's replica id, the sequence number it has
+        pulled up to, and its own changes. Returns our changes since then.
+        """
+        since = int(request.get("since", 0))
+        reply = self.changes_since(since, exclude_origin=request.get("replica"))
+        self.merge_changes(request.get("changes") or {})
+        if request.get("replica"):
+            state = self.peers.setdefault(request["replica"], {"pulled": 0, "pushed": 0})
+            state["pushed"] = max(state["pushed"], since)
+        return reply
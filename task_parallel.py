@@ -0,0 +1,212 @@
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from task_engine import Task, TextIndex, TaskEngine
+
+
+# Scan rows kept resident in each worker, keyed by task id:
+# (folded content, folded tags, priority, deadline, completion_time, creation_time)
+_shard = {}
+
+
+def _parse_chunk(text):
+    """Parse newline separated records into (row, words) pairs
+    
+    Words are interned so each distinct word is pickled once per chunk.
+    """
+    parsed = []
+    for line in text.split("\n"):
+        line = line.strip().rstrip(",")
+        if line:
+            record = json.loads(line)
+            words = tuple(map(sys.intern, TextIndex.tokenize(record["content"])))
+            parsed.append((Task.row_from_dict(record), words))
+    return parsed
+
+
+def _shard_reset(rows):
+    _shard.clear()
+    _shard.update((row[0], row[1:]) for row in rows)
+
+
+def _shard_update(rows, deleted):
+    for task_id in deleted:
+        _shard.pop(task_id, None)
+    _shard.update((row[0], row[1:]) for row in rows)
+
+
+def _shard_search(term):
+    return [
+        task_id for task_id, (content, tags, *_) in _shard.items()
+        if term in content or any(term in tag for tag in tags)
+    ]
+
+
+def _shard_stats(now):
+    return TaskEngine.summarize((row[2:] for row in _shard.values()), now)
+
+
+class TaskPool:
+    """Opt-in process pool for bulk work on large stores
+    
+    parse splits a data file written by TaskEngine.write_data into chunks
+    that worker processes turn into compact rows and word sets, which the
+    engine then indexes in one pass (see TaskEngine.load and import_file).
+    
+    search and stats scan shards of the top-level tasks kept resident in
+    the workers, one process per shard, so only the changes logged since
+    the last call are shipped before each scan.
+    """
+    SECTIONS = ("tasks", "completed", "subtasks")
+    CHUNKS_PER_WORKER = 4
+    
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executors = [ProcessPoolExecutor(max_workers=1) for _ in range(self.workers)]
+        self.engine = None
+        self.change_log = None
+        self.seq = 0
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *exc):
+        self.close()
+        
+    def close(self):
+        for executor in self.executors:
+            executor.shutdown()
+            
+    def _map(self, fn, chunks):
+        """Run fn over chunks round-robin across the workers, keeping their order"""
+        futures = [self.executors[i % self.workers].submit(fn, chunk) for i, chunk in enumerate(chunks)]
+        return [future.result() for future in futures]
+        
+    def _broadcast(self, fn, *args):
+        futures = [executor.submit(fn, *args) for executor in self.executors]
+        return [future.result() for future in futures]
+        
+    def _split(self, text):
+        """Return the record lines of each task section and the rest of the document
+        
+        Returns None if text is not laid out the way write_data writes it.
+        """
+        head = '{"tasks": ['
+        if not text.startswith(head):
+            return None
+        markers = ['\n],\n"completed": [', '\n],\n"subtasks": [', '\n],\n"categories": ']
+        sections = {}
+        start = len(head)
+        for name, marker in zip(self.SECTIONS, markers):
+            end = text.find(marker, start)
+            if end < 0:
+                return None
+            sections[name] = text[start:end].split("\n")
+            start = end + len(marker)
+        return sections, '{"categories": ' + text[start:]
+        
+    def _chunks(self, lines):
+        size = max(1, -(-len(lines) // (self.workers * self.CHUNKS_PER_WORKER)))
+        return ["\n".join(lines[i:i + size]) for i in range(0, len(lines), size)]
+        
+    def parse(self, f):
+        """Parse a data file into a document for TaskEngine.read_data
+        
+        Returns the document, with Task objects in the task sections and
+        (parent id, Task) pairs in "subtasks", and a map from tasks to their
+        content words. Files in any other layout are parsed with json and
+        left to the engine.
+        """
+        text = f.read()
+        split = self._split(text)
+        if split is None:
+            return json.loads(text), None
+        sections, rest = split
+        
+        data = json.loads(rest)
+        words = {}
+        for name in self.SECTIONS:
+            tasks = data[name] = []
+            for parsed in self._map(_parse_chunk, self._chunks(sections[name])):
+                for row, task_words in parsed:
+                    task = Task.from_row(row)
+                    words[task] = task_words
+                    tasks.append((row[1], task) if name == "subtasks" else task)
+        return data, words
+        
+    def shard(self, task_id):
+        return hash(task_id) % self.workers
+        
+    @staticmethod
+    def scan_row(task):
+        return (
+            task.id,
+            task.content.lower(),
+            tuple(tag.lower() for tag in task.tags),
+            task.priority,
+            task.deadline,
+            task.completion_time,
+            task.creation_time
+        )
+        
+    def attach(self, engine):
+        """Copy the engine's top-level tasks into the worker shards"""
+        shards = [[] for _ in range(self.workers)]
+        with engine.lock:
+            for task in engine.list_tasks("all"):
+                shards[self.shard(task.id)].append(self.scan_row(task))
+            self.engine = engine
+            self.change_log = engine.change_log
+            self.seq = engine.change_seq
+        futures = [executor.submit(_shard_reset, rows) for executor, rows in zip(self.executors, shards)]
+        for future in futures:
+            future.result()
+            
+    def refresh(self):
+        """Ship the changes logged since the last refresh to the shards
+        
+        A store that was reset or reloaded since is copied again in full.
+        """
+        engine = self.engine
+        with engine.lock:
+            if engine.change_log is not self.change_log:
+                return self.attach(engine)
+            if engine.change_seq == self.seq:
+                return
+            delta = engine.changes_since(self.seq)
+            self.seq = engine.change_seq
+            updates = [[] for _ in range(self.workers)]
+            deleted = [[] for _ in range(self.workers)]
+            for record in delta["tasks"] + delta["completed"]:
+                task = engine.tasks_by_id.get(record["id"])
+                if task is not None:
+                    updates[self.shard(task.id)].append(self.scan_row(task))
+            for task_id in [*delta["deleted"], *delta["archived"]]:
+                deleted[self.shard(task_id)].append(task_id)
+        futures = [
+            executor.submit(_shard_update, rows, ids)
+            for executor, rows, ids in zip(self.executors, updates, deleted) if rows or ids
+        ]
+        for future in futures:
+            future.result()
+            
+    def search(self, search_term):
+        """Return the top-level tasks whose content or tags contain search_term
+        
+        Unlike TaskEngine.search, notes stay with the engine and are not
+        searched; open tasks come first, each group ordered by creation
+        time rather than by list position.
+        """
+        self.refresh()
+        ids = [task_id for found in self._broadcast(_shard_search, search_term.lower()) for task_id in found]
+        with self.engine.lock:
+            tasks = [self.engine.tasks_by_id[task_id] for task_id in ids if task_id in self.engine.tasks_by_id]
+        return sorted(tasks, key=lambda t: (t.completion_time is not None, t.creation_time))
+        
+    def stats(self, now=None):
+        """Return the same summary as TaskEngine.stats, computed shard by shard"""
+        self.refresh()
+        return TaskEngine.merge_summaries(self._broadcast(_shard_stats, now or datetime.now()))
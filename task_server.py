@@ -0,0 +1,271 @@
+import asyncio
+import argparse
+import json
+import threading
+import urllib.request
+from urllib.parse import urlsplit, parse_qs
+
+from task_engine import TaskEngine
+from task_parallel import TaskPool
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class TaskServer:
+    """Local HTTP/JSON server over a TaskEngine, built on asyncio streams
+    
+    GET    /tasks?status=open|done|all    stream tasks (every list takes &limit=N)
+    GET    /tasks/<id>                     one task
+    POST   /tasks                          add {"content", "priority", "deadline", "tags", "category"}
+    POST   /tasks/<id>/complete            complete a task
+    DELETE /tasks/<id>                     delete a task
+    GET    /query?q=priority<=1 tag:work   stream tasks matching a query
+    GET    /search?q=invoice               stream tasks matching a search
+    POST   /batch                          [{"op": "add", ...}, {"op": "complete", "id": ...}]
+    POST   /save                           write the data file
+    GET    /stats                          counts and total completion time
+    GET    /changes?since=N&peer=ID        delta of records logged after N
+    POST   /sync                           {"replica", "since", "changes"}; replies with our delta
+    
+    Connections are kept alive, and list responses are sent with chunked
+    encoding CHUNK tasks at a time, so a large result never sits in memory
+    as one JSON document. Every model access goes through call, which holds
+    the engine lock, or hands the work to dispatch (for example a UI queue)
+    when one is given. With a TaskPool, /stats is computed by its workers.
+    """
+    PORT = 8765
+    CHUNK = 500
+    REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+    
+    def __init__(self, engine, host="127.0.0.1", port=PORT, dispatch=None, pool=None):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.dispatch = dispatch
+        self.pool = pool
+        self.autosaver = None
+        
+    async def call(self, fn, *args):
+        """Run fn against the model on whichever thread owns it
+        
+        fn may name an engine method instead, looked up only when it runs,
+        so a call that waited while the app swapped engines reaches the new
+        one rather than the discarded one.
+        """
+        def run():
+            return (getattr(self.engine, fn) if isinstance(fn, str) else fn)(*args)
+            
+        if self.dispatch is None:
+            while True:
+                engine = self.engine
+                with engine.lock:
+                    if engine is self.engine:
+                        return run()
+        return await asyncio.wrap_future(self.dispatch(run))
+        
+    async def serve(self, autosave=None):
+        """Serve until cancelled, saving every autosave seconds if the model changed"""
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        if autosave:
+            self.autosaver = asyncio.ensure_future(self.autosave(autosave))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.autosaver:
+                self.autosaver.cancel()
+                self.autosaver = None
+            
+    def start_in_thread(self):
+        """Run the server on its own event loop in a daemon thread"""
+        thread = threading.Thread(target=lambda: asyncio.run(self.serve()), name="task-server", daemon=True)
+        thread.start()
+        return thread
+        
+    async def autosave(self, interval):
+        """Save when the model changed, otherwise merge what other instances saved"""
+        stamp = await self.call(lambda: tuple(self.engine.versions.values()))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                current = await self.call(lambda: tuple(self.engine.versions.values()))
+                if current != stamp:
+                    await self.call("save")
+                else:
+                    await self.call("poll")
+                stamp = await self.call(lambda: tuple(self.engine.versions.values()))
+            except (OSError, ValueError) as e:
+                print(f"Error syncing data: {e}")
+                
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip().lower()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+                
+                connection = headers.get("connection", "")
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                await self.respond(writer, method, target, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            
+    async def respond(self, writer, method, target, body, keep_alive):
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            payload = json.loads(body) if body else {}
+            limit = int(params["limit"]) if "limit" in params else None
+            
+            if parts == ["tasks"] and method == "GET":
+                tasks = await self.call("list_tasks", params.get("status", "open"))
+                return await self.send_tasks(writer, tasks[:limit], keep_alive)
+            if parts in (["query"], ["search"]) and method == "GET":
+                finder = "run_query" if parts[0] == "query" else "search"
+                tasks = await self.call(finder, params.get("q", ""))
+                return await self.send_tasks(writer, tasks[:limit], keep_alive)
+            if method == "POST" and parts in (["tasks"], ["sync"]) and not isinstance(payload, dict):
+                raise ValueError("body must be a JSON object")
+            if parts == ["tasks"] and method == "POST":
+                request = dict(payload, op="add")
+                return await self.send_json(writer, 201, await self.call("apply", request), keep_alive)
+            if parts == ["batch"] and method == "POST":
+                if not isinstance(payload, list):
+                    raise ValueError("batch body must be a JSON list of operations")
+                return await self.send_json(writer, 200, await self.call("apply_batch", payload), keep_alive)
+            if parts == ["stats"] and method == "GET":
+                if self.pool:
+                    stats = await asyncio.get_running_loop().run_in_executor(None, self.pool.stats)
+                else:
+                    stats = await self.call("stats")
+                return await self.send_json(writer, 200, stats, keep_alive)
+            if parts == ["changes"] and method == "GET":
+                delta = await self.call("changes_since", int(params.get("since", 0)), params.get("peer"))
+                return await self.send_json(writer, 200, delta, keep_alive)
+            if parts == ["sync"] and method == "POST":
+                return await self.send_json(writer, 200, await self.call("exchange", payload), keep_alive)
+            if parts == ["save"] and method == "POST":
+                await self.call("save")
+                return await self.send_json(writer, 200, {"saved": True}, keep_alive)
+                
+            if len(parts) == 2 and parts[0] == "tasks" and method in ("GET", "DELETE"):
+                if method == "GET":
+                    result = await self.call(lambda: self.engine.record_for(self.engine.get_task(parts[1])))
+                else:
+                    result = await self.call("apply", {"op": "delete", "id": parts[1]})
+                return await self.send_json(writer, 200, result, keep_alive)
+            if len(parts) == 3 and parts[0] == "tasks" and parts[2] == "complete" and method == "POST":
+                result = await self.call("apply", {"op": "complete", "id": parts[1]})
+                return await self.send_json(writer, 200, result, keep_alive)
+                
+            raise HTTPError(404 if method in ("GET", "POST", "DELETE") else 405, f"No route for {method} {url.path}")
+        except HTTPError as e:
+            await self.send_json(writer, e.status, {"error": str(e)}, keep_alive)
+        except KeyError as e:
+            await self.send_json(writer, 404, {"error": str(e.args[0]) if e.args else "Not found"}, keep_alive)
+        except (ValueError, TypeError) as e:
+            await self.send_json(writer, 400, {"error": str(e)}, keep_alive)
+            
+    def _head(self, status, keep_alive, extra):
+        return (
+            f"HTTP/1.1 {status} {self.REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"{extra}"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode("latin-1")
+        
+    async def send_json(self, writer, status, result, keep_alive):
+        body = json.dumps(result).encode()
+        writer.write(self._head(status, keep_alive, f"Content-Length: {len(body)}\r\n") + body)
+        await writer.drain()
+        
+    async def send_tasks(self, writer, tasks, keep_alive):
+        """Stream a JSON list of tasks, serializing CHUNK tasks per model call"""
+        writer.write(self._head(200, keep_alive, "Transfer-Encoding: chunked\r\n"))
+        separator = "["
+        for start in range(0, len(tasks), self.CHUNK):
+            batch = tasks[start:start + self.CHUNK]
+            records = await self.call(lambda: [self.engine.record_for(t) for t in batch])
+            data = (separator + ",".join(json.dumps(record) for record in records)).encode()
+            separator = ","
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+        tail = b"[]" if separator == "[" else b"]"
+        writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(tail), tail))
+        await writer.drain()
+
+
+def sync_with_server(engine, url, timeout=30):
+    """Exchange deltas with the TaskServer at url; returns the number of local tasks changed
+    
+    Cursors are kept in engine.peers under the url, so each call only
+    ships what changed on either side since the previous one.
+    """
+    state = engine.peers.setdefault(url, {"pulled": 0, "pushed": 0})
+    changes = engine.changes_since(state["pushed"], exclude_origin=state.get("replica"))
+    body = json.dumps({"replica": engine.replica_id, "since": state["pulled"], "changes": changes}).encode()
+    request = urllib.request.Request(
+        url.rstrip("/") + "/sync",
+        data=body,
+        method="POST",
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        reply = json.load(response)
+    changed = engine.merge_changes(reply)
+    state.update(pulled=reply["seq"], pushed=changes["seq"], replica=reply["replica"])
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the task tracker over local HTTP without the GUI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=TaskServer.PORT)
+    parser.add_argument("--data", default=TaskEngine.DATA_FILE, help="data file to load and keep saved")
+    parser.add_argument("--autosave", type=float, default=2.0, help="seconds between saves")
+    parser.add_argument("--sync", metavar="URL", help="exchange changes with another server, save and exit")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="parse the data file and compute /stats in N worker processes")
+    args = parser.parse_args()
+    
+    engine = TaskEngine(args.data)
+    pool = TaskPool(args.workers) if args.workers else None
+    try:
+        engine.load(pool)
+        if args.sync:
+            print(f"{sync_with_server(engine, args.sync)} tasks changed")
+            engine.save()
+            return
+        if pool:
+            pool.attach(engine)
+        print(f"Serving {args.data} on http://{args.host}:{args.port}")
+        asyncio.run(TaskServer(engine, args.host, args.port, pool=pool).serve(autosave=args.autosave))
+    except KeyboardInterrupt:
+        engine.save()
+    finally:
+        if pool:
+            pool.close()
+
+
+if __name__ == "__main__":
+    main()
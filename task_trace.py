@@ -0,0 +1,221 @@
+"""Record the operations performed on a TaskEngine and replay them headlessly
+
+    python main.py --record session.trace         # use the app, then close it
+    python task_trace.py session.trace             # replay, report latency per operation
+    python task_trace.py session.trace --runs 5 --json > build-a.json
+
+The recorder snapshots the store when it starts, then appends one JSON line
+per operation: its name, its arguments (tasks by id), its offset from the
+start and the latency seen while recording. The replayer loads the snapshot
+into a fresh engine, leaving the real data file alone, and reruns the same
+operations in the same order, so two builds can be compared on identical
+work. Like task_cli, it never imports the GUI.
+"""
+import argparse
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from task_engine import Task, TaskEngine
+
+
+OPERATIONS = (
+    "add_task", "edit_task", "complete_task", "delete_task", "undo", "redo",
+    "search", "filter_tasks", "run_query", "sort_tasks",
+    "set_priority", "set_tags", "set_deadline", "set_recurrence", "set_blockers", "set_note",
+    "add_subtask", "toggle_subtask", "move_to_category"
+)
+
+
+def encode(value):
+    """Make an argument JSON-safe, replacing tasks by their ids"""
+    if isinstance(value, Task):
+        return {"task": value.id}
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    return value
+
+
+def decode(value, lookup):
+    if isinstance(value, dict):
+        if "task" in value:
+            return lookup(value["task"])
+        if "datetime" in value:
+            return datetime.fromisoformat(value["datetime"])
+    if isinstance(value, list):
+        return [decode(item, lookup) for item in value]
+    return value
+
+
+class TraceRecorder:
+    """Log every operation performed on an engine to a trace file
+    
+    attach wraps the engine's public operations on the instance. Each call
+    is logged while it still holds the engine lock, so the trace has the
+    order in which the calls ran even when several threads use the engine.
+    Operations that other operations call internally are not logged twice.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.started = None
+        self.depth = 0
+        
+    def attach(self, engine):
+        """Snapshot the store next to the trace and start logging"""
+        snapshot = os.path.splitext(self.path)[0] + ".start.json"
+        with engine.lock:
+            engine.export_file(snapshot)
+            self.file = open(self.path, "w", buffering=1)
+            self.started = time.perf_counter()
+            self._write({
+                "op": "start",
+                "snapshot": os.path.basename(snapshot),
+                "time": datetime.now().isoformat(),
+                "tasks": engine.task_list.size + engine.completed_tasks.size
+            })
+            for name in OPERATIONS:
+                setattr(engine, name, self._wrap(engine, name, getattr(engine, name)))
+                
+    def _write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+        
+    def _wrap(self, engine, name, method):
+        @functools.wraps(method)
+        def recorded(*args, **kwargs):
+            with engine.lock:
+                if self.file is None or self.depth:
+                    return method(*args, **kwargs)
+                self.depth += 1
+                started = time.perf_counter()
+                try:
+                    result = method(*args, **kwargs)
+                finally:
+                    self.depth -= 1
+                entry = {
+                    "t": round(started - self.started, 6),
+                    "op": name,
+                    "args": encode(args),
+                    "ms": round((time.perf_counter() - started) * 1000, 3)
+                }
+                if kwargs:
+                    entry["kwargs"] = {key: encode(value) for key, value in kwargs.items()}
+                if isinstance(result, Task):
+                    entry["result"] = result.id
+                self._write(entry)
+                return result
+        return recorded
+        
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def replay(path, pace=False):
+    """Rerun a trace against a fresh engine loaded from its snapshot
+    
+    Returns the (operation, seconds) of every call in order, the latencies
+    logged while recording, and the number of calls that could not be
+    replayed because the trace no longer matches the engine.
+    """
+    with open(path) as f:
+        header = json.loads(f.readline())
+        entries = [json.loads(line) for line in f if line.strip()]
+    snapshot = os.path.join(os.path.dirname(os.path.abspath(path)), header["snapshot"])
+    
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "tasks.json")
+        shutil.copyfile(snapshot, data_file)
+        engine = TaskEngine(data_file)
+        engine.load()
+        
+        objects = {}
+        for task in engine.list_tasks("all"):
+            objects[task.id] = task
+            for subtask in task.iter_descendants():
+                objects[subtask.id] = subtask
+        lookup = lambda task_id: objects.get(task_id) or engine.get_task(task_id)
+        
+        timings = []
+        recorded = []
+        failed = 0
+        started = time.perf_counter()
+        for entry in entries:
+            if pace:
+                time.sleep(max(0, started + entry["t"] - time.perf_counter()))
+            try:
+                args = decode(entry["args"], lookup)
+                kwargs = {key: decode(value, lookup) for key, value in entry.get("kwargs", {}).items()}
+                method = getattr(engine, entry["op"])
+                began = time.perf_counter()
+                result = method(*args, **kwargs)
+                elapsed = time.perf_counter() - began
+            except (KeyError, ValueError, AttributeError):
+                failed += 1
+                continue
+            timings.append((entry["op"], elapsed))
+            recorded.append((entry["op"], entry["ms"] / 1000))
+            if isinstance(result, Task) and "result" in entry:
+                objects[entry["result"]] = result
+    return timings, recorded, failed
+
+
+def summarize(timings):
+    """Per-operation count and latency percentiles in milliseconds"""
+    samples = {}
+    for op, seconds in timings:
+        samples.setdefault(op, []).append(seconds * 1000)
+    summary = {}
+    for op, values in samples.items():
+        values.sort()
+        summary[op] = {
+            "count": len(values),
+            "total_ms": round(sum(values), 3),
+            "p50_ms": round(values[len(values) // 2], 3),
+            "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+            "max_ms": round(values[-1], 3)
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded trace and report latency per operation")
+    parser.add_argument("trace")
+    parser.add_argument("--runs", type=int, default=1, help="replay this many times and pool the samples")
+    parser.add_argument("--pace", action="store_true", help="keep the recorded gaps between operations")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+    
+    timings = []
+    failed = 0
+    for _ in range(args.runs):
+        run, recorded, run_failed = replay(args.trace, args.pace)
+        timings.extend(run)
+        failed += run_failed
+    summary = summarize(timings)
+    live = summarize(recorded)
+    
+    if args.json:
+        json.dump({"runs": args.runs, "failed": failed, "replayed": summary, "recorded": live}, sys.stdout, indent=2)
+        print()
+        return
+        
+    print(f"{args.runs} run(s) of {os.path.basename(args.trace)}, {failed} call(s) could not be replayed")
+    print(f"{'operation':<18}{'count':>7}{'total ms':>11}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'rec p50':>9}")
+    for op, stats in sorted(summary.items(), key=lambda item: -item[1]["total_ms"]):
+        print(
+            f"{op:<18}{stats['count']:>7}{stats['total_ms']:>11.1f}{stats['p50_ms']:>9.3f}"
+            f"{stats['p95_ms']:>9.3f}{stats['max_ms']:>9.3f}{live[op]['p50_ms']:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1044 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import types
+import unittest
+import urllib.error
+import urllib.request
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime, timedelta
+from unittest import mock
+
+import task_cli
+from task_analytics import TaskColumns, np
+from task_engine import FileLock, KanbanBoard, RecurrenceRule, ResultCache, TagDictionary, Task, TaskEngine, TaskQuery, TaskTree
+from task_parallel import TaskPool
+from task_server import TaskServer, sync_with_server
+from task_trace import TraceRecorder, replay, summarize
+
+try:
+    import main
+except ImportError:
+    main = None
+
+
+class EngineTestCase(unittest.TestCase):
+    """Base class giving each test fresh engines in a temporary directory"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+    
+    def engine(self, name="tasks"):
+        engine = TaskEngine(os.path.join(self.directory, f"{name}.json"))
+        engine.load()
+        return engine
+    
+    @staticmethod
+    def snapshot(engine):
+        """Map id to (content, priority, done) for every top-level task"""
+        return {
+            task.id: (task.content, task.priority, task.completion_time is not None)
+            for task in engine.list_tasks("all")
+        }
+
+
+class SyncTest(EngineTestCase):
+    def test_concurrent_edit_and_delete_converge(self):
+        first, second = self.engine("first"), self.engine("second")
+        kept = first.add_task("kept")
+        contested = first.add_task("contested")
+        first.sync(second)
+        
+        first.edit_task(contested, "edited on first")
+        second.delete_task(second.get_task(contested.id))
+        second.edit_task(second.get_task(kept.id), "edited on second")
+        first.sync(second)
+        first.sync(second)
+        
+        self.assertEqual(self.snapshot(first), self.snapshot(second))
+        self.assertEqual(self.snapshot(first)[kept.id][0], "edited on second")
+    
+    def test_edit_after_delete_converges_across_three_stores(self):
+        stores = [self.engine(name) for name in ("a", "b", "c")]
+        task = stores[0].add_task("shared")
+        stores[0].sync(stores[1])
+        stores[1].sync(stores[2])
+        
+        stores[0].delete_task(task)
+        stores[2].set_priority(stores[2].get_task(task.id), 2)
+        for _ in range(2):
+            stores[0].sync(stores[1])
+            stores[1].sync(stores[2])
+        
+        self.assertEqual(self.snapshot(stores[0]), self.snapshot(stores[1]))
+        self.assertEqual(self.snapshot(stores[1]), self.snapshot(stores[2]))
+    
+    def test_delta_resumes_after_partial_sync(self):
+        source, replica = self.engine("source"), self.engine("replica")
+        for index in range(5):
+            source.add_task(f"task {index}")
+        first = source.changes_since(0)
+        replica.merge_changes(first)
+        
+        late = source.add_task("late")
+        source.delete_task(source.list_tasks()[0])
+        second = source.changes_since(first["seq"])
+        self.assertEqual([record["id"] for record in second["tasks"]], [late.id])
+        self.assertEqual(len(second["deleted"]), 1)
+        
+        replica.merge_changes(second)
+        self.assertEqual(self.snapshot(source), self.snapshot(replica))
+        self.assertEqual(replica.merge_changes(source.changes_since(second["seq"])), 0)
+    
+    def test_lost_exchange_reply_is_retried(self):
+        server, client = self.engine("server"), self.engine("client")
+        server.add_task("from server")
+        client.add_task("from client")
+        request = {"replica": client.replica_id, "since": 0, "changes": client.changes_since(0)}
+        server.exchange(request)
+        
+        reply = server.exchange(request)
+        client.merge_changes(reply)
+        
+        self.assertEqual(self.snapshot(server), self.snapshot(client))
+        self.assertEqual(len(server.list_tasks()), 2)
+    
+    def test_undone_occurrence_is_withdrawn_from_peers(self):
+        first, second = self.engine("first"), self.engine("second")
+        task = first.add_task("water the plants", deadline=datetime.now() + timedelta(hours=1))
+        first.set_recurrence(task, "daily")
+        first.sync(second)
+        
+        first.complete_task(task)
+        first.sync(second)
+        first.undo()
+        first.sync(second)
+        self.assertEqual(self.snapshot(first), self.snapshot(second))
+        self.assertEqual(len(second.list_tasks()), 1)
+        
+        first.redo()
+        first.sync(second)
+        self.assertEqual(self.snapshot(first), self.snapshot(second))
+        self.assertEqual(len(second.list_tasks()), 1)
+        self.assertEqual(len(second.list_tasks("done")), 1)
+    
+    def test_category_moves_carry_across_sync(self):
+        first, second = self.engine("first"), self.engine("second")
+        task = first.add_task("file taxes", category="Work")
+        first.sync(second)
+        self.assertEqual(second.task_tree.counts("Work"), (1, 0))
+        
+        first.move_to_category(task, "Home")
+        first.sync(second)
+        self.assertEqual(second.task_tree.counts("Work"), (0, 0))
+        self.assertEqual(second.task_tree.counts("Home"), (1, 0))
+        self.assertEqual(second.filter_tasks("Home"), [second.get_task(task.id)])
+    
+    def test_category_moves_carry_across_shared_file(self):
+        writer = self.engine()
+        task = writer.add_task("file taxes", category="Work")
+        writer.save()
+        reader = self.engine()
+        
+        writer.move_to_category(task, "Home")
+        writer.save()
+        reader.poll()
+        self.assertEqual(reader.task_tree.counts("Work"), (0, 0))
+        self.assertEqual(reader.task_tree.counts("Home"), (1, 0))
+    
+    def test_acknowledged_tombstones_are_pruned(self):
+        first, second = self.engine("first"), self.engine("second")
+        task = first.add_task("short lived")
+        first.sync(second)
+        first.delete_task(task)
+        later = datetime.now() + timedelta(days=TaskEngine.TOMBSTONE_DAYS + 1)
+        
+        self.assertEqual(first.prune_tombstones(later), 0)
+        first.sync(second)
+        self.assertEqual(first.prune_tombstones(later), 1)
+        self.assertNotIn(task.id, first.deleted_ids)
+        self.assertIn(task.id, first.changes_since(0)["archived"])
+
+
+class SharedFileTest(EngineTestCase):
+    def test_saves_from_two_instances_are_merged(self):
+        first, second = self.engine(), self.engine()
+        shared = first.add_task("shared")
+        first.save()
+        self.assertEqual(second.poll(), 1)
+        
+        first.add_task("from first")
+        first.set_priority(first.get_task(shared.id), 2)
+        second.add_task("from second")
+        first.save()
+        second.save()
+        
+        merged = self.snapshot(self.engine())
+        self.assertEqual(sorted(merged.values()), [("from first", 0, False), ("from second", 0, False), ("shared", 2, False)])
+        self.assertEqual(first.poll(), 1)
+        self.assertEqual(self.snapshot(first), merged)
+        
+        first.edit_task(first.get_task(shared.id), "edited on first")
+        second.edit_task(second.get_task(shared.id), "edited on second")
+        first.save()
+        second.save()
+        first.poll()
+        self.assertEqual(self.snapshot(first), self.snapshot(second))
+    
+    def test_concurrent_savers_lose_nothing(self):
+        stores = [self.engine() for _ in range(3)]
+        
+        def add_and_save(store, name):
+            for index in range(10):
+                store.add_task(f"{name} {index}")
+                store.save()
+                
+        workers = [threading.Thread(target=add_and_save, args=(store, f"store {number}")) for number, store in enumerate(stores)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(self.snapshot(self.engine())), 30)
+    
+    def test_lock_times_out_while_held(self):
+        path = os.path.join(self.directory, "tasks.json.lock")
+        with FileLock(path):
+            with self.assertRaises(TimeoutError):
+                with FileLock(path, timeout=0.1):
+                    pass
+        with FileLock(path, timeout=0.1):
+            pass
+
+
+class QueryTest(EngineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = self.engine()
+        for index in range(40):
+            self.store.add_task(f"task {index:02}", priority=index % 3, tags=["work"] if index % 4 == 0 else ["home"])
+    
+    def test_indexed_plan_matches_full_scan(self):
+        self.assertTrue(TaskQuery("tag:work").explain(self.store).startswith("index scan on tag:work"))
+        for key in ("content", "priority", "creation_time"):
+            self.store.sort_tasks(key)
+            indexed = self.store.run_query("tag:work priority<=2")
+            scanned = [task for task in self.store.run_query("priority<=2") if "work" in task.tags]
+            self.assertEqual(indexed, scanned)
+    
+    def test_negated_terms_filter(self):
+        found = self.store.run_query("-tag:work p=0")
+        self.assertTrue(found)
+        self.assertTrue(all(task.priority == 0 and "work" not in task.tags for task in found))
+
+
+class CategoryTest(EngineTestCase):
+    def test_traversal_orders_and_deep_paths(self):
+        tree = TaskTree()
+        tasks = {path: Task(path) for path in ("Work", "Work/A", "Work/B", "Work/A/x", "Home")}
+        for path, task in tasks.items():
+            tree.add_task_to_category(path, task)
+        self.assertEqual([task.content for _, task in tree.dfs_traverse()], ["Work", "Work/A", "Work/A/x", "Work/B", "Home"])
+        self.assertEqual([task.content for _, task in tree.bfs_traverse()], ["Work", "Home", "Work/A", "Work/B", "Work/A/x"])
+        self.assertEqual(tree.subtree_tasks("Work/A"), [tasks["Work/A"], tasks["Work/A/x"]])
+        self.assertEqual(tree.subtree_tasks("Missing"), [])
+        
+        deep = "/".join(f"level{index}" for index in range(5000))
+        tree.add_task_to_category(deep, Task("bottom"))
+        self.assertEqual([task.content for task in tree.subtree_tasks("level0")], ["bottom"])
+        walked = tree.iter_tasks()
+        self.assertEqual(next(walked)[1], tasks["Work"])
+    
+    def test_counts_roll_up_and_follow_task_state(self):
+        store = self.engine()
+        now = datetime.now()
+        report = store.add_task("report", category="Work/Reports", deadline=now + timedelta(hours=1))
+        store.add_task("call", category="Work")
+        errand = store.add_task("groceries", category="Home")
+        self.assertEqual([store.task_tree.counts(path) for path in ("Work", "Work/Reports", "Home")], [(2, 0), (1, 0), (1, 0)])
+        
+        store.tick_deadlines(now + timedelta(hours=2))
+        self.assertEqual(store.task_tree.counts("Work"), (2, 1))
+        store.move_to_category(report, "Home")
+        self.assertEqual([store.task_tree.counts(path) for path in ("Work", "Work/Reports", "Home")], [(1, 0), (0, 0), (2, 1)])
+        store.complete_task(report)
+        store.complete_task(errand)
+        self.assertEqual(store.task_tree.counts("Home"), (0, 0))
+        store.undo()
+        self.assertEqual(store.task_tree.counts("Home"), (1, 0))
+        store.save()
+        self.assertEqual(self.engine().task_tree.counts("Home"), (1, 0))
+        self.assertEqual(store.task_tree.counts("Missing"), (0, 0))
+    
+    def test_delete_unfiles_and_undo_refiles(self):
+        store = self.engine()
+        task = store.add_task("gone", category="Work")
+        store.delete_task(task)
+        self.assertEqual(store.task_tree.find("Work").tasks, [])
+        store.save()
+        self.assertEqual(self.engine().task_tree.subtree_tasks("Work"), [])
+        
+        store.undo()
+        self.assertEqual(store.task_tree.counts("Work"), (1, 0))
+        store.redo()
+        self.assertEqual(store.task_tree.counts("Work"), (0, 0))
+        store.undo()
+        store.undo()
+        self.assertEqual(store.task_tree.find("Work").tasks, [])
+        store.redo()
+        self.assertEqual(store.filter_tasks("Work"), [task])
+
+
+class RecurrenceTest(EngineTestCase):
+    def test_next_occurrence_keeps_categories_blockers_and_note(self):
+        store = self.engine()
+        blocker = store.add_task("buy seeds")
+        task = store.add_task("water the plants", deadline=datetime.now() + timedelta(hours=1), category="Home")
+        store.set_recurrence(task, "daily")
+        store.set_blockers(task, [blocker.id])
+        store.set_note(task, "the ferns need less")
+        
+        store.complete_task(blocker)
+        following = store.complete_task(task)
+        self.assertEqual(store.filter_tasks("Home"), [following])
+        self.assertEqual(following.blocked_by, [blocker.id])
+        self.assertEqual(store.get_note(following), "the ferns need less")
+        self.assertEqual(following.deadline - task.deadline, timedelta(days=1))
+        
+        store.undo()
+        self.assertEqual(store.filter_tasks("Home"), [task])
+        store.redo()
+        self.assertEqual(store.filter_tasks("Home"), [following])
+    
+    def test_rules_expand_lazily_within_the_window(self):
+        monthly = RecurrenceRule.parse("monthly")
+        anchor = datetime(2025, 1, 31, 9)
+        self.assertEqual(
+            list(monthly.occurrences(anchor, datetime(2025, 1, 1), datetime(2025, 4, 1))),
+            [anchor, datetime(2025, 2, 28, 9), datetime(2025, 3, 31, 9)],
+        )
+        friday = datetime(2025, 6, 6, 8)
+        self.assertEqual(RecurrenceRule.parse("weekdays").next_after(friday, friday), datetime(2025, 6, 9, 8))
+        cron = RecurrenceRule.parse("cron */15 9-10 * * 1-5")
+        self.assertEqual(cron.next_after(friday, friday), datetime(2025, 6, 6, 9))
+        self.assertEqual(
+            list(cron.days(friday, friday, datetime(2025, 6, 10, 9, 30))),
+            [(datetime(2025, 6, 6, 9), 8), (datetime(2025, 6, 9, 9), 8), (datetime(2025, 6, 10, 9), 2)],
+        )
+        for text in ("every 0 days", "fortnightly", "61 * * * *"):
+            with self.assertRaises(ValueError):
+                RecurrenceRule(text)
+    
+    def test_calendar_gets_only_future_occurrences(self):
+        store = self.engine()
+        task = store.add_task("standup", deadline=datetime(2025, 6, 2, 9))
+        store.set_recurrence(task, "daily")
+        store.add_task("one-off", deadline=datetime(2025, 6, 3, 9))
+        found = list(store.recurring_occurrences(datetime(2025, 6, 1), datetime(2025, 6, 5)))
+        self.assertEqual(found, [(datetime(2025, 6, day, 9), task) for day in (3, 4)])
+    
+    def test_recurrence_changes_can_be_undone(self):
+        store = self.engine()
+        task = store.add_task("stretch")
+        self.assertTrue(store.set_recurrence(task, "daily"))
+        self.assertIsNotNone(task.deadline)
+        self.assertIn(task, store.recurring_tasks)
+        self.assertFalse(store.set_recurrence(task, "daily"))
+        
+        store.undo()
+        self.assertEqual((task.recurrence, task.deadline), (None, None))
+        self.assertNotIn(task, store.recurring_tasks)
+        store.redo()
+        self.assertEqual(task.recurrence, "daily")
+        self.assertIn(task, store.deadline_index)
+    
+    def test_recurrence_change_bumps_the_task_version(self):
+        store = self.engine()
+        task = store.add_task("stretch", deadline=datetime.now() + timedelta(days=3))
+        before = store.versions["tasks"]
+        store.set_recurrence(task, "weekly")
+        self.assertGreater(store.versions["tasks"], before)
+
+
+class TagTest(EngineTestCase):
+    def test_filter_expressions_combine_and_or_not(self):
+        store = self.engine()
+        report = store.add_task("report", tags=["Work", "urgent"])
+        slides = store.add_task("slides", tags=["work", "later"])
+        garden = store.add_task("garden", tags=["home", "urgent"])
+        untagged = store.add_task("untagged")
+        
+        self.assertEqual(store.filter_tasks(tag_filter="work"), [report, slides])
+        self.assertEqual(store.filter_tasks(tag_filter="work -later"), [report])
+        self.assertEqual(store.filter_tasks(tag_filter="urgent work|home"), [report, garden])
+        self.assertEqual(store.filter_tasks(tag_filter="-urgent -later"), [untagged])
+        
+        store.set_tags(slides, ["home"])
+        self.assertEqual(store.filter_tasks(tag_filter="home"), [slides, garden])
+        self.assertEqual(slides.tags, ["home"])
+        self.assertEqual(store.tag_index.tasks_with("WORK"), {report})
+    
+    def test_matching_while_tags_are_interned(self):
+        dictionary = TagDictionary()
+        done = threading.Event()
+        
+        def intern_many():
+            for index in range(20000):
+                dictionary.intern(f"tag{index}")
+            done.set()
+            
+        worker = threading.Thread(target=intern_many)
+        worker.start()
+        while not done.is_set():
+            dictionary.matching("tag1")
+        worker.join()
+        self.assertEqual(len(dictionary.matching("tag1999")), 11)
+
+
+class NoteTest(EngineTestCase):
+    def test_notes_round_trip_through_the_notes_file(self):
+        store = self.engine()
+        task = store.add_task("call the bank")
+        store.set_note(task, "ask about the ünïcode fee")
+        store.save()
+        self.assertIsNone(task.note_text)
+        
+        reloaded = self.engine()
+        self.assertEqual(reloaded.get_note(reloaded.get_task(task.id)), "ask about the ünïcode fee")
+        self.assertEqual(reloaded.search("ÜNÏCODE"), [reloaded.get_task(task.id)])
+    
+    def test_edited_notes_keep_old_references_readable(self):
+        store = self.engine()
+        task = store.add_task("plan trip")
+        child = store.add_subtask(task, "book hotel")
+        store.set_note(task, "first draft")
+        store.set_note(child, "near the station")
+        store.save()
+        other = self.engine()
+        
+        store.set_note(task, "second draft " * 1000)
+        store.save()
+        self.assertEqual(other.get_note(other.get_task(task.id)), "first draft")
+        self.assertEqual(other.poll(), 1)
+        self.assertEqual(other.get_note(other.get_task(task.id)), "second draft " * 1000)
+        self.assertEqual(other.get_note(other.get_task(task.id).subtasks[0]), "near the station")
+        
+        store.undo()
+        self.assertEqual(store.get_note(task), "first draft")
+        copy = self.engine("copy")
+        store.sync(copy)
+        self.assertEqual(copy.get_note(copy.get_task(task.id)), "first draft")
+        self.assertEqual(store.record_for(task).get("note", task.note_text), "first draft")
+    
+    def test_saving_without_notes_leaves_no_notes_file(self):
+        store = self.engine()
+        store.add_task("no note here")
+        store.save()
+        self.assertFalse(os.path.exists(store.notes.path))
+
+
+class ArchiveTest(EngineTestCase):
+    def test_pages_cover_hot_and_archived_tasks_once(self):
+        store = self.engine()
+        for index in range(12):
+            task = store.add_task(f"task {index}")
+            store.complete_task(task)
+            if index < 7:
+                task.completion_time = datetime.now() - timedelta(days=store.archive_days + 1)
+        store.save()
+        self.assertEqual(store.completed_tasks.size, 5)
+        
+        seen = []
+        for number in range(4):
+            tasks, total = store.completed_page(number, size=4)
+            self.assertEqual(total, 12)
+            seen.extend(task.content for task in tasks)
+        self.assertEqual(sorted(seen), sorted(f"task {index}" for index in range(12)))
+        self.assertEqual(set(seen[:5]), {f"task {index}" for index in range(7, 12)})
+
+
+class DuplicateTest(EngineTestCase):
+    def test_near_duplicates_are_found(self):
+        store = self.engine()
+        original = store.add_task("Renew the car insurance policy before March", tags=["admin"])
+        store.add_task("Water the plants on the balcony")
+        
+        found = store.find_duplicates("Renew car insurance policy before March", ["admin"])
+        self.assertEqual([task for task, _ in found], [original])
+        self.assertFalse(store.find_duplicates("Book flights to Lisbon"))
+    
+    def test_crowded_bucket_is_compared_in_full(self):
+        store = self.engine()
+        copies = [store.add_task("Call the plumber about the leak") for _ in range(100)]
+        
+        found = store.find_duplicates("Call the plumber about the leak", limit=None)
+        self.assertEqual({task for task, _ in found}, set(copies))
+    
+    def test_report_groups_duplicates(self):
+        store = self.engine()
+        first = store.add_task("Prepare the quarterly sales report for the board")
+        second = store.add_task("Prepare quarterly sales report for the board")
+        store.add_task("Fix the squeaky bedroom door")
+        
+        groups = store.duplicate_report()
+        self.assertEqual([set(group) for group in groups], [{first, second}])
+
+
+class SubtaskTest(EngineTestCase):
+    def test_progress_rolls_up_and_survives_reload(self):
+        store = self.engine()
+        project = store.add_task("move house")
+        packing = store.add_subtask(project, "pack")
+        books = store.add_subtask(packing, "books")
+        store.add_subtask(packing, "kitchen")
+        store.add_subtask(project, "book the van")
+        self.assertEqual((project.subtask_total, project.subtask_done), (4, 0))
+        
+        store.toggle_subtask(books)
+        self.assertEqual((packing.subtask_done, project.subtask_done), (1, 1))
+        store.undo()
+        self.assertEqual(project.subtask_done, 0)
+        store.redo()
+        store.save()
+        
+        reloaded = self.engine().get_task(project.id)
+        self.assertEqual((reloaded.subtask_total, reloaded.subtask_done), (4, 1))
+        self.assertEqual([task.content for task in reloaded.iter_descendants()], ["pack", "books", "kitchen", "book the van"])
+        
+        store.undo()
+        store.undo()
+        self.assertEqual((project.subtask_total, project.subtask_done), (3, 0))
+
+
+class CacheTest(EngineTestCase):
+    def test_results_are_invalidated_only_by_their_facets(self):
+        store = self.engine()
+        first = store.add_task("alpha", tags=["x"])
+        second = store.add_task("beta", priority=1)
+        cache = store.result_cache
+        
+        self.assertEqual(store.filter_tasks(filter_mode="Priority"), [first])
+        self.assertEqual(store.filter_tasks(filter_mode="Priority"), [first])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        
+        store.set_tags(second, ["y"])
+        store.filter_tasks(filter_mode="Priority")
+        self.assertEqual(cache.hits, 2)
+        store.set_priority(second, 0)
+        self.assertEqual(store.filter_tasks(filter_mode="Priority"), [first, second])
+        self.assertEqual(cache.misses, 2)
+        
+        self.assertEqual(store.search("alpha"), [first])
+        store.edit_task(first, "gamma")
+        self.assertEqual(store.search("alpha"), [])
+    
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResultCache(capacity=2)
+        cache.put("a", (1,), ["a"])
+        cache.put("b", (1,), ["b"])
+        cache.get("a", (1,))
+        cache.put("c", (1,), ["c"])
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertIsNone(cache.get("a", (2,)))
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class AnalyticsTest(EngineTestCase):
+    def test_columns_follow_the_change_log(self):
+        store = self.engine()
+        now = datetime(2025, 6, 10, 12)
+        tasks = []
+        for days_ago, priority in ((0, 0), (0, 1), (1, 2), (2, 0)):
+            task = store.add_task(f"{days_ago} days ago", priority=priority, deadline=now - timedelta(days=days_ago, hours=1))
+            task.creation_time = now - timedelta(days=days_ago)
+            tasks.append(task)
+        store.complete_task(tasks[3])
+        tasks[3].completion_time = tasks[3].creation_time + timedelta(hours=2)
+        
+        columns = TaskColumns(store)
+        columns.refresh()
+        starts, created, completed = columns.throughput(periods=3, now=now)
+        self.assertEqual(list(starts.astype(str)), ["2025-06-08", "2025-06-09", "2025-06-10"])
+        self.assertEqual((list(created), list(completed)), ([1, 1, 2], [1, 0, 0]))
+        labels, counts, median, _ = columns.completion_times()
+        self.assertEqual((counts[labels.index("1-4h")], median), (1, 2.0))
+        self.assertEqual(list(columns.overdue_aging(now)[1][:3]), [2, 1, 0])
+        self.assertEqual(columns.priority_mix(periods=1, now=now)[1].tolist(), [[1, 1, 0]])
+        
+        store.delete_task(tasks[0])
+        store.set_priority(tasks[1], 2)
+        columns.refresh()
+        self.assertEqual(list(columns.throughput(periods=1, now=now)[1]), [1])
+        self.assertEqual(columns.priority_mix(periods=1, now=now)[1].tolist(), [[0, 0, 1]])
+
+
+class DeadlineTest(EngineTestCase):
+    def test_range_queries_follow_deadline_changes(self):
+        store = self.engine()
+        monday = datetime(2025, 6, 2)
+        early, late, next_day = (
+            store.add_task(content, deadline=monday + offset)
+            for content, offset in (("early", timedelta(hours=9)), ("late", timedelta(hours=23)), ("next", timedelta(days=1)))
+        )
+        store.add_task("whenever")
+        index = store.deadline_index
+        self.assertEqual(index.on_day(monday.date()), [early, late])
+        self.assertEqual(index.range(monday + timedelta(hours=9), monday + timedelta(days=1)), [early, late])
+        self.assertEqual(index.count(monday, monday + timedelta(days=7)), 3)
+        
+        store.set_deadline(late, monday - timedelta(days=1))
+        store.complete_task(next_day)
+        self.assertEqual(index.range(monday - timedelta(days=1), monday + timedelta(days=7)), [late, early])
+        self.assertEqual(
+            index.count_by_day(monday.date() - timedelta(days=1), monday.date() + timedelta(days=7)),
+            {monday.date() - timedelta(days=1): 1, monday.date(): 1},
+        )
+        store.delete_task(early)
+        self.assertEqual(index.count_by_day(monday.date(), monday.date() + timedelta(days=7)), {})
+        self.assertEqual(len(index), 1)
+
+
+    def test_timer_fires_each_deadline_once(self):
+        store = self.engine()
+        now = datetime.now()
+        soon = store.add_task("soon", deadline=now + timedelta(hours=1), category="Work")
+        later = store.add_task("later", deadline=now + timedelta(hours=3), category="Work")
+        moved = store.add_task("moved", deadline=now + timedelta(hours=2))
+        self.assertEqual(store.tick_deadlines(now), [])
+        self.assertEqual(store.deadline_timer.next_due(), soon.deadline)
+        
+        store.set_deadline(moved, now + timedelta(days=1))
+        store.complete_task(later)
+        self.assertEqual(store.tick_deadlines(now + timedelta(hours=4)), [soon])
+        self.assertEqual(store.tick_deadlines(now + timedelta(hours=5)), [])
+        self.assertEqual(store.task_tree.counts("Work"), (1, 1))
+        self.assertEqual(store.deadline_timer.next_due(), moved.deadline)
+        
+        store.set_deadline(soon, now + timedelta(days=2))
+        self.assertEqual(store.task_tree.counts("Work"), (1, 0))
+
+
+class KanbanTest(EngineTestCase):
+    def test_columns_follow_priority_and_completion(self):
+        store = self.engine()
+        tasks = [store.add_task(f"card {index}", priority=index % 2) for index in range(6)]
+        board = store.kanban
+        self.assertEqual(board.window(0, 0, 10), tasks[0::2])
+        self.assertEqual(board.window(1, 1, 2), tasks[3::2])
+        
+        store.set_priority(tasks[0], 1)
+        store.complete_task(tasks[3])
+        self.assertEqual(board.window(0, 0, 10), [tasks[2], tasks[4]])
+        self.assertEqual(board.window(1, 0, 10), [tasks[1], tasks[5], tasks[0]])
+        self.assertEqual(board.window("done", 0, 10), [tasks[3]])
+        
+        store.delete_task(tasks[5])
+        self.assertEqual(board.window(1, 1, 10), [tasks[0]])
+        self.assertEqual([board.count(key) for key, _ in board.COLUMNS], [2, 2, 0, 1])
+        self.assertEqual(board.window(2, 5, 10), [])
+
+
+@unittest.skipIf(main is None, "GUI dependencies are not fully installed")
+class KanbanViewTest(EngineTestCase):
+    SLOTS = 3
+    
+    def setUp(self):
+        super().setUp()
+        app = self.app = main.ModernTodoApp.__new__(main.ModernTodoApp)
+        app.engine = self.engine()
+        app.kanban_offsets, app.kanban_views, app.kanban_slots = {}, {}, {}
+        app.select_task = mock.Mock()
+        app.show_task_menu = mock.Mock()
+        for key, title in KanbanBoard.COLUMNS:
+            app.kanban_views[key] = (title, mock.Mock(), [mock.Mock() for _ in range(self.SLOTS)], mock.Mock(), [])
+            for index in range(self.SLOTS):
+                app.kanban_slots[f".kanban.{key}.{index}"] = (key, index)
+                
+    @staticmethod
+    def event(key, index, delta=0):
+        return types.SimpleNamespace(widget=f".kanban.{key}.{index}", x_root=10, y_root=20, delta=delta)
+        
+    def test_slot_events_reach_the_card_they_show(self):
+        app = self.app
+        tasks = [app.engine.add_task(f"card {index}") for index in range(5)]
+        app.refresh_kanban_column(0)
+        app.on_kanban_click(self.event(0, 1))
+        app.select_task.assert_called_with(tasks[1])
+        
+        app.on_kanban_wheel(self.event(0, 0, delta=-120))
+        app.on_kanban_click(self.event(0, 1), popup=True)
+        app.select_task.assert_called_with(tasks[2])
+        app.show_task_menu.assert_called_once_with(tasks[2], 10, 20)
+        
+        app.select_task.reset_mock()
+        app.on_kanban_click(self.event("done", 0), popup=True)
+        app.select_task.assert_not_called()
+        self.assertEqual(app.show_task_menu.call_count, 1)
+
+
+class DependencyTest(EngineTestCase):
+    def test_cycles_are_rejected_and_order_respects_blockers(self):
+        store = self.engine()
+        design, build, ship, docs = (store.add_task(name) for name in ("design", "build", "ship", "docs"))
+        store.set_blockers(ship, [build.id, docs.id])
+        store.set_blockers(build, [design.id])
+        for task, blockers in ((design, [ship.id]), (design, [build.id]), (docs, [docs.id])):
+            with self.assertRaises(ValueError):
+                store.set_blockers(task, blockers)
+        self.assertEqual(design.blocked_by, [])
+        
+        order = sorted(store.list_tasks(), key=lambda t: store.dependencies.order_key(t.id))
+        self.assertLess(order.index(design), order.index(build))
+        self.assertLess(order.index(build), order.index(ship))
+        self.assertEqual(store.critical_path(ship), [design, build, ship])
+        self.assertEqual(store.filter_tasks(filter_mode="Ready"), [design, docs])
+        
+        store.complete_task(design)
+        store.complete_task(docs)
+        self.assertEqual(store.filter_tasks(filter_mode="Ready"), [build])
+        self.assertTrue(store.dependencies.is_blocked(ship.id))
+        store.undo()
+        store.undo()
+        store.save()
+        
+        reloaded = self.engine()
+        self.assertEqual([task.id for task in reloaded.critical_path(reloaded.get_task(ship.id))], [design.id, build.id, ship.id])
+        self.assertEqual(set(reloaded.dependencies.open_blockers(ship.id)), {build.id, docs.id})
+
+
+class UrgencyTest(EngineTestCase):
+    def test_refresh_recomputes_tasks_crossing_thresholds(self):
+        store = self.engine()
+        now = datetime.now()
+        routine = store.add_task("routine", priority=1)
+        deadline = store.add_task("deadline", priority=2, deadline=now + timedelta(days=2))
+        urgent = store.add_task("urgent", priority=0)
+        self.assertEqual(store.next_tasks(), [urgent, routine, deadline])
+        self.assertEqual(store.urgency.next_change(), deadline.deadline - timedelta(days=1))
+        
+        self.assertEqual(store.refresh_priorities(now + timedelta(days=1, hours=23, minutes=30)), [deadline])
+        self.assertEqual(store.effective_priority(deadline), 0)
+        self.assertEqual(store.urgency.ordered(), [deadline, urgent, routine])
+        self.assertEqual(store.refresh_priorities(now + timedelta(days=1, hours=23, minutes=31)), [])
+        
+        later = now + timedelta(days=8)
+        self.assertEqual(set(store.refresh_priorities(later)), {routine, deadline, urgent})
+        self.assertEqual([store.effective_priority(task) for task in (urgent, routine, deadline)], [-1, 0, -2])
+        store.set_priority(urgent, 2)
+        self.assertEqual(store.urgency.ordered()[-1], urgent)
+    
+    def test_next_tasks_honours_explicit_limits(self):
+        store = self.engine()
+        for index in range(store.NEXT_LIMIT + 5):
+            store.add_task(f"task {index}")
+        self.assertEqual(store.next_tasks(0), [])
+        self.assertEqual(len(store.next_tasks(3)), 3)
+        self.assertEqual(len(store.next_tasks()), store.NEXT_LIMIT)
+
+
+class ServerTest(EngineTestCase):
+    @staticmethod
+    def fetch(url, method="GET", body=None):
+        """Return (status, decoded JSON) for one request"""
+        data = None if body is None else json.dumps(body).encode()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=data, method=method), timeout=5) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+            
+    @staticmethod
+    def against_server(store, client):
+        """Run client(base_url) on a worker thread while a server for store answers it"""
+        async def run():
+            server = TaskServer(store, port=0)
+            listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+            base = f"http://127.0.0.1:{listener.sockets[0].getsockname()[1]}"
+            try:
+                return await asyncio.get_running_loop().run_in_executor(None, client, base)
+            finally:
+                listener.close()
+                
+        return asyncio.run(run())
+        
+    def test_task_endpoints(self):
+        store = self.engine()
+        store.add_task("existing")
+        
+        def client(base):
+            status, added = self.fetch(base + "/tasks", "POST", {"content": "Pay rent", "priority": 1, "tags": ["home"]})
+            self.assertEqual((status, added["content"], added["priority"]), (201, "Pay rent", 1))
+            status, listed = self.fetch(base + "/tasks?limit=1")
+            self.assertEqual((status, [record["content"] for record in listed]), (200, ["existing"]))
+            self.assertEqual(self.fetch(f"{base}/tasks/{added['id']}")[1]["tags"], ["home"])
+            self.assertEqual([record["id"] for record in self.fetch(base + "/search?q=rent")[1]], [added["id"]])
+            
+            self.assertEqual(self.fetch(f"{base}/tasks/{added['id']}/complete", "POST")[0], 200)
+            self.assertEqual(len(self.fetch(base + "/tasks")[1]), 1)
+            self.assertEqual(self.fetch(base + "/stats")[0], 200)
+            self.assertEqual(self.fetch(f"{base}/tasks/{added['id']}", "DELETE")[1], {"id": added["id"], "deleted": True})
+            self.assertEqual(self.fetch(f"{base}/tasks/{added['id']}")[0], 404)
+            self.assertEqual(self.fetch(base + "/tasks", "PUT", {})[0], 405)
+            self.assertEqual(self.fetch(base + "/tasks", "POST", {"content": " "})[0], 400)
+            
+        self.against_server(store, client)
+        self.assertEqual([task.content for task in store.list_tasks("all")], ["existing"])
+    
+    def test_sync_with_server_exchanges_changes(self):
+        served, local = self.engine("served"), self.engine("local")
+        remote_task = served.add_task("made on the server")
+        local_task = local.add_task("made locally")
+        
+        self.against_server(served, lambda base: sync_with_server(local, base))
+        self.assertEqual(self.snapshot(local), self.snapshot(served))
+        local.edit_task(local_task, "edited locally")
+        self.against_server(served, lambda base: sync_with_server(local, base))
+        self.assertEqual(served.get_task(local_task.id).content, "edited locally")
+        self.assertIn(remote_task.id, local.tasks_by_id)
+    
+    def test_call_waiting_on_a_swapped_engine_reaches_the_new_one(self):
+        placeholder, loaded = self.engine("placeholder"), self.engine("loaded")
+        server = TaskServer(placeholder)
+        results = []
+        
+        with placeholder.lock:
+            worker = threading.Thread(
+                target=lambda: results.append(asyncio.run(server.call("apply", {"op": "add", "content": "late write"})))
+            )
+            worker.start()
+            worker.join(0.1)
+            server.engine = loaded
+        worker.join()
+        
+        self.assertEqual([task.content for task in loaded.list_tasks()], ["late write"])
+        self.assertEqual(placeholder.list_tasks(), [])
+    
+    def test_bodies_that_are_not_objects_get_400(self):
+        store = self.engine()
+        
+        async def exchange():
+            server = TaskServer(store, port=0)
+            listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            statuses = []
+            for path, body in (("/sync", b"[]"), ("/tasks", b"[1]"), ("/batch", b"[[]]"), ("/tasks", b'{"content": "ok"}')):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b"POST %s HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s" % (path.encode(), len(body), body))
+                await writer.drain()
+                statuses.append(int((await reader.readline()).split()[1]))
+                writer.close()
+            listener.close()
+            return statuses
+            
+        self.assertEqual(asyncio.run(exchange()), [400, 400, 200, 201])
+    
+    def test_autosave_task_is_kept_and_cancelled(self):
+        server = TaskServer(self.engine(), port=0)
+        
+        async def run_briefly():
+            serving = asyncio.ensure_future(server.serve(autosave=0.01))
+            await asyncio.sleep(0.05)
+            autosaver = server.autosaver
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+            return autosaver
+            
+        autosaver = asyncio.run(run_briefly())
+        self.assertTrue(autosaver.cancelled())
+        self.assertIsNone(server.autosaver)
+
+
+class PoolTest(EngineTestCase):
+    def test_pool_matches_the_serial_engine(self):
+        store = self.engine()
+        for index in range(60):
+            task = store.add_task(f"task {index}", priority=index % 3, tags=["even" if index % 2 else "odd"])
+            store.add_subtask(task, f"step of {index}")
+            if index % 5 == 0:
+                store.complete_task(task)
+        store.save()
+        now = datetime.now()
+        
+        with TaskPool(workers=2) as pool:
+            loaded = TaskEngine(store.data_file)
+            loaded.load(pool)
+            self.assertEqual(self.snapshot(loaded), self.snapshot(store))
+            self.assertEqual(loaded.get_task(task.id).subtask_total, 1)
+            
+            pool.attach(loaded)
+            self.assertEqual(pool.search("task 1"), loaded.search("task 1"))
+            self.assertStatsEqual(pool.stats(now), loaded.stats(now))
+            
+            loaded.edit_task(loaded.get_task(task.id), "renamed")
+            loaded.delete_task(loaded.list_tasks()[0])
+            self.assertEqual(pool.search("renamed"), [loaded.get_task(task.id)])
+            self.assertStatsEqual(pool.stats(now), loaded.stats(now))
+    
+    def assertStatsEqual(self, first, second):
+        """Compare summaries, allowing for float sums taken in a different order"""
+        first, second = dict(first), dict(second)
+        self.assertAlmostEqual(first.pop("completion_seconds"), second.pop("completion_seconds"))
+        self.assertEqual(first, second)
+
+
+class ThreadTest(EngineTestCase):
+    def test_workers_share_one_engine(self):
+        store = self.engine()
+        errors = []
+        
+        def work(name):
+            try:
+                for index in range(200):
+                    task = store.add_task(f"{name} {index}", tags=[name], deadline=datetime.now() + timedelta(days=index % 7))
+                    if index % 2:
+                        store.complete_task(task)
+                    store.search(name)
+                    store.filter_tasks(tag_filter=name)
+            except Exception as e:
+                errors.append(e)
+                
+        workers = [threading.Thread(target=work, args=(f"worker{number}",)) for number in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(store.list_tasks()), 400)
+        self.assertEqual(len(store.list_tasks("all")), 800)
+        self.assertEqual(len(store.deadline_index), 400)
+        self.assertEqual(len(store.filter_tasks(tag_filter="worker2")), 100)
+
+
+class StartupTest(unittest.TestCase):
+    HEAVY = {"numpy", "task_analytics", "task_server", "task_trace", "PIL"}
+    
+    def test_gui_module_defers_heavy_imports(self):
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, main; print(' '.join(sys.modules))"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+        )
+        if "ImportError" in result.stderr or "ModuleNotFoundError" in result.stderr:
+            self.skipTest("GUI dependencies are not fully installed")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(self.HEAVY.intersection(result.stdout.split()), set())
+    
+    def test_concurrent_interning_assigns_one_id_per_tag(self):
+        dictionary = TagDictionary()
+        names = [f"tag{index}" for index in range(2000)]
+        results = []
+        workers = [threading.Thread(target=lambda: results.append([dictionary.intern(name) for name in names])) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertTrue(all(ids == results[0] for ids in results))
+        self.assertEqual(sorted(results[0]), list(range(len(names))))
+        self.assertEqual(dictionary.decode(results[0]), names)
+
+
+class CliTest(EngineTestCase):
+    def run_cli(self, *argv):
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            status = task_cli.main(["--data", os.path.join(self.directory, "tasks.json"), *argv])
+        return status, out.getvalue(), err.getvalue()
+    
+    def test_add_parses_deadline_and_saves(self):
+        status, out, _ = self.run_cli("add", "Pay invoice", "-p", "1", "--deadline", "2025-07-01")
+        self.assertEqual(status, 0)
+        task = self.engine().get_task(out.strip())
+        self.assertEqual((task.priority, task.deadline), (1, datetime(2025, 7, 1)))
+    
+    def test_batch_commands_round_trip(self):
+        with mock.patch("sys.stdin", io.StringIO("one\ntwo\n\nthree\n")):
+            _, out, _ = self.run_cli("add", "-", "--tag", "batch")
+        ids = out.split()
+        self.assertEqual(len(ids), 3)
+        with mock.patch("sys.stdin", io.StringIO(ids[0] + "\nmissing\n")):
+            status, out, err = self.run_cli("complete")
+        self.assertEqual((status, out.split()), (1, [ids[0]]))
+        self.assertIn("missing", err)
+        
+        _, out, _ = self.run_cli("list", "--json")
+        self.assertEqual([json.loads(line)["content"] for line in out.splitlines()], ["two", "three"])
+        _, out, _ = self.run_cli("query", "tag:batch", "--limit", "1")
+        self.assertEqual(len(out.splitlines()), 1)
+        _, out, _ = self.run_cli("stats", "--json")
+        self.assertEqual((json.loads(out)["total"], json.loads(out)["completed"]), (3, 1))
+    
+    def test_startup_skips_gui_and_numpy(self):
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, task_cli; print(' '.join(sys.modules))"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        )
+        self.assertEqual({"tkinter", "ttkbootstrap", "numpy", "PIL"}.intersection(result.stdout.split()), set())
+    
+    def test_error_keeps_operations_applied_before_it(self):
+        add_task = TaskEngine.add_task
+        def failing_add(engine, content, **kwargs):
+            if content == "bad":
+                raise ValueError("rejected")
+            return add_task(engine, content, **kwargs)
+        with mock.patch.object(TaskEngine, "add_task", failing_add):
+            status, _, err = self.run_cli("add", "first", "bad", "third")
+        self.assertEqual(status, 1)
+        self.assertIn("rejected", err)
+        self.assertEqual([content for content, _, _ in self.snapshot(self.engine()).values()], ["first"])
+    
+    def test_unreadable_store_is_not_overwritten(self):
+        path = os.path.join(self.directory, "tasks.json")
+        with open(path, "w") as f:
+            f.write("{not json")
+        status, _, _ = self.run_cli("add", "lost")
+        self.assertEqual(status, 1)
+        with open(path) as f:
+            self.assertEqual(f.read(), "{not json")
+
+
+class TraceTest(EngineTestCase):
+    def test_replay_reruns_recorded_operations(self):
+        store = self.engine()
+        store.add_task("existing")
+        recorder = TraceRecorder(os.path.join(self.directory, "session.trace"))
+        recorder.attach(store)
+        task = store.add_task("recorded")
+        store.set_note(task, "with a note")
+        store.set_priority(task, 1)
+        store.search("recorded")
+        recorder.close()
+        
+        timings, recorded, failed = replay(recorder.path)
+        self.assertEqual([op for op, _ in timings], ["add_task", "set_note", "set_priority", "search"])
+        self.assertEqual(len(recorded), 4)
+        self.assertEqual(failed, 0)
+    
+    def test_tasks_created_during_the_trace_are_resolved(self):
+        store = self.engine()
+        store.save()
+        recorder = TraceRecorder(os.path.join(self.directory, "session.trace"))
+        recorder.attach(store)
+        task = store.add_task("parent", deadline=datetime(2025, 6, 1, 9))
+        store.toggle_subtask(store.add_subtask(task, "child"))
+        store.set_recurrence(task, "weekly")
+        store.complete_task(task)
+        store.undo()
+        recorder.close()
+        
+        timings, _, failed = replay(recorder.path)
+        self.assertEqual(
+            [op for op, _ in timings],
+            ["add_task", "add_subtask", "toggle_subtask", "set_recurrence", "complete_task", "undo"]
+        )
+        self.assertEqual(failed, 0)
+        self.assertEqual(self.engine().list_tasks("all"), [])
+        summary = summarize(timings)
+        self.assertEqual(summary["undo"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()